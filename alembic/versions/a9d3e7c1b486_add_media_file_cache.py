@@ -0,0 +1,32 @@
+"""add_media_file_cache
+
+Revision ID: a9d3e7c1b486
+Revises: f2c6a9d4e715
+Create Date: 2026-10-17 17:31:05.664812
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d3e7c1b486'
+down_revision: Union[str, None] = 'f2c6a9d4e715'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'media_files',
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('file_id', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('content_hash')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('media_files')
@@ -0,0 +1,34 @@
+"""add_bot_persistence
+
+Revision ID: b6d2e8f4a1c7
+Revises: c789f3e6af07
+Create Date: 2026-10-17 09:41:02.553817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d2e8f4a1c7'
+down_revision: Union[str, None] = 'c789f3e6af07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('bot_persistence',
+    sa.Column('namespace', sa.String(length=16), nullable=False),
+    sa.Column('owner', sa.String(length=64), nullable=False),
+    sa.Column('data_key', sa.String(length=191), nullable=False),
+    sa.Column('value', sa.LargeBinary().with_variant(mysql.MEDIUMBLOB(), 'mysql'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('namespace', 'owner', 'data_key')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('bot_persistence')
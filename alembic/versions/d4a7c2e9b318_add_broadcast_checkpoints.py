@@ -0,0 +1,36 @@
+"""add_broadcast_checkpoints
+
+Revision ID: d4a7c2e9b318
+Revises: b6d2e8f4a1c7
+Create Date: 2026-10-17 15:22:47.301946
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7c2e9b318'
+down_revision: Union[str, None] = 'b6d2e8f4a1c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('broadcasts', sa.Column('kind', sa.String(length=16), server_default='custom', nullable=False))
+    op.add_column('broadcasts', sa.Column('status', sa.String(length=16), server_default='completed', nullable=False))
+    op.add_column('broadcasts', sa.Column('target_user_ids', sa.JSON(), nullable=True))
+    op.add_column('broadcasts', sa.Column('last_user_id', sa.BigInteger(), nullable=True))
+    op.add_column('broadcasts', sa.Column('updated_at', sa.TIMESTAMP(), nullable=True))
+    op.create_index('ix_broadcasts_status', 'broadcasts', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_broadcasts_status', table_name='broadcasts')
+    op.drop_column('broadcasts', 'updated_at')
+    op.drop_column('broadcasts', 'last_user_id')
+    op.drop_column('broadcasts', 'target_user_ids')
+    op.drop_column('broadcasts', 'status')
+    op.drop_column('broadcasts', 'kind')
@@ -0,0 +1,28 @@
+"""add_user_reachability
+
+Revision ID: e8b1f5a3c602
+Revises: d4a7c2e9b318
+Create Date: 2026-10-17 16:05:12.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b1f5a3c602'
+down_revision: Union[str, None] = 'd4a7c2e9b318'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('is_reachable', sa.Boolean(), server_default=sa.true(), nullable=False))
+    op.add_column('users', sa.Column('unreachable_since', sa.TIMESTAMP(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'unreachable_since')
+    op.drop_column('users', 'is_reachable')
@@ -0,0 +1,34 @@
+"""add_audience_segments
+
+Revision ID: f2c6a9d4e715
+Revises: e8b1f5a3c602
+Create Date: 2026-10-17 16:48:33.920174
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c6a9d4e715'
+down_revision: Union[str, None] = 'e8b1f5a3c602'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('broadcasts', sa.Column('segment', sa.JSON(), nullable=True))
+    op.create_index('ix_users_last_activity', 'users', ['last_activity'], unique=False)
+    op.create_index('ix_users_wallet_balance', 'users', ['wallet_balance'], unique=False)
+    op.create_index('ix_marzban_telegram_links_panel_user', 'marzban_telegram_links', ['panel_id', 'telegram_user_id'], unique=False)
+    op.create_index('ix_pending_invoices_user_status', 'pending_invoices', ['user_id', 'status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pending_invoices_user_status', table_name='pending_invoices')
+    op.drop_index('ix_marzban_telegram_links_panel_user', table_name='marzban_telegram_links')
+    op.drop_index('ix_users_wallet_balance', table_name='users')
+    op.drop_index('ix_users_last_activity', table_name='users')
+    op.drop_column('broadcasts', 'segment')
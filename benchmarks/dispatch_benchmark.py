@@ -0,0 +1,131 @@
+# FILE: benchmarks/dispatch_benchmark.py
+# Per-update handler lookup cost with the full handler set, before and after shared.router.
+#
+#   python benchmarks/dispatch_benchmark.py [--rounds 2000]
+#
+# "before" replaces every Router with the regex handler chain it stands in for
+# (Router.as_handlers), "after" is the tree as registered by bot.register_handlers.
+# Only the lookup is timed (what Application.process_update does before calling a
+# callback): for each group, check_update on each handler until one accepts.
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import CallbackQuery, Chat, Message, Update, User
+from telegram.ext import ApplicationBuilder
+
+from config import config
+from shared.translator import init_translator
+from shared.router import Router
+
+NOW = datetime.now(timezone.utc)
+
+
+def build_application():
+    application = ApplicationBuilder().token("123456:BENCHMARK").job_queue(None).build()
+    import bot
+    bot.register_handlers(application)
+    return application
+
+
+def _message_update(update_id: int, user: User, text: str) -> Update:
+    chat = Chat(id=user.id, type=Chat.PRIVATE)
+    return Update(update_id, message=Message(update_id, NOW, chat, from_user=user, text=text))
+
+
+def _callback_update(update_id: int, user: User, data: str) -> Update:
+    chat = Chat(id=user.id, type=Chat.PRIVATE)
+    message = Message(update_id, NOW, chat, from_user=user, text="menu")
+    return Update(update_id, callback_query=CallbackQuery(str(update_id), user, "benchmark", message=message, data=data))
+
+
+def build_updates(routers):
+    """One update per routed text / callback (prefixes get an id appended), plus updates nothing routes."""
+    user = User(id=next(iter(config.AUTHORIZED_USER_IDS), 1), first_name="bench", is_bot=False)
+    texts, callbacks = [], []
+    for router in routers:
+        router_texts, exact_callbacks, callback_prefixes = router.route_keys()
+        texts.extend(router_texts)
+        callbacks.extend(exact_callbacks)
+        callbacks.extend(f"{prefix}42" for prefix in callback_prefixes)
+
+    updates = {"text": [], "callback": [], "unrouted": []}
+    update_id = 0
+    for text in texts:
+        update_id += 1
+        updates["text"].append(_message_update(update_id, user, text))
+    for data in callbacks:
+        update_id += 1
+        updates["callback"].append(_callback_update(update_id, user, data))
+    for text in ("hello", "09123456789", "test_user_1"):
+        update_id += 1
+        updates["unrouted"].append(_message_update(update_id, user, text))
+    for data in ("unknown_action_1", "noop"):
+        update_id += 1
+        updates["unrouted"].append(_callback_update(update_id, user, data))
+    return updates
+
+
+def without_routers(handlers):
+    return {
+        group: [h for handler in group_handlers for h in (handler.as_handlers() if isinstance(handler, Router) else [handler])]
+        for group, group_handlers in handlers.items()
+    }
+
+
+def lookup(handlers, update) -> int:
+    """Runs the handler lookup for one update; returns how many check_update calls it took."""
+    checks = 0
+    for group in sorted(handlers):
+        for handler in handlers[group]:
+            checks += 1
+            check = handler.check_update(update)
+            if check is not None and check is not False:
+                break
+    return checks
+
+
+def measure(handlers, updates, rounds: int):
+    for update in updates:
+        lookup(handlers, update)  # warm-up
+    checks = sum(lookup(handlers, update) for update in updates)
+    start = time.perf_counter()
+    for _round in range(rounds):
+        for update in updates:
+            lookup(handlers, update)
+    elapsed = time.perf_counter() - start
+    return elapsed / (rounds * len(updates)) * 1e6, checks / len(updates)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Handler lookup cost per update, before and after the routers.")
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    init_translator()
+    application = build_application()
+    after = application.handlers
+    before = without_routers(after)
+    routers = [h for group_handlers in after.values() for h in group_handlers if isinstance(h, Router)]
+
+    print(f"Handlers registered: {sum(map(len, before.values()))} before, {sum(map(len, after.values()))} after "
+          f"({len(routers)} routers holding {sum(len(r.as_handlers()) for r in routers)} routes)")
+    print(f"{'updates':<10}{'count':>7}{'before µs':>12}{'after µs':>11}{'checks before':>15}{'checks after':>14}")
+    all_updates = []
+    for kind, updates in build_updates(routers).items():
+        all_updates.extend(updates)
+        before_us, before_checks = measure(before, updates, args.rounds)
+        after_us, after_checks = measure(after, updates, args.rounds)
+        print(f"{kind:<10}{len(updates):>7}{before_us:>12.2f}{after_us:>11.2f}{before_checks:>15.1f}{after_checks:>14.1f}")
+    before_us, before_checks = measure(before, all_updates, args.rounds)
+    after_us, after_checks = measure(after, all_updates, args.rounds)
+    print(f"{'all':<10}{len(all_updates):>7}{before_us:>12.2f}{after_us:>11.2f}{before_checks:>15.1f}{after_checks:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,13 +11,19 @@ import platform # <--- اضافه شد
 from telegram import Update
 from telegram.ext import (
     Application, ApplicationBuilder, ContextTypes, MessageHandler,
-    CallbackQueryHandler, filters, TypeHandler, PicklePersistence
+    CallbackQueryHandler, filters, TypeHandler
 )
 from telegram.ext import CommandHandler
 from config import config
-from shared.translator import init_translator
+from shared.translator import init_translator, reload_translations_job
 from core.panel_api.marzban import close_marzban_client
+from core.panel_api.helpers import close_all_panel_apis
 from database import engine as db_engine
+from shared.db_persistence import DatabasePersistence
+from shared.activity_tracker import record_activity, flush_activity, flush_activity_job
+from shared.auth import sync_admin_cache_job
+from shared import qr_service
+from shared.locks import PerUserUpdateProcessor
 
 # ==========================================
 # 🔧 WINDOWS FIX (مهم برای اجرای روی ویندوز)
@@ -58,13 +64,17 @@ async def debug_update_logger(update: Update, context: ContextTypes.DEFAULT_TYPE
         LOGGER.error(f"Error in debug_update_logger: {e}")
 
 async def update_user_activity(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
-    from database.crud import user as crud_user
+    # Buffered in memory; flush_activity_job writes it out in bulk.
     user = getattr(update, 'effective_user', None)
     if user:
-        await crud_user.update_last_activity(user.id)
+        record_activity(user.id)
 
 async def post_shutdown(application: Application):
     LOGGER.info("Shutdown signal received. Closing resources...")
+    flushed = await flush_activity()
+    LOGGER.info(f"Flushed buffered activity for {flushed} user(s).")
+    await close_all_panel_apis()
+    qr_service.shutdown()
     await close_marzban_client()
     LOGGER.info("HTTPX client closed gracefully.")
     await db_engine.close_db()
@@ -73,21 +83,8 @@ async def post_shutdown(application: Application):
 async def heartbeat(context: ContextTypes.DEFAULT_TYPE):
     LOGGER.info("❤️ Heartbeat: Bot is alive and the JobQueue is running.")
 
-async def post_init(application: Application):
-    """
-    تابع راه‌اندازی اولیه
-    """
-    # 1. تلاش برای اتصال به دیتابیس
-    try:
-        await db_engine.init_db()
-        LOGGER.info("Database connection initialized successfully.")
-    except Exception as e:
-        LOGGER.critical(f"🔥 FATAL ERROR: Could not connect to database! Reason: {e}")
-        # اگر دیتابیس وصل نشود، ادامه دادن فایده‌ای ندارد
-        sys.exit(1)
-
-    LOGGER.info("Registering all application handlers...")
-
+def register_handlers(application: Application) -> None:
+    """Adds every module's handlers, in priority order. Also used by benchmarks/dispatch_benchmark.py."""
     # 2. ایمپورت کردن ماژول‌ها (درون تابع)
     from modules.general import handler as general_handler
     from modules.marzban import handler as marzban_handler
@@ -131,8 +128,30 @@ async def post_init(application: Application):
     from shared.callbacks import main_menu_fallback
     application.add_handler(CommandHandler("cancel", main_menu_fallback), group=1)
 
+async def post_init(application: Application):
+    """
+    تابع راه‌اندازی اولیه
+    """
+    # 1. تلاش برای اتصال به دیتابیس
+    try:
+        await db_engine.init_db()
+        LOGGER.info("Database connection initialized successfully.")
+    except Exception as e:
+        LOGGER.critical(f"🔥 FATAL ERROR: Could not connect to database! Reason: {e}")
+        # اگر دیتابیس وصل نشود، ادامه دادن فایده‌ای ندارد
+        sys.exit(1)
+
+    from database.crud import admin as crud_admin
+    await crud_admin.refresh_admin_cache_if_changed()  # Warm the admin-role cache
+
+    LOGGER.info("Registering all application handlers...")
+    register_handlers(application)
     LOGGER.info("All handlers registered successfully.")
 
+    # 4. ادامه‌ی ارسال‌های همگانی نیمه‌تمام
+    from modules.broadcaster.actions import runner as broadcast_runner
+    await broadcast_runner.resume_unfinished_broadcasts(application)
+
 def main() -> None:
     setup_logging()
     
@@ -143,12 +162,14 @@ def main() -> None:
     LOGGER.info("===================================")
     LOGGER.info("🚀 Starting bot...")
 
-    persistence = PicklePersistence(filepath="bot_persistence.pickle")
+    # State lives in the database now; the old pickle file is imported once on first start.
+    persistence = DatabasePersistence(legacy_pickle_path="bot_persistence.pickle")
 
     application = (
         ApplicationBuilder()
         .token(config.TELEGRAM_BOT_TOKEN)
         .persistence(persistence)
+        .concurrent_updates(PerUserUpdateProcessor(config.CONCURRENT_UPDATES))
         .connect_timeout(30)
         .read_timeout(30)
         .post_init(post_init)
@@ -161,7 +182,11 @@ def main() -> None:
     if application.job_queue:
         application.job_queue.run_repeating(heartbeat, interval=3600, first=10, name="heartbeat")
         application.job_queue.run_repeating(cleanup_expired_test_accounts, interval=3600, first=60, name="cleanup_test_accounts")
-        LOGGER.info("❤️ Heartbeat and Test Account Cleanup jobs scheduled.")
+        application.job_queue.run_repeating(flush_activity_job, interval=config.ACTIVITY_FLUSH_INTERVAL, first=config.ACTIVITY_FLUSH_INTERVAL, name="activity_flush")
+        application.job_queue.run_repeating(sync_admin_cache_job, interval=config.ADMIN_CACHE_CHECK_INTERVAL, first=config.ADMIN_CACHE_CHECK_INTERVAL, name="admin_cache_sync")
+        LOGGER.info("❤️ Heartbeat, Test Account Cleanup, Activity Flush and Admin Cache Sync jobs scheduled.")
+        if config.TRANSLATION_RELOAD_CHECK_INTERVAL > 0:
+            application.job_queue.run_repeating(reload_translations_job, interval=config.TRANSLATION_RELOAD_CHECK_INTERVAL, first=config.TRANSLATION_RELOAD_CHECK_INTERVAL, name="translation_reload")
 
     # --- Webhook / Polling Setup ---
     BOT_DOMAIN = os.getenv("BOT_DOMAIN")
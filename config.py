@@ -40,6 +40,29 @@ class Config:
         AUTHORIZED_USER_IDS = []
         LOGGER.error("AUTHORIZED_USER_IDS contains invalid values. No admin users will be recognized.")
 
+    # --- Panel User Snapshot Cache (Optional) ---
+    # Snapshots younger than the TTL are served as-is. Older ones (up to the stale
+    # limit) are still served while a single background refresh runs.
+    PANEL_USERS_CACHE_TTL = int(os.getenv("PANEL_USERS_CACHE_TTL", "60"))
+    PANEL_USERS_STALE_TTL = int(os.getenv("PANEL_USERS_STALE_TTL", "600"))
+    # Seconds between bulk writes of buffered users.last_activity timestamps.
+    ACTIVITY_FLUSH_INTERVAL = int(os.getenv("ACTIVITY_FLUSH_INTERVAL", "5"))
+    # How often the cached support-admin list is checked against the database.
+    ADMIN_CACHE_CHECK_INTERVAL = int(os.getenv("ADMIN_CACHE_CHECK_INTERVAL", "30"))
+    # How often strings/<lang>/*.json are checked for edits (hot reload). 0 (the default) disables the check.
+    # Only messages pick up reloaded texts: button labels (keyboards.*) are matched by handlers
+    # built at startup, so changing them still needs a restart.
+    TRANSLATION_RELOAD_CHECK_INTERVAL = int(os.getenv("TRANSLATION_RELOAD_CHECK_INTERVAL", "0"))
+    # Updates handled at the same time (each user's own updates still run one after another). 1 = sequential.
+    CONCURRENT_UPDATES = max(1, int(os.getenv("CONCURRENT_UPDATES", "32")))
+    # Bulk sends (broadcasts, gift notifications). Telegram allows about 30
+    # messages per second per bot; the default leaves headroom for normal traffic.
+    BROADCAST_RATE_PER_SECOND = float(os.getenv("BROADCAST_RATE_PER_SECOND", "25"))
+    BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "8"))
+    BROADCAST_MAX_RETRIES = int(os.getenv("BROADCAST_MAX_RETRIES", "3"))
+    # Broadcast progress is saved after this many sends, so a restart resumes close to where it stopped.
+    BROADCAST_CHECKPOINT_EVERY = int(os.getenv("BROADCAST_CHECKPOINT_EVERY", "100"))
+
     # --- Support Configuration (Optional) ---
     SUPPORT_USERNAME = os.getenv("SUPPORT_USERNAME")
     if not SUPPORT_USERNAME:
@@ -1,6 +1,47 @@
 # FILE: core/panel_api/base.py (NEW FILE)
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+import logging
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator, Callable
+
+from .panel_user import PanelUser
+
+LOGGER = logging.getLogger(__name__)
+
+
+class PanelRequestError(Exception):
+    """Raised by streaming API methods when the panel cannot be read."""
+    pass
+
+
+@dataclass
+class PanelStats:
+    """Simple per-panel counters, kept on long-lived API objects from the registry."""
+    requests: int = 0
+    failures: int = 0
+    logins: int = 0
+    total_latency: float = 0.0
+
+    @property
+    def avg_latency(self) -> float:
+        return self.total_latency / self.requests if self.requests else 0.0
+
+
+# --- User Write Listeners ---
+# Called after a successful write through any PanelAPI with
+# (panel_id, username, fresh_user_data, deleted). fresh_user_data is None when the
+# user was deleted or the panel's response did not include the updated user;
+# only `deleted` says which.
+UserWriteListener = Callable[[Optional[int], str, Optional[Dict[str, Any]], bool], None]
+_user_write_listeners: List[UserWriteListener] = []
+
+
+def register_user_write_listener(listener: UserWriteListener) -> None:
+    if listener not in _user_write_listeners:
+        _user_write_listeners.append(listener)
+
 
 class PanelAPI(ABC):
     """
@@ -12,11 +53,56 @@ class PanelAPI(ABC):
         self.api_url = credentials['api_url']
         self.username = credentials['username']
         self.password = credentials['password']
+        self.panel_id: Optional[int] = credentials.get('panel_id')
+        self.stats = PanelStats()
+        self._in_use = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def aclose(self) -> None:
+        """Releases network resources held by this API object (if any)."""
+        pass
+
+    @asynccontextmanager
+    async def _using_client(self) -> AsyncIterator[None]:
+        """Marks a request (or a whole paged read) as in flight, so a replaced client is not closed under it."""
+        self._in_use += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._in_use -= 1
+            if not self._in_use:
+                self._idle.set()
+
+    async def wait_idle(self) -> None:
+        """Returns once no request is using this API object."""
+        await self._idle.wait()
+
+    def _notify_user_written(self, username: str, user_data: Optional[Dict[str, Any]] = None, deleted: bool = False) -> None:
+        for listener in _user_write_listeners:
+            try:
+                listener(self.panel_id, username, user_data, deleted)
+            except Exception as e:
+                LOGGER.error(f"User write listener {listener} failed for '{username}': {e}", exc_info=True)
 
     @abstractmethod
-    async def get_all_users(self) -> Optional[List[Dict[str, Any]]]:
+    async def get_all_users(self) -> Optional[List[PanelUser]]:
+        """All users as compact PanelUser records (use get_user_data for a full payload)."""
         pass
 
+    async def iter_users(self) -> AsyncIterator[PanelUser]:
+        """
+        Yields the panel's users one by one. Panels that support server-side
+        pagination override this to avoid holding the full list in memory.
+        Raises PanelRequestError if the users cannot be fetched.
+        """
+        users = await self.get_all_users()
+        if users is None:
+            raise PanelRequestError(f"Could not fetch users from panel {self.api_url}")
+        for user in users:
+            yield user
+
     @abstractmethod
     async def get_user_data(self, username: str) -> Optional[Dict[str, Any]]:
         pass
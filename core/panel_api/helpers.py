@@ -1,55 +1,154 @@
-# FILE: core/helpers.py
+# FILE: core/panel_api/helpers.py
 
+import asyncio
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+
+import httpx
 
 # --- Absolute imports from other parts of the project ---
-from database.models.panel_credential import PanelCredential
+from database.models.panel_credential import PanelCredential, PanelType
 from database.crud import panel_credential as crud_panel
 
 # --- Absolute imports for panel API classes ---
-from core.panel_api.base import PanelAPI
-from core.panel_api.marzban import MarzbanPanel
+from core.panel_api.base import PanelAPI, PanelStats
+from core.panel_api.marzban import MarzbanPanel, invalidate_marzban_tokens
 from core.panel_api.xui import XUIPanel
 
 LOGGER = logging.getLogger(__name__)
 
+# --- Panel API Registry ---
+# One long-lived API object per panel ID. Each keeps its own connection pool,
+# auth state and stats, and is rebuilt when the panel's credentials change.
+PANEL_CONNECTION_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
+PANEL_CLIENT_TIMEOUT = 20.0
+# A replaced API object is closed once its in-flight requests finish, or after this long at the latest.
+RETIRED_API_CLOSE_TIMEOUT = 120.0
+
+PanelFingerprint = Tuple[str, str, str, str]
+
+_api_registry: Dict[int, Tuple[PanelFingerprint, PanelAPI]] = {}
+# Replaced API objects waiting for their in-flight requests: close task -> API object.
+_retired_apis: Dict[asyncio.Task, PanelAPI] = {}
+
+
+def _panel_fingerprint(panel: PanelCredential) -> PanelFingerprint:
+    return (panel.panel_type.value, panel.api_url, panel.username, panel.password)
 
-async def get_api_for_panel(panel: PanelCredential) -> Optional[PanelAPI]:
-    """
-    Main factory to create an API object from a panel database object.
-    This is the central point for handling different panel types.
-    """
-    if not panel:
-        return None
 
+def _build_api(panel: PanelCredential) -> Optional[PanelAPI]:
     credentials = {
         'api_url': panel.api_url,
         'username': panel.username,
-        'password': panel.password
+        'password': panel.password,
+        'panel_id': panel.id,
     }
 
-    if panel.panel_type.value == "marzban":
-        return MarzbanPanel(credentials)
-    
-    elif panel.panel_type.value == "x-ui":
-        return XUIPanel(credentials)
-        
+    if panel.panel_type == PanelType.MARZBAN:
+        client = httpx.AsyncClient(timeout=PANEL_CLIENT_TIMEOUT, http2=True, limits=PANEL_CONNECTION_LIMITS)
+        return MarzbanPanel(credentials, client=client)
+
+    elif panel.panel_type == PanelType.XUI:
+        return XUIPanel(credentials, limits=PANEL_CONNECTION_LIMITS)
+
     # In the future, you can add other panel types here:
-    # elif panel.panel_type.value == "pasargad":
-    #     from core.panel_api.pasargad import PasargadPanel
-    #     return PasargadPanel(credentials)
+    # elif panel.panel_type == PanelType.MARZNESHIN:
+    #     from core.panel_api.marzneshin import MarzneshinPanel
+    #     return MarzneshinPanel(credentials)
 
     LOGGER.warning(f"Attempted to create an API object for an unsupported panel type: '{panel.panel_type.value}'")
     return None
 
 
+async def _close_api(panel_id: int, api: PanelAPI) -> None:
+    try:
+        await api.aclose()
+    except Exception as e:
+        LOGGER.warning(f"Failed to close API client for panel {panel_id}: {e}")
+
+
+async def _close_when_idle(panel_id: int, api: PanelAPI) -> None:
+    try:
+        await asyncio.wait_for(api.wait_idle(), timeout=RETIRED_API_CLOSE_TIMEOUT)
+    except asyncio.TimeoutError:
+        LOGGER.warning(f"Old API client for panel {panel_id} still busy after {RETIRED_API_CLOSE_TIMEOUT:.0f}s; closing it anyway.")
+    await _close_api(panel_id, api)
+
+
+def _retire_api(panel_id: int) -> None:
+    """
+    Takes a panel's API object out of the registry. New callers get a fresh one;
+    the old client is closed in the background once requests already using it
+    have finished, so they don't fail on a closed client.
+    """
+    entry = _api_registry.pop(panel_id, None)
+    invalidate_marzban_tokens(panel_id)
+    if entry:
+        task = asyncio.create_task(_close_when_idle(panel_id, entry[1]))
+        _retired_apis[task] = entry[1]
+        task.add_done_callback(lambda done: _retired_apis.pop(done, None))
+
+
+async def get_api_for_panel(panel: PanelCredential) -> Optional[PanelAPI]:
+    """
+    Main factory to get the API object for a panel database object.
+    Returns the registry's shared instance, building (or rebuilding) it on demand.
+    """
+    if not panel:
+        return None
+
+    fingerprint = _panel_fingerprint(panel)
+    entry = _api_registry.get(panel.id)
+    if entry and entry[0] == fingerprint:
+        return entry[1]
+
+    if entry:
+        LOGGER.info(f"Credentials for panel {panel.id} changed. Rebuilding its API client.")
+        _retire_api(panel.id)
+
+    api = _build_api(panel)
+    if api:
+        _api_registry[panel.id] = (fingerprint, api)
+    return api
+
+
 async def get_api_for_panel_by_id(panel_id: int) -> Optional[PanelAPI]:
     """
-    A convenient wrapper to get a panel from DB by its ID and create an API object for it.
+    A convenient wrapper to get a panel from DB by its ID and return its API object.
     """
     panel = await crud_panel.get_panel_by_id(panel_id)
     if not panel:
         LOGGER.error(f"Could not find panel with ID: {panel_id}")
         return None
-    return await get_api_for_panel(panel)
\ No newline at end of file
+    return await get_api_for_panel(panel)
+
+
+async def _on_panel_changed(panel_id: Optional[int]) -> None:
+    """
+    Retires the API objects of deleted panels. Other changes (e.g. the test-panel
+    flag) keep the live client; a credential change is picked up by the
+    fingerprint check in get_api_for_panel.
+    """
+    panel_ids = [panel_id] if panel_id is not None else list(_api_registry)
+    for pid in panel_ids:
+        if pid in _api_registry and not await crud_panel.get_panel_by_id(pid):
+            _retire_api(pid)
+
+
+def get_panel_api_stats() -> Dict[int, PanelStats]:
+    """Returns the request stats of every API object currently in the registry."""
+    return {panel_id: api.stats for panel_id, (_, api) in _api_registry.items()}
+
+
+async def close_all_panel_apis() -> None:
+    """Closes every registry-managed client, including retired ones still draining. Called on shutdown."""
+    for task, api in list(_retired_apis.items()):
+        task.cancel()
+        await _close_api(api.panel_id, api)
+    for panel_id in list(_api_registry):
+        _fingerprint, api = _api_registry.pop(panel_id)
+        await _close_api(panel_id, api)
+    LOGGER.info("All panel API clients have been closed.")
+
+
+crud_panel.register_change_listener(_on_panel_changed)
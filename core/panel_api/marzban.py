@@ -3,26 +3,90 @@
 import httpx
 import logging
 import asyncio
-from typing import Tuple, Dict, Any, Optional, List
+import base64
+import json
+import time
+from dataclasses import dataclass
+from collections import deque
+from typing import Tuple, Dict, Any, Optional, List, AsyncIterator
 
-from .base import PanelAPI
+from .base import PanelAPI, PanelRequestError
+from .panel_user import PanelUser
 
 LOGGER = logging.getLogger(__name__)
 
 # This client is now specific to Marzban API calls
 _client = httpx.AsyncClient(timeout=20.0, http2=True)
 
+# --- Token Store ---
+# Marzban tokens are JWTs that stay valid for hours, so one token per panel is
+# shared by every MarzbanPanel instance in the process instead of logging in
+# before every request.
+TOKEN_REFRESH_MARGIN_SECONDS = 60     # Refresh this long before the JWT 'exp'
+TOKEN_FALLBACK_TTL_SECONDS = 300      # Used when the token has no readable 'exp'
+
+TokenKey = Tuple[Optional[int], str, str]
+
+# --- User Pagination ---
+USERS_PAGE_SIZE = 1000        # Users per /api/users page when streaming
+USERS_PAGE_CONCURRENCY = 3    # Pages fetched in parallel per panel
+
+
+@dataclass
+class _CachedToken:
+    access_token: str
+    expires_at: float
+
+
+_token_cache: Dict[TokenKey, _CachedToken] = {}
+_token_locks: Dict[TokenKey, asyncio.Lock] = {}
+
+
+def _get_jwt_expiry(token: str) -> Optional[float]:
+    """Reads the 'exp' claim from a JWT without verifying its signature."""
+    try:
+        payload_b64 = token.split('.')[1]
+        payload_b64 += '=' * (-len(payload_b64) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(payload_b64))
+        exp = payload.get('exp')
+        return float(exp) if exp else None
+    except (IndexError, ValueError, TypeError):
+        return None
+
+
+def invalidate_marzban_tokens(panel_id: Optional[int] = None) -> None:
+    """Drops cached tokens for one panel, or for all panels if no ID is given."""
+    for key in list(_token_cache):
+        if panel_id is None or key[0] == panel_id:
+            _token_cache.pop(key, None)
+
+
 class MarzbanPanel(PanelAPI):
     """Implementation of the PanelAPI interface for Marzban panels."""
 
+    def __init__(self, credentials: Dict[str, Any], client: Optional[httpx.AsyncClient] = None):
+        super().__init__(credentials)
+        # Registry-managed instances get their own pooled client; ad-hoc ones share _client.
+        self._client = client or _client
+        self._owns_client = client is not None
+
+    async def aclose(self) -> None:
+        if self._owns_client and not self._client.is_closed:
+            await self._client.aclose()
+
+    @property
+    def _token_key(self) -> TokenKey:
+        return (self.panel_id, self.api_url.rstrip('/'), self.username)
+
     async def _get_token(self) -> Optional[str]:
-        """Gets an authentication token from the Marzban API."""
+        """Gets a fresh authentication token from the Marzban API (always performs a login)."""
         url = f"{self.api_url.rstrip('/')}/api/admin/token"
         payload = {'username': self.username, 'password': self.password}
         
         for attempt in range(3):
             try:
-                response = await _client.post(url, data=payload)
+                self.stats.logins += 1
+                response = await self._client.post(url, data=payload)
                 response.raise_for_status()
                 return response.json().get("access_token")
             except (httpx.RequestError, httpx.HTTPStatusError) as e:
@@ -30,22 +94,76 @@ class MarzbanPanel(PanelAPI):
                 await asyncio.sleep(1)
         return None
 
+    async def _get_cached_token(self, rejected_token: Optional[str] = None) -> Optional[str]:
+        """
+        Returns a cached token for this panel, logging in only when the cached one
+        is missing, about to expire, or was just rejected by the panel (rejected_token).
+        Concurrent callers share a single login.
+        """
+        key = self._token_key
+
+        def _usable(entry: Optional[_CachedToken]) -> bool:
+            return bool(entry) and entry.expires_at > time.time() and entry.access_token != rejected_token
+
+        cached = _token_cache.get(key)
+        if _usable(cached):
+            return cached.access_token
+
+        lock = _token_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Another caller may have refreshed the token while we were waiting.
+            cached = _token_cache.get(key)
+            if _usable(cached):
+                return cached.access_token
+
+            token = await self._get_token()
+            if not token:
+                _token_cache.pop(key, None)
+                return None
+
+            expiry = _get_jwt_expiry(token) or (time.time() + TOKEN_FALLBACK_TTL_SECONDS)
+            _token_cache[key] = _CachedToken(
+                access_token=token,
+                expires_at=expiry - TOKEN_REFRESH_MARGIN_SECONDS,
+            )
+            return token
+
     async def _api_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
         """Performs a generic API request to the Marzban panel."""
-        token = await self._get_token()
+        async with self._using_client():
+            return await self._send_request(method, endpoint, **kwargs)
+
+    async def _send_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
+        token = await self._get_cached_token()
         if not token:
             LOGGER.error(f"API Request Failed: Could not authenticate with panel {self.api_url}")
             return {"error": "Authentication failed"}
 
         url = f"{self.api_url.rstrip('/')}{endpoint}"
-        headers = {"Authorization": f"Bearer {token}", **kwargs.pop('headers', {})}
+        extra_headers = kwargs.pop('headers', {})
+        headers = {"Authorization": f"Bearer {token}", **extra_headers}
+        reauthenticated = False
 
         for attempt in range(3):
             try:
-                response = await _client.request(method, url, headers=headers, **kwargs)
+                self.stats.requests += 1
+                started = time.monotonic()
+                try:
+                    response = await self._client.request(method, url, headers=headers, **kwargs)
+                finally:
+                    self.stats.total_latency += time.monotonic() - started
                 response.raise_for_status()
                 return response.json() if response.content else {"success": True}
             except httpx.HTTPStatusError as e:
+                # The cached token was revoked or expired early: log in again, once.
+                if e.response.status_code == 401 and not reauthenticated:
+                    reauthenticated = True
+                    token = await self._get_cached_token(rejected_token=token)
+                    if not token:
+                        return {"error": "Authentication failed", "status_code": 401}
+                    headers = {"Authorization": f"Bearer {token}", **extra_headers}
+                    continue
+
                 # Retry only on server errors (5xx)
                 if 500 <= e.response.status_code < 600:
                     await asyncio.sleep(attempt + 1)
@@ -57,17 +175,65 @@ class MarzbanPanel(PanelAPI):
                     error_detail = e.response.text
                 
                 # Log client errors (4xx) but don't retry excessively
+                self.stats.failures += 1
                 LOGGER.warning(f"API Error {e.response.status_code} on {method} {url}: {error_detail}")
                 return {"error": error_detail, "status_code": e.response.status_code}
             except httpx.RequestError as e:
+                self.stats.failures += 1
                 LOGGER.warning(f"Network error on attempt {attempt + 1} for {url}: {e}")
                 await asyncio.sleep(attempt + 1)
         
         return {"error": "Network error or persistent server issue"}
 
-    async def get_all_users(self) -> Optional[List[Dict[str, Any]]]:
+    def _parse_users(self, page: Dict[str, Any]) -> List[PanelUser]:
+        # Only the fields the bot uses are kept; proxies, inbounds, links etc. are dropped here.
+        return [PanelUser.from_dict(user, panel_id=self.panel_id) for user in page.get("users") or []]
+
+    async def get_all_users(self) -> Optional[List[PanelUser]]:
         response = await self._api_request("GET", "/api/users", timeout=40.0)
-        return response.get("users") if "error" not in response else None
+        return self._parse_users(response) if "error" not in response else None
+
+    async def _get_users_page(self, offset: int, limit: int) -> Dict[str, Any]:
+        # Sorting by creation time keeps offsets stable while new users are being added.
+        params = {"offset": offset, "limit": limit, "sort": "created_at"}
+        response = await self._api_request("GET", "/api/users", params=params, timeout=40.0)
+        if "error" in response:
+            raise PanelRequestError(f"Failed to fetch users {offset}-{offset + limit} from {self.api_url}: {response['error']}")
+        return response
+
+    async def iter_users(
+        self, page_size: int = USERS_PAGE_SIZE, concurrency: int = USERS_PAGE_CONCURRENCY
+    ) -> AsyncIterator[PanelUser]:
+        """
+        Streams all users page by page using offset/limit, keeping at most
+        `concurrency` pages in flight. Users are yielded in panel order.
+        """
+        async with self._using_client():
+            first_page = await self._get_users_page(0, page_size)
+            for user in self._parse_users(first_page):
+                yield user
+
+            total = first_page.get("total") or 0
+            offsets = iter(range(page_size, total, page_size))
+            pending: deque = deque()
+
+            def _schedule_next() -> None:
+                offset = next(offsets, None)
+                if offset is not None:
+                    pending.append(asyncio.create_task(self._get_users_page(offset, page_size)))
+
+            try:
+                for _ in range(max(concurrency, 1)):
+                    _schedule_next()
+
+                while pending:
+                    page = await pending.popleft()
+                    _schedule_next()
+                    for user in self._parse_users(page):
+                        yield user
+            finally:
+                for task in pending:
+                    task.cancel()
 
     async def get_user_data(self, username: str) -> Optional[Dict[str, Any]]:
         if not username: return None
@@ -77,12 +243,14 @@ class MarzbanPanel(PanelAPI):
     async def create_user(self, payload: dict) -> Tuple[bool, Any]:
         response = await self._api_request("POST", "/api/user", json=payload)
         if "error" not in response:
+            self._notify_user_written(response.get("username") or payload.get("username", ""), response)
             return True, response
         return False, response.get("error", "Unknown error")
 
     async def delete_user(self, username: str) -> Tuple[bool, str]:
         response = await self._api_request("DELETE", f"/api/user/{username}")
         if "error" not in response:
+            self._notify_user_written(username, None, deleted=True)
             return True, "User deleted successfully."
         return False, response.get("error", "Unknown error")
 
@@ -109,12 +277,14 @@ class MarzbanPanel(PanelAPI):
         response = await self._api_request("PUT", f"/api/user/{username}", json=updated_payload)
         
         if "error" not in response:
+            self._notify_user_written(username, response if response.get("username") else None)
             return True, "User updated successfully."
         return False, response.get("error", "Unknown error")
     
     async def reset_user_traffic(self, username: str) -> Tuple[bool, str]:
         response = await self._api_request("POST", f"/api/user/{username}/reset")
         if "error" not in response:
+            self._notify_user_written(username, response if response.get("username") else None)
             return True, "Traffic reset successfully."
         return False, response.get("error", "Unknown error")
 
@@ -122,6 +292,7 @@ class MarzbanPanel(PanelAPI):
         """Revokes and regenerates the subscription link for a user."""
         response = await self._api_request("POST", f"/api/user/{username}/revoke_sub")
         if "error" not in response:
+            self._notify_user_written(username, response if response.get("username") else None)
             return True, response
         return False, response.get("error", "Unknown error")
     
@@ -0,0 +1,103 @@
+# FILE: core/panel_api/panel_user.py
+# Compact record for users returned by panel list endpoints.
+
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+class PanelUser:
+    """
+    The fields of a panel user that the bot actually reads, in a slotted object.
+
+    User lists used to be kept as the full panel JSON (proxies, inbounds, links,
+    excluded inbounds, notes, ...) in every cache; this keeps only what the lists,
+    and reports need. The full payload is fetched on demand with
+    `fetch_full(api)` (i.e. `api.get_user_data(username)`).
+
+    Code written against the old dicts keeps working: `user['username']`,
+    `user.get('expire')`, `user['panel_name'] = ...` and `{**user}` are supported
+    for the fields below. Unknown keys read as missing.
+    """
+
+    FIELDS: Tuple[str, ...] = (
+        'username', 'status', 'expire', 'data_limit', 'used_traffic',
+        'online_at', 'subscription_url', 'panel_id', 'panel_name',
+    )
+    __slots__ = FIELDS
+
+    def __init__(
+        self, username: str, status: str = 'active', expire: Optional[int] = None,
+        data_limit: Optional[int] = None, used_traffic: int = 0, online_at: Optional[str] = None,
+        subscription_url: Optional[str] = None, panel_id: Optional[int] = None, panel_name: Optional[str] = None,
+    ):
+        self.username = username
+        self.status = status
+        self.expire = expire
+        self.data_limit = data_limit
+        self.used_traffic = used_traffic
+        self.online_at = online_at
+        self.subscription_url = subscription_url
+        self.panel_id = panel_id
+        self.panel_name = panel_name
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], **overrides) -> 'PanelUser':
+        """Builds a record from a panel JSON user (Marzban's keys match the field names)."""
+        return cls(
+            username=data.get('username') or '',
+            status=data.get('status') or 'active',
+            expire=data.get('expire'),
+            data_limit=data.get('data_limit'),
+            used_traffic=data.get('used_traffic') or 0,
+            online_at=data.get('online_at'),
+            subscription_url=data.get('subscription_url'),
+            panel_id=overrides.get('panel_id', data.get('panel_id')),
+            panel_name=overrides.get('panel_name', data.get('panel_name')),
+        )
+
+    def merged(self, data: Dict[str, Any]) -> 'PanelUser':
+        """A copy with the fields present in `data` (e.g. a write response) applied."""
+        return PanelUser.from_dict({**self.to_dict(), **data})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    async def fetch_full(self, api) -> Optional[Dict[str, Any]]:
+        """The complete panel payload for this user, or None on failure."""
+        return await api.get_user_data(self.username)
+
+    # --- Mapping interface (compatibility with the old JSON dicts); only known fields can be set ---
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            return default if value is None else value
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self.FIELDS:
+            raise KeyError(f"PanelUser has no field '{key}'")
+        setattr(self, key, value)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.FIELDS
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.FIELDS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PanelUser):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None  # Mutable (panel_name/panel_id are filled in by the caches)
+
+    def __repr__(self) -> str:
+        return f"PanelUser(username={self.username!r}, status={self.status!r}, panel_id={self.panel_id!r})"
@@ -6,6 +6,7 @@ import httpx
 import asyncio
 
 from .base import PanelAPI
+from .panel_user import PanelUser
 
 LOGGER = logging.getLogger(__name__)
 
@@ -15,60 +16,104 @@ class XUIPanel(PanelAPI):
     This class handles authentication and interaction with the X-UI API.
     """
 
-    def __init__(self, credentials: Dict[str, Any]):
+    def __init__(self, credentials: Dict[str, Any], limits: Optional[httpx.Limits] = None):
         super().__init__(credentials)
         self.session: Optional[httpx.AsyncClient] = None
+        self._limits = limits
+        self._login_lock = asyncio.Lock()
         self.base_api_url: str = f"{self.api_url.rstrip('/')}/panel/api"
         # X-UI API is often located at /panel/api, adjust if needed
 
-    async def _login(self) -> bool:
+    async def _login(self, rejected_session: Optional[httpx.AsyncClient] = None) -> bool:
         """
-        Logs into the X-UI panel to obtain a session cookie.
+        Logs into the X-UI panel to obtain a session cookie, unless a session is
+        already open and was not just rejected by the panel (rejected_session).
+        Concurrent callers share a single login; self.session is only set once the
+        login has succeeded, so nobody sees a session without its cookie.
         Returns True on success, False on failure.
         """
-        if self.session:
-            # Check if session is still valid (optional, for now we assume it is)
+        if self.session and self.session is not rejected_session:
             return True
 
-        self.session = httpx.AsyncClient()
-        login_url = f"{self.api_url.rstrip('/')}/login"
-        payload = {'username': self.username, 'password': self.password}
-        
-        try:
-            response = await self.session.post(login_url, data=payload, timeout=10)
-            response.raise_for_status() # Raise an exception for 4xx/5xx status codes
-            
-            # X-UI login success is often indicated by a redirect or a specific cookie.
-            # We need to verify this based on the actual X-UI API behavior.
-            if "session" in response.cookies:
-                LOGGER.info(f"Successfully logged into X-UI panel at {self.api_url}")
+        async with self._login_lock:
+            # Another caller may have logged in while we were waiting.
+            if self.session and self.session is not rejected_session:
                 return True
-            else:
-                LOGGER.error(f"X-UI login failed for {self.api_url}: Session cookie not found.")
-                await self.session.aclose()
-                self.session = None
+
+            session = httpx.AsyncClient(limits=self._limits) if self._limits else httpx.AsyncClient()
+            self.stats.logins += 1
+            login_url = f"{self.api_url.rstrip('/')}/login"
+            payload = {'username': self.username, 'password': self.password}
+
+            try:
+                response = await session.post(login_url, data=payload, timeout=10)
+                response.raise_for_status() # Raise an exception for 4xx/5xx status codes
+
+                # X-UI login success is often indicated by a redirect or a specific cookie.
+                # We need to verify this based on the actual X-UI API behavior.
+                if "session" not in response.cookies:
+                    LOGGER.error(f"X-UI login failed for {self.api_url}: Session cookie not found.")
+                    await session.aclose()
+                    return False
+            except httpx.HTTPStatusError as e:
+                LOGGER.error(f"X-UI login failed for {self.api_url} with status {e.response.status_code}.")
+                await session.aclose()
+                return False
+            except Exception as e:
+                LOGGER.error(f"An unexpected error occurred during X-UI login: {e}", exc_info=True)
+                await session.aclose()
                 return False
 
-        except httpx.HTTPStatusError as e:
-            LOGGER.error(f"X-UI login failed for {self.api_url} with status {e.response.status_code}.")
-            return False
-        except Exception as e:
-            LOGGER.error(f"An unexpected error occurred during X-UI login: {e}", exc_info=True)
-            return False
+            LOGGER.info(f"Successfully logged into X-UI panel at {self.api_url}")
+            previous, self.session = self.session, session
+            if previous:
+                await previous.aclose()
+            return True
+
+    @staticmethod
+    def _session_expired(response: httpx.Response) -> bool:
+        """The panel answers an expired cookie with 401 or a redirect to its login page."""
+        if response.status_code == 401:
+            return True
+        if response.is_redirect:
+            return "login" in response.headers.get("location", "")
+        return False
+
+    async def _get(self, url: str) -> httpx.Response:
+        """GET with the session cookie; logs in again, once, if the panel has dropped the session."""
+        session = self.session
+        response = await session.get(url, timeout=10)
+        if self._session_expired(response):
+            LOGGER.info(f"X-UI session for {self.api_url} expired, logging in again.")
+            if not await self._login(rejected_session=session) or not self.session:
+                response.raise_for_status()
+                return response
+            response = await self.session.get(url, timeout=10)
+        return response
+
+    async def aclose(self) -> None:
+        """Closes the login session (and its cookie jar), if one is open."""
+        if self.session:
+            await self.session.aclose()
+            self.session = None
 
     # --- REPLACE THE get_all_users METHOD in xui.py ---
 
-    async def get_all_users(self) -> Optional[List[Dict[str, Any]]]:
+    async def get_all_users(self) -> Optional[List[PanelUser]]:
         """
         Retrieves a list of all clients from all inbounds in the X-UI panel.
         """
+        async with self._using_client():
+            return await self._fetch_all_users()
+
+    async def _fetch_all_users(self) -> Optional[List[PanelUser]]:
         if not await self._login() or not self.session:
             return None
         
         list_url = f"{self.base_api_url}/inbounds/list"
         
         try:
-            response = await self.session.get(list_url, timeout=10)
+            response = await self._get(list_url)
             response.raise_for_status()
             data = response.json()
 
@@ -96,16 +141,14 @@ class XUIPanel(PanelAPI):
 
                     status = "active" if client.get("enable") else "disabled"
                     
-                    standardized_user = {
-                        "username": client.get("email", ""),
-                        "status": status,
-                        "used_traffic": client.get("up", 0) + client.get("down", 0),
-                        "data_limit": client.get("total", 0),
-                        "expire": expire_timestamp,
-                        # --- Additional useful info from X-UI ---
-                        "xui_id": client.get("id"),
-                        "xui_inbound_id": client.get("inboundId"),
-                    }
+                    standardized_user = PanelUser(
+                        username=client.get("email", ""),
+                        status=status,
+                        used_traffic=client.get("up", 0) + client.get("down", 0),
+                        data_limit=client.get("total", 0),
+                        expire=expire_timestamp,
+                        panel_id=self.panel_id,
+                    )
                     all_clients.append(standardized_user)
             
             return all_clients
@@ -1,11 +1,13 @@
 from . import admin
 from . import admin_daily_note
 from . import bot_managed_user
+from . import bot_persistence
 from . import bot_setting
 from . import broadcast
 from . import financial_setting
 from . import guide
 from . import marzban_link
+from . import media_file
 from . import non_renewal_user
 from . import panel_credential
 from . import pending_invoice
@@ -1,6 +1,7 @@
 # FILE: database/crud/admin.py
 
-from sqlalchemy import select, delete
+from typing import Optional, Set, Tuple
+from sqlalchemy import select, delete, func
 from sqlalchemy.exc import IntegrityError
 from database.engine import get_session as get_async_session
 from database.models.admin import Admin
@@ -8,6 +9,43 @@ import logging
 
 LOGGER = logging.getLogger(__name__)
 
+# --- Caching Mechanism ---
+# The support-admin ids are kept in memory so role checks cost a set lookup.
+# Writes through this module update the set directly; changes made by other
+# processes are picked up by refresh_admin_cache_if_changed(), which compares
+# a cheap fingerprint of the table.
+_support_admin_ids: Optional[Set[int]] = None
+_admin_table_version: Optional[Tuple[int, int, int]] = None
+
+async def _get_admin_table_version() -> Tuple[int, int, int]:
+    async with get_async_session() as session:
+        result = await session.execute(
+            select(func.count(Admin.id), func.coalesce(func.max(Admin.id), 0), func.coalesce(func.sum(Admin.user_id), 0))
+        )
+        count, max_id, id_sum = result.one()
+        return int(count), int(max_id), int(id_sum)
+
+async def load_admin_cache() -> None:
+    """(Re)loads the support-admin id set from the database."""
+    global _support_admin_ids, _admin_table_version
+    version = await _get_admin_table_version()
+    async with get_async_session() as session:
+        result = await session.execute(select(Admin.user_id))
+        _support_admin_ids = set(result.scalars().all())
+    _admin_table_version = version
+    LOGGER.info(f"Admin cache loaded with {len(_support_admin_ids)} support admin(s).")
+
+async def refresh_admin_cache_if_changed() -> bool:
+    """Reloads the cache if the admins table changed since the last load. Returns True if it reloaded."""
+    try:
+        if _support_admin_ids is not None and await _get_admin_table_version() == _admin_table_version:
+            return False
+        await load_admin_cache()
+        return True
+    except Exception as e:
+        LOGGER.error(f"Failed to refresh admin cache: {e}")
+        return False
+
 async def add_admin(user_id: int, username: str = None, promoted_by: str = "System") -> bool:
     """
     Promotes a user to support admin.
@@ -18,6 +56,8 @@ async def add_admin(user_id: int, username: str = None, promoted_by: str = "Syst
             new_admin = Admin(user_id=user_id, username=username, promoted_by=promoted_by)
             session.add(new_admin)
             await session.commit()
+            if _support_admin_ids is not None:
+                _support_admin_ids.add(user_id)
             return True
         except IntegrityError:
             await session.rollback()
@@ -34,6 +74,8 @@ async def remove_admin(user_id: int) -> bool:
             stmt = delete(Admin).where(Admin.user_id == user_id)
             result = await session.execute(stmt)
             await session.commit()
+            if _support_admin_ids is not None:
+                _support_admin_ids.discard(user_id)
             return result.rowcount > 0
         except Exception as e:
             LOGGER.error(f"Error removing admin {user_id}: {e}")
@@ -46,7 +88,7 @@ async def get_all_admins():
         return result.scalars().all()
 
 async def is_support_admin(user_id: int) -> bool:
-    """Checks if a user is a support admin in the database."""
-    async with get_async_session() as session:
-        result = await session.execute(select(Admin).where(Admin.user_id == user_id))
-        return result.scalar_one_or_none() is not None
\ No newline at end of file
+    """Checks if a user is a support admin. Served from memory once the cache is loaded."""
+    if _support_admin_ids is None:
+        await load_admin_cache()
+    return user_id in _support_admin_ids
\ No newline at end of file
@@ -0,0 +1,79 @@
+# --- START OF FILE database/crud/bot_persistence.py ---
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, delete, func, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from ..engine import get_session
+from ..models.bot_persistence import PersistenceEntry
+
+LOGGER = logging.getLogger(__name__)
+
+# Rows per INSERT ... ON DUPLICATE KEY UPDATE / DELETE ... IN statement.
+WRITE_CHUNK_SIZE = 200
+
+EntryKey = Tuple[str, str, str]  # (namespace, owner, data_key)
+
+
+async def load_namespace(namespace: str, owner: Optional[str] = None) -> List[Tuple[str, str, bytes]]:
+    """Returns (owner, data_key, value) for every entry of a namespace (optionally of one owner)."""
+    async with get_session() as session:
+        stmt = select(PersistenceEntry.owner, PersistenceEntry.data_key, PersistenceEntry.value).where(
+            PersistenceEntry.namespace == namespace
+        )
+        if owner is not None:
+            stmt = stmt.where(PersistenceEntry.owner == owner)
+        result = await session.execute(stmt)
+        return [tuple(row) for row in result.all()]
+
+
+async def has_entries() -> bool:
+    async with get_session() as session:
+        result = await session.execute(select(func.count()).select_from(PersistenceEntry))
+        return (result.scalar_one() or 0) > 0
+
+
+async def write_entries(upserts: Dict[EntryKey, bytes], deletes: Iterable[EntryKey]) -> bool:
+    """Applies a batch of changed and removed entries in a single transaction."""
+    deletes = list(deletes)
+    if not upserts and not deletes:
+        return True
+    rows = [
+        {"namespace": ns, "owner": owner, "data_key": key, "value": value}
+        for (ns, owner, key), value in upserts.items()
+    ]
+    async with get_session() as session:
+        try:
+            for i in range(0, len(rows), WRITE_CHUNK_SIZE):
+                stmt = mysql_insert(PersistenceEntry).values(rows[i:i + WRITE_CHUNK_SIZE])
+                stmt = stmt.on_duplicate_key_update(value=stmt.inserted.value, updated_at=func.now())
+                await session.execute(stmt)
+            for i in range(0, len(deletes), WRITE_CHUNK_SIZE):
+                await session.execute(
+                    delete(PersistenceEntry).where(
+                        tuple_(PersistenceEntry.namespace, PersistenceEntry.owner, PersistenceEntry.data_key)
+                        .in_(deletes[i:i + WRITE_CHUNK_SIZE])
+                    )
+                )
+            await session.commit()
+            return True
+        except Exception as e:
+            await session.rollback()
+            LOGGER.error(f"Failed to write {len(rows)} persistence entries ({len(deletes)} deletions): {e}", exc_info=True)
+            return False
+
+
+async def delete_owner(namespace: str, owner: str) -> None:
+    """Removes everything stored for one user/chat."""
+    async with get_session() as session:
+        try:
+            await session.execute(
+                delete(PersistenceEntry).where(PersistenceEntry.namespace == namespace, PersistenceEntry.owner == owner)
+            )
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            LOGGER.error(f"Failed to drop persistence entries for {namespace} {owner}: {e}", exc_info=True)
+
+# --- END OF FILE database/crud/bot_persistence.py ---
@@ -12,12 +12,19 @@ from ..models.bot_setting import BotSetting
 LOGGER = logging.getLogger(__name__)
 
 _bot_settings_cache: Optional[Dict[str, Any]] = None
+# Bumped whenever settings change, so caches built from them (e.g. keyboards) can tell they are stale.
+_settings_version = 0
+
+
+def get_settings_version() -> int:
+    return _settings_version
 
 
 def _invalidate_cache():
     """Clears the in-memory cache for bot settings."""
-    global _bot_settings_cache
+    global _bot_settings_cache, _settings_version
     _bot_settings_cache = None
+    _settings_version += 1
     LOGGER.info("Bot settings cache invalidated.")
 
 
@@ -54,7 +61,7 @@ async def save_bot_settings(settings_to_update: Dict[str, Any]) -> bool:
     Uses an INSERT ... ON DUPLICATE KEY UPDATE statement for efficiency.
     ✨ FIX: Directly updates the cache upon successful save to ensure consistency.
     """
-    global _bot_settings_cache
+    global _bot_settings_cache, _settings_version
     if not settings_to_update:
         return True
 
@@ -84,6 +91,7 @@ async def save_bot_settings(settings_to_update: Dict[str, Any]) -> bool:
             
             if _bot_settings_cache is not None:
                 _bot_settings_cache.update(settings_to_update)
+                _settings_version += 1
                 LOGGER.info(f"Bot settings cache updated with: {list(settings_to_update.keys())}")
             else:
                 _invalidate_cache()
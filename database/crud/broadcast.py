@@ -1,36 +1,86 @@
 # --- START OF FILE database/crud/broadcast.py ---
 import logging
-from typing import Optional
+from typing import List, Optional
 
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..engine import get_session
-from ..models.broadcast import Broadcast
+from ..models.broadcast import Broadcast, BROADCAST_RUNNING, BROADCAST_PAUSED
 
 LOGGER = logging.getLogger(__name__)
 
 
-async def log_broadcast(
-    admin_id: int,
-    message_content: dict,
-    success_count: int,
-    failure_count: int
+async def create_broadcast(
+    admin_id: int, kind: str, message_content: dict, target_user_ids: Optional[List[int]] = None,
+    segment: Optional[dict] = None,
 ) -> Optional[Broadcast]:
-    """Logs a completed broadcast message to the database."""
+    """Creates a broadcast in the 'running' state, before anything is sent."""
     async with get_session() as session:
         try:
             new_broadcast = Broadcast(
                 admin_id=admin_id,
+                kind=kind,
                 message_content=message_content,
-                success_count=success_count,
-                failure_count=failure_count
+                target_user_ids=target_user_ids,
+                segment=segment,
+                status=BROADCAST_RUNNING,
+                success_count=0,
+                failure_count=0,
             )
             session.add(new_broadcast)
             await session.commit()
             await session.refresh(new_broadcast)
             return new_broadcast
         except Exception as e:
-            LOGGER.error(f"Could not log broadcast for admin {admin_id}: {e}", exc_info=True)
+            LOGGER.error(f"Could not create {kind} broadcast for admin {admin_id}: {e}", exc_info=True)
             return None
 
+
+async def get_broadcast(broadcast_id: int) -> Optional[Broadcast]:
+    async with get_session() as session:
+        return await session.get(Broadcast, broadcast_id)
+
+
+async def get_unfinished_broadcasts(status: str = BROADCAST_RUNNING) -> List[Broadcast]:
+    async with get_session() as session:
+        result = await session.execute(
+            select(Broadcast).where(Broadcast.status == status).order_by(Broadcast.broadcast_id)
+        )
+        return list(result.scalars().all())
+
+
+async def save_progress(broadcast_id: int, last_user_id: Optional[int], success_count: int, failure_count: int) -> bool:
+    """Checkpoints a running broadcast: every recipient up to last_user_id has been handled."""
+    async with get_session() as session:
+        try:
+            await session.execute(
+                update(Broadcast)
+                .where(Broadcast.broadcast_id == broadcast_id)
+                .values(last_user_id=last_user_id, success_count=success_count, failure_count=failure_count)
+            )
+            await session.commit()
+            return True
+        except Exception as e:
+            LOGGER.error(f"Could not checkpoint broadcast {broadcast_id}: {e}", exc_info=True)
+            return False
+
+
+async def set_status(broadcast_id: int, status: str, only_if_unfinished: bool = False) -> bool:
+    """
+    Changes a broadcast's status. With only_if_unfinished, completed or cancelled
+    broadcasts are left alone. Returns True if a row was changed.
+    """
+    async with get_session() as session:
+        try:
+            stmt = update(Broadcast).where(Broadcast.broadcast_id == broadcast_id).values(status=status)
+            if only_if_unfinished:
+                stmt = stmt.where(Broadcast.status.in_((BROADCAST_RUNNING, BROADCAST_PAUSED)))
+            result = await session.execute(stmt)
+            await session.commit()
+            return result.rowcount > 0
+        except Exception as e:
+            LOGGER.error(f"Could not set status of broadcast {broadcast_id} to '{status}': {e}", exc_info=True)
+            return False
+
 # --- END OF FILE database/crud/broadcast.py ---
\ No newline at end of file
@@ -1,7 +1,7 @@
 # --- START OF FILE database/crud/marzban_link.py (REVISED) ---
 
 import logging
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Iterable
 from sqlalchemy import select, update, delete
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -12,6 +12,9 @@ from ..models.user import User
 
 LOGGER = logging.getLogger(__name__)
 
+# Keys per SELECT ... WHERE ... IN (...) in the bulk loaders.
+IN_CHUNK_SIZE = 1000
+
 # Renamed from link_user_to_telegram for clarity on create/update behavior
 async def create_or_update_link(marzban_username: str, telegram_user_id: int, panel_id: int) -> bool:
     """Links a Marzban username to a Telegram user ID and a Panel ID."""
@@ -182,4 +185,25 @@ async def get_all_marzban_links_with_panel() -> List[MarzbanTelegramLink]:
     async with get_session() as session:
         stmt = select(MarzbanTelegramLink).options(selectinload(MarzbanTelegramLink.panel))
         result = await session.execute(stmt)
-        return list(result.scalars().all())
\ No newline at end of file
+        return list(result.scalars().all())
+
+
+async def get_links_for_usernames(usernames: Iterable[str]) -> Dict[str, MarzbanTelegramLink]:
+    """
+    Bulk version of get_link_with_panel_by_username: returns {marzban_username: link}
+    with the panel preloaded, using chunked IN queries.
+    """
+    usernames = list(dict.fromkeys(usernames))
+    links: Dict[str, MarzbanTelegramLink] = {}
+    if not usernames:
+        return links
+    async with get_session() as session:
+        for i in range(0, len(usernames), IN_CHUNK_SIZE):
+            stmt = (
+                select(MarzbanTelegramLink)
+                .where(MarzbanTelegramLink.marzban_username.in_(usernames[i:i + IN_CHUNK_SIZE]))
+                .options(selectinload(MarzbanTelegramLink.panel))
+            )
+            result = await session.execute(stmt)
+            links.update({link.marzban_username: link for link in result.scalars().all()})
+    return links
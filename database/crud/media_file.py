@@ -0,0 +1,43 @@
+# --- START OF FILE database/crud/media_file.py ---
+import logging
+from typing import Optional
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from ..engine import get_session
+from ..models.media_file import MediaFile
+
+LOGGER = logging.getLogger(__name__)
+
+
+async def get_file_id(content_hash: str) -> Optional[str]:
+    async with get_session() as session:
+        media = await session.get(MediaFile, content_hash)
+        return media.file_id if media else None
+
+
+async def save_file_id(content_hash: str, file_id: str) -> bool:
+    async with get_session() as session:
+        try:
+            stmt = mysql_insert(MediaFile).values(content_hash=content_hash, file_id=file_id)
+            stmt = stmt.on_duplicate_key_update(file_id=stmt.inserted.file_id)
+            await session.execute(stmt)
+            await session.commit()
+            return True
+        except Exception as e:
+            LOGGER.error(f"Could not save file_id for media {content_hash[:12]}: {e}", exc_info=True)
+            return False
+
+
+async def delete_file_id(content_hash: str) -> bool:
+    async with get_session() as session:
+        try:
+            await session.execute(delete(MediaFile).where(MediaFile.content_hash == content_hash))
+            await session.commit()
+            return True
+        except Exception as e:
+            LOGGER.error(f"Could not delete file_id for media {content_hash[:12]}: {e}", exc_info=True)
+            return False
+
+# --- END OF FILE database/crud/media_file.py ---
@@ -2,7 +2,7 @@
 import random
 import logging
 import time
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Awaitable
 from sqlalchemy import update
 from sqlalchemy import select, delete
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -17,12 +17,37 @@ _panel_cache: Optional[List[PanelCredential]] = None
 _cache_timestamp: float = 0.0
 CACHE_DURATION_SECONDS = 60  # Cache for 60 seconds (adjust as needed)
 
+# Bumped on every panel add/change/delete, so caches built from the panel list can tell they are stale.
+_panels_version = 0
+
+def get_panels_version() -> int:
+    return _panels_version
+
 def _invalidate_cache():
     """Invalidates the panel cache."""
-    global _panel_cache
+    global _panel_cache, _panels_version
     _panel_cache = None
+    _panels_version += 1
     LOGGER.info("Panel cache has been invalidated.")
 
+# --- Change Listeners ---
+# Layers above the DB (e.g. the panel API registry) register here to drop their
+# own per-panel state whenever a panel is added, changed or removed.
+PanelChangeListener = Callable[[Optional[int]], Awaitable[None]]
+_change_listeners: List[PanelChangeListener] = []
+
+def register_change_listener(listener: PanelChangeListener) -> None:
+    """Registers an async callback that receives the changed panel's ID."""
+    if listener not in _change_listeners:
+        _change_listeners.append(listener)
+
+async def _notify_panel_changed(panel_id: Optional[int]) -> None:
+    for listener in _change_listeners:
+        try:
+            await listener(panel_id)
+        except Exception as e:
+            LOGGER.error(f"Panel change listener {listener} failed for panel {panel_id}: {e}", exc_info=True)
+
 # --- CRUD Functions ---
 
 async def add_panel(panel_data: Dict[str, Any]) -> Optional[PanelCredential]:
@@ -40,6 +65,7 @@ async def add_panel(panel_data: Dict[str, Any]) -> Optional[PanelCredential]:
             await session.commit()
             await session.refresh(new_panel)
             _invalidate_cache() # ✨ Invalidate cache on change
+            await _notify_panel_changed(new_panel.id)
             return new_panel
         except Exception as e:
             await session.rollback()
@@ -118,6 +144,7 @@ async def delete_panel(panel_id: int) -> bool:
 
             if result.rowcount > 0:
                 _invalidate_cache()  # Invalidate cache on change
+                await _notify_panel_changed(panel_id)
                 LOGGER.info(f"Successfully deleted panel {panel_id} and its associated template config.")
                 return True
             
@@ -155,6 +182,7 @@ async def toggle_test_panel_status(panel_id: int) -> Optional[bool]:
             await session.commit()
             
             _invalidate_cache() # Invalidate cache as panel data has changed
+            await _notify_panel_changed(panel_id)
             return new_status
         except Exception as e:
             await session.rollback()
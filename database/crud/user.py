@@ -2,10 +2,10 @@
 
 import logging
 from decimal import Decimal
-from typing import List, Optional
-from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, Optional, Set
+from datetime import datetime, timedelta
 
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update, case, exists
 from sqlalchemy.orm import selectinload
 from telegram import User as TelegramUser
 from config import config
@@ -13,10 +13,28 @@ from config import config
 from ..engine import get_session
 from ..models.user import User
 from ..models.marzban_link import MarzbanTelegramLink
+from ..models.pending_invoice import PendingInvoice
 
 
 LOGGER = logging.getLogger(__name__)
 
+# Keys per SELECT ... WHERE ... IN (...) in the bulk loaders.
+IN_CHUNK_SIZE = 1000
+
+# Rows per keyset page when streaming broadcast recipients.
+RECIPIENT_BATCH_SIZE = 1000
+
+# Broadcast audience segments: {'type': SEGMENT_*, 'value': ...}. None means every user.
+SEGMENT_ACTIVE = "active"                    # value: days since last_activity
+SEGMENT_HAS_SERVICE = "has_service"          # has at least one linked panel account
+SEGMENT_NO_SERVICE = "no_service"
+SEGMENT_PANEL = "panel"                      # value: panel id the user has a service on
+SEGMENT_MIN_BALANCE = "min_balance"          # value: wallet balance strictly above
+SEGMENT_PENDING_INVOICE = "pending_invoice"  # has an invoice still in 'pending'
+SEGMENT_TYPES = (
+    SEGMENT_ACTIVE, SEGMENT_HAS_SERVICE, SEGMENT_NO_SERVICE, SEGMENT_PANEL, SEGMENT_MIN_BALANCE, SEGMENT_PENDING_INVOICE
+)
+
 
 async def get_user_by_id(user_id: int) -> Optional[User]:
     async with get_session() as session:
@@ -58,6 +76,20 @@ async def get_user_wallet_balance(user_id: int) -> Optional[Decimal]:
     return None
 
 
+async def get_wallet_balances(user_ids: Iterable[int]) -> Dict[int, Decimal]:
+    """Bulk version of get_user_wallet_balance. Unknown user ids are left out."""
+    user_ids = list(set(user_ids))
+    balances: Dict[int, Decimal] = {}
+    if not user_ids:
+        return balances
+    async with get_session() as session:
+        for i in range(0, len(user_ids), IN_CHUNK_SIZE):
+            stmt = select(User.user_id, User.wallet_balance).where(User.user_id.in_(user_ids[i:i + IN_CHUNK_SIZE]))
+            result = await session.execute(stmt)
+            balances.update({user_id: balance for user_id, balance in result.all()})
+    return balances
+
+
 async def increase_wallet_balance(user_id: int, amount: Decimal | float) -> Optional[Decimal]:
     if not isinstance(amount, Decimal):
         amount = Decimal(str(amount))
@@ -66,8 +98,9 @@ async def increase_wallet_balance(user_id: int, amount: Decimal | float) -> Opti
         LOGGER.warning(f"Attempted to increase wallet with non-positive amount: {amount}")
         return None
 
+    # FOR UPDATE holds the row until commit, so concurrent adjustments can't lose a write.
     async with get_session() as session:
-        user = await session.get(User, user_id)
+        user = await session.get(User, user_id, with_for_update=True)
         if user:
             user.wallet_balance += amount
             await session.commit()
@@ -86,7 +119,7 @@ async def decrease_wallet_balance(user_id: int, amount: Decimal | float) -> Opti
         return None
 
     async with get_session() as session:
-        user = await session.get(User, user_id)
+        user = await session.get(User, user_id, with_for_update=True)
         if user:
             if user.wallet_balance >= amount:
                 user.wallet_balance -= amount
@@ -127,15 +160,81 @@ async def increment_user_test_account_count(user_id: int) -> bool:
     return False
 
 
-async def get_all_user_ids() -> List[int]:
-    async with get_session() as session:
-        admin_ids = tuple(config.AUTHORIZED_USER_IDS)
-        stmt = select(User.user_id)
-        if admin_ids:
-            stmt = stmt.where(User.user_id.not_in(admin_ids))
-        
-        result = await session.execute(stmt)
-        return list(result.scalars().all())
+def _segment_condition(segment: Optional[dict]):
+    """SQL condition on User for a segment, or None for everyone. The subqueries are correlated EXISTS on indexed columns."""
+    if not segment:
+        return None
+    kind, value = segment.get('type'), segment.get('value')
+    has_link = exists().where(MarzbanTelegramLink.telegram_user_id == User.user_id)
+
+    if kind == SEGMENT_ACTIVE:
+        return User.last_activity >= datetime.now() - timedelta(days=int(value))
+    if kind == SEGMENT_HAS_SERVICE:
+        return has_link
+    if kind == SEGMENT_NO_SERVICE:
+        return ~has_link
+    if kind == SEGMENT_PANEL:
+        return exists().where(
+            MarzbanTelegramLink.telegram_user_id == User.user_id, MarzbanTelegramLink.panel_id == int(value)
+        )
+    if kind == SEGMENT_MIN_BALANCE:
+        return User.wallet_balance > Decimal(str(value))
+    if kind == SEGMENT_PENDING_INVOICE:
+        return exists().where(PendingInvoice.user_id == User.user_id, PendingInvoice.status == 'pending')
+    raise ValueError(f"Unknown audience segment: {segment}")
+
+
+def _audience_conditions(segment: Optional[dict], include_unreachable: bool) -> list:
+    """Broadcast audience: every user except admins, reachable ones only by default, narrowed by `segment`."""
+    conditions = []
+    admin_ids = tuple(config.AUTHORIZED_USER_IDS)
+    if admin_ids:
+        conditions.append(User.user_id.not_in(admin_ids))
+    if not include_unreachable:
+        conditions.append(User.is_reachable.is_(True))
+    segment_condition = _segment_condition(segment)
+    if segment_condition is not None:
+        conditions.append(segment_condition)
+    return conditions
+
+
+async def iter_recipient_ids(
+    after: Optional[int] = None, batch_size: int = RECIPIENT_BATCH_SIZE, include_unreachable: bool = False,
+    segment: Optional[dict] = None,
+) -> AsyncIterator[int]:
+    """
+    Streams the broadcast audience's ids (narrowed by `segment`), in
+    ascending order, starting after `after`. Each page is a
+    `WHERE user_id > :last ORDER BY user_id LIMIT n` query on the primary key
+    in its own short session, so no connection is held while the caller is
+    sending and memory stays at one page.
+    """
+    conditions = _audience_conditions(segment, include_unreachable)
+    last = after
+    while True:
+        stmt = select(User.user_id).where(*conditions).order_by(User.user_id).limit(batch_size)
+        if last is not None:
+            stmt = stmt.where(User.user_id > last)
+        async with get_session() as session:
+            page = list((await session.execute(stmt)).scalars().all())
+        for user_id in page:
+            yield user_id
+        if len(page) < batch_size:
+            return
+        last = page[-1]
+
+
+async def count_segment(segment: Optional[dict], include_unreachable: bool = False) -> Optional[int]:
+    """How many users a broadcast to `segment` would reach. None on an invalid segment or a database error."""
+    try:
+        conditions = _audience_conditions(segment, include_unreachable)
+        async with get_session() as session:
+            result = await session.execute(select(func.count(User.user_id)).where(*conditions))
+            return result.scalar_one()
+    except Exception as e:
+        LOGGER.error(f"Failed to count audience segment {segment}: {e}")
+        return None
+
     
 async def get_total_users_count() -> int:
     """Returns the total number of users in the users table."""
@@ -160,22 +259,81 @@ async def update_user_note(user_id: int, note: Optional[str]) -> bool:
             LOGGER.error(f"Failed to update user note for {user_id}: {e}")
             return False
 
-async def update_last_activity(user_id: int) -> bool:
+ACTIVITY_UPDATE_CHUNK_SIZE = 500
+
+
+async def bulk_update_last_activity(activity: Dict[int, datetime]) -> Optional[int]:
+    """
+    Writes many last_activity timestamps with one UPDATE ... CASE statement per chunk.
+    Unknown user ids are ignored. Returns the number of rows updated, or None on failure.
+    """
+    if not activity:
+        return 0
+    items = list(activity.items())
+    updated = 0
     async with get_session() as session:
         try:
-            result = await session.execute(
-                select(User).where(User.user_id == user_id)
-            )
-            user = result.scalar_one_or_none()
-            if user:
-                user.last_activity = datetime.now()
-                await session.commit()
-                return True
-            return False
+            for i in range(0, len(items), ACTIVITY_UPDATE_CHUNK_SIZE):
+                chunk = dict(items[i:i + ACTIVITY_UPDATE_CHUNK_SIZE])
+                stmt = (
+                    update(User)
+                    .where(User.user_id.in_(chunk.keys()))
+                    # Any update from a user proves the chat works again.
+                    .values(last_activity=case(chunk, value=User.user_id), is_reachable=True, unreachable_since=None)
+                    .execution_options(synchronize_session=False)
+                )
+                result = await session.execute(stmt)
+                updated += result.rowcount
+            await session.commit()
+            return updated
         except Exception as e:
             await session.rollback()
-            LOGGER.error(f"Failed to update last activity for {user_id}: {e}")
-            return False
+            LOGGER.error(f"Failed to bulk update last activity for {len(items)} users: {e}")
+            return None
+
+async def mark_users_unreachable(unreachable: Dict[int, datetime]) -> Optional[int]:
+    """
+    Flags users whose chat rejected a message (blocked the bot, deleted account).
+    Recipient queries skip them until their next update. Returns rows updated, or None on failure.
+    """
+    if not unreachable:
+        return 0
+    items = list(unreachable.items())
+    updated = 0
+    async with get_session() as session:
+        try:
+            for i in range(0, len(items), ACTIVITY_UPDATE_CHUNK_SIZE):
+                chunk = dict(items[i:i + ACTIVITY_UPDATE_CHUNK_SIZE])
+                stmt = (
+                    update(User)
+                    .where(User.user_id.in_(chunk.keys()))
+                    .values(is_reachable=False, unreachable_since=case(chunk, value=User.user_id))
+                    .execution_options(synchronize_session=False)
+                )
+                result = await session.execute(stmt)
+                updated += result.rowcount
+            await session.commit()
+            return updated
+        except Exception as e:
+            await session.rollback()
+            LOGGER.error(f"Failed to mark {len(items)} users unreachable: {e}")
+            return None
+
+
+async def get_unreachable_user_ids(user_ids: Iterable[int]) -> Set[int]:
+    """The subset of `user_ids` currently flagged unreachable."""
+    user_ids = list(set(user_ids))
+    unreachable: Set[int] = set()
+    if not user_ids:
+        return unreachable
+    async with get_session() as session:
+        for i in range(0, len(user_ids), IN_CHUNK_SIZE):
+            stmt = select(User.user_id).where(
+                User.user_id.in_(user_ids[i:i + IN_CHUNK_SIZE]), User.is_reachable.is_(False)
+            )
+            result = await session.execute(stmt)
+            unreachable.update(result.scalars().all())
+    return unreachable
 
 async def get_user_with_relations(user_id: int) -> Optional[User]:
     async with get_session() as session:
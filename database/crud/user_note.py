@@ -1,7 +1,7 @@
 # --- START OF FILE database/crud/user_note.py (REVISED) ---
 import logging
 from decimal import Decimal
-from typing import Optional, List # <--- List را اضافه کنید
+from typing import Optional, List, Dict, Iterable # <--- List را اضافه کنید
 
 from sqlalchemy import delete # <--- delete را اضافه کنید
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -12,6 +12,9 @@ from ..models.user_note import UserNote
 
 LOGGER = logging.getLogger(__name__)
 
+# Keys per SELECT ... WHERE ... IN (...) in the bulk loaders.
+IN_CHUNK_SIZE = 1000
+
 
 async def get_user_note(marzban_username: str) -> Optional[UserNote]:
     """Retrieves subscription details for a specific marzban user."""
@@ -85,4 +88,20 @@ async def get_all_test_accounts() -> List[UserNote]:
         result = await session.execute(stmt)
         return list(result.scalars().all())
 
+async def get_notes_for_usernames(usernames: Iterable[str]) -> Dict[str, UserNote]:
+    """
+    Bulk version of get_user_note: returns {username.lower(): note} for those that have one.
+    Keys are lowercased because the column compares case-insensitively, like get_user_note.
+    """
+    usernames = list(dict.fromkeys(usernames))
+    notes: Dict[str, UserNote] = {}
+    if not usernames:
+        return notes
+    async with get_session() as session:
+        for i in range(0, len(usernames), IN_CHUNK_SIZE):
+            stmt = select(UserNote).where(UserNote.username.in_(usernames[i:i + IN_CHUNK_SIZE]))
+            result = await session.execute(stmt)
+            notes.update({note.username.lower(): note for note in result.scalars().all()})
+    return notes
+
 # --- END OF FILE database/crud/user_note.py (REVISED) ---
\ No newline at end of file
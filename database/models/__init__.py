@@ -16,11 +16,13 @@ from .volumetric_tier import VolumetricTier
 from .admin_daily_note import AdminDailyNote
 from .bot_setting import BotSetting
 from .admin import Admin
+from .bot_persistence import PersistenceEntry
+from .media_file import MediaFile
 
 __all__ = [
     "Base", "User", "PanelCredential", "MarzbanTelegramLink",
     "UserNote", "BotManagedUser", "TemplateConfig", "NonRenewalUser",
     "PendingInvoice", "Broadcast", "FinancialSetting", "Guide",
     "UnlimitedPlan", "VolumetricTier", "AdminDailyNote",
-    "BotSetting", "Admin"
+    "BotSetting", "Admin", "PersistenceEntry", "MediaFile"
 ]
\ No newline at end of file
@@ -0,0 +1,35 @@
+# --- START OF FILE database/models/bot_persistence.py ---
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import LargeBinary, String, TIMESTAMP
+from sqlalchemy.dialects.mysql import MEDIUMBLOB
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from . import Base
+
+
+class PersistenceEntry(Base):
+    """
+    One key of the bot's persisted state (user_data / chat_data / bot_data,
+    conversation states, callback data). Storing state key by key lets the
+    persistence layer rewrite only what changed.
+    """
+    __tablename__ = "bot_persistence"
+
+    # 'user', 'chat', 'bot', 'conversation' or 'callback'
+    namespace: Mapped[str] = mapped_column(String(16), primary_key=True)
+    # user/chat id, conversation name, or '' for bot-wide data
+    owner: Mapped[str] = mapped_column(String(64), primary_key=True)
+    data_key: Mapped[str] = mapped_column(String(191), primary_key=True)
+    value: Mapped[bytes] = mapped_column(LargeBinary().with_variant(MEDIUMBLOB(), "mysql"), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP, nullable=False, server_default=func.now(), onupdate=func.now()
+    )
+
+    def __repr__(self) -> str:
+        return f"<PersistenceEntry(namespace='{self.namespace}', owner='{self.owner}', key='{self.data_key}')>"
+
+# --- END OF FILE database/models/bot_persistence.py ---
@@ -7,8 +7,10 @@ from typing import TYPE_CHECKING, Optional
 from sqlalchemy import (
     BigInteger,
     ForeignKey,
+    Index,
     Integer,
     JSON,
+    String,
     TIMESTAMP,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -20,8 +22,16 @@ if TYPE_CHECKING:
     from .user import User
 
 
+# Broadcast lifecycle. 'running' and 'paused' broadcasts are unfinished and can be resumed.
+BROADCAST_RUNNING = "running"
+BROADCAST_PAUSED = "paused"
+BROADCAST_CANCELLED = "cancelled"
+BROADCAST_COMPLETED = "completed"
+
+
 class Broadcast(Base):
     __tablename__ = "broadcasts"
+    __table_args__ = (Index("ix_broadcasts_status", "status"),)
 
     broadcast_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     admin_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.user_id"), nullable=False)
@@ -33,6 +43,17 @@ class Broadcast(Base):
     success_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     failure_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
 
+    # --- Resumable delivery ---
+    # Recipients are sent to in ascending user_id order; every id up to and
+    # including last_user_id has been handled, so a resumed broadcast continues
+    # after it instead of messaging everyone again.
+    kind: Mapped[str] = mapped_column(String(16), nullable=False, default="custom", server_default="custom")
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default=BROADCAST_COMPLETED, server_default=BROADCAST_COMPLETED)
+    target_user_ids: Mapped[Optional[list]] = mapped_column(JSON, nullable=True)  # None = all users
+    segment: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)  # Audience segment, see crud/user.py
+    last_user_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP, nullable=True, onupdate=func.now())
+
     # Relationship to the User model (the admin who sent the broadcast)
     admin: Mapped["User"] = relationship(back_populates="broadcasts")
 
@@ -3,7 +3,7 @@ from __future__ import annotations # ✨ FIX: This MUST be the very first line o
 
 from typing import TYPE_CHECKING, Optional
 
-from sqlalchemy import BigInteger, Boolean, ForeignKey, String, Integer
+from sqlalchemy import BigInteger, Boolean, ForeignKey, Index, String, Integer
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from . import Base
@@ -15,6 +15,7 @@ if TYPE_CHECKING:
 
 class MarzbanTelegramLink(Base):
     __tablename__ = "marzban_telegram_links"
+    __table_args__ = (Index("ix_marzban_telegram_links_panel_user", "panel_id", "telegram_user_id"),)
 
     marzban_username: Mapped[str] = mapped_column(String(255), primary_key=True)
     panel_id: Mapped[int] = mapped_column(
@@ -0,0 +1,30 @@
+# --- START OF FILE database/models/media_file.py ---
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import String, TIMESTAMP
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from . import Base
+
+
+class MediaFile(Base):
+    """
+    Telegram file_id of a photo the bot has already uploaded, keyed by the
+    SHA-256 of its bytes. Later sends of the same content reference the
+    file_id instead of uploading the bytes again.
+    """
+    __tablename__ = "media_files"
+
+    content_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    file_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP, nullable=False, server_default=func.now()
+    )
+
+    def __repr__(self) -> str:
+        return f"<MediaFile(hash='{self.content_hash[:12]}', file_id='{self.file_id[:16]}...')>"
+
+# --- END OF FILE database/models/media_file.py ---
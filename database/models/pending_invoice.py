@@ -5,6 +5,7 @@ from typing import TYPE_CHECKING, Dict, Any
 from sqlalchemy import (
     BigInteger,
     ForeignKey,
+    Index,
     Integer,
     String,
     TIMESTAMP,
@@ -21,6 +22,7 @@ if TYPE_CHECKING:
 
 class PendingInvoice(Base):
     __tablename__ = "pending_invoices"
+    __table_args__ = (Index("ix_pending_invoices_user_status", "user_id", "status"),)
 
     invoice_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.user_id"), nullable=False, index=True)
@@ -18,12 +18,13 @@ from sqlalchemy import (
     BigInteger,
     Boolean,
     DECIMAL,
+    Index,
     Integer,
     String,
     TIMESTAMP,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import expression, func
 
 from .base import Base
 
@@ -35,6 +36,11 @@ if TYPE_CHECKING:
 
 class User(Base):
     __tablename__ = "users"
+    # Used by the broadcast audience segments (database/crud/user.py).
+    __table_args__ = (
+        Index("ix_users_last_activity", "last_activity"),
+        Index("ix_users_wallet_balance", "wallet_balance"),
+    )
 
     user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     first_name: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -51,6 +57,11 @@ class User(Base):
     )
     admin_note: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     last_activity: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP, nullable=True)
+    # False once a send fails with Forbidden / chat not found; reset on the user's next update.
+    is_reachable: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, default=True, server_default=expression.true()
+    )
+    unreachable_since: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP, nullable=True)
 
 
     # Relationships
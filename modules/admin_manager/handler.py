@@ -5,25 +5,22 @@ from telegram.ext import (
     CallbackQueryHandler, ConversationHandler, CommandHandler
 )
 from . import actions
-import re
 from shared.translator import translator
+from shared.router import Router
 
 def register(application: Application) -> None:
     # متن دکمه ورود به مدیریت مدیران (از فایل ترجمه helper_tools)
     manage_admins_text = translator.get("keyboards.helper_tools.manage_admins")
     
     # 1. هندلر دکمه "مدیریت مدیران" (نقطه ورود)
-    application.add_handler(
-        MessageHandler(
-            filters.Regex(f"^{re.escape(manage_admins_text)}$"), 
-            actions.show_admin_management_menu
-        )
-    )
+    router = Router("admin_manager")
+    router.add_text(manage_admins_text, actions.show_admin_management_menu)
 
     # 2. هندلرهای کال‌بک (لیست، جزئیات و حذف)
-    application.add_handler(CallbackQueryHandler(actions.show_admin_management_menu, pattern="^admin_manage_list$"))
-    application.add_handler(CallbackQueryHandler(actions.show_admin_detail, pattern="^admin_manage_detail_"))
-    application.add_handler(CallbackQueryHandler(actions.delete_admin, pattern="^admin_manage_delete_"))
+    router.add_callback("^admin_manage_list$", actions.show_admin_management_menu)
+    router.add_callback("^admin_manage_detail_", actions.show_admin_detail)
+    router.add_callback("^admin_manage_delete_", actions.delete_admin)
+    application.add_handler(router)
     
     # 3. مکالمه افزودن مدیر جدید
     add_admin_conv = ConversationHandler(
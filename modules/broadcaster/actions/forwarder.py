@@ -3,18 +3,13 @@
 # FILE: modules/broadcaster/actions/forwarder.py (NEW FILE)
 
 import logging
-import uuid
-import asyncio
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes, ConversationHandler
 from telegram.constants import ParseMode
-from telegram.error import TelegramError
 
 from shared.translator import _
 from shared.keyboards import get_message_builder_cancel_keyboard
-# --- MODIFIED IMPORT ---
-from database.crud import user as crud_user
-# --- ----------------- ---
+from . import runner
 
 LOGGER = logging.getLogger(__name__)
 
@@ -58,53 +53,17 @@ async def schedule_forward_job(update: Update, context: ContextTypes.DEFAULT_TYP
         await query.edit_message_text(_("broadcaster.forwarder.error_not_found"))
         return await cancel_forwarder(update, context)
 
-    job_id = f"forward_{uuid.uuid4()}"
-    job_data = {
-        "admin_id": query.from_user.id,
-        "from_chat_id": chat_id,
-        "message_id": message_id
-    }
-
-    context.job_queue.run_once(forward_message_job, 1, data=job_data, name=job_id)
+    content = {"from_chat_id": chat_id, "message_id": message_id}
+    broadcast_id = await runner.start_broadcast(context, query.from_user.id, runner.KIND_FORWARD, content)
+    if broadcast_id is None:
+        await query.edit_message_text(_("broadcaster.control.start_failed"))
+        return await cancel_forwarder(update, context)
 
-    await query.edit_message_text(_("broadcaster.forwarder.job_scheduled", job_id=job_id), parse_mode=ParseMode.HTML)
+    await query.edit_message_text(_("broadcaster.forwarder.job_scheduled", job_id=broadcast_id), parse_mode=ParseMode.HTML)
     
     # Clean up and end conversation
     return await cancel_forwarder(update, context)
 
-async def forward_message_job(context: ContextTypes.DEFAULT_TYPE) -> None:
-    """The actual job that forwards the message to all users."""
-    job_data = context.job.data
-    admin_id = job_data['admin_id']
-    from_chat_id = job_data['from_chat_id']
-    message_id = job_data['message_id']
-
-    user_ids = await crud_user.get_all_user_ids()
-    total = len(user_ids)
-    success, failure = 0, 0
-    
-    LOGGER.info(f"Starting forward broadcast job '{context.job.name}' for {total} users.")
-
-    for user_id in user_ids:
-        try:
-            await context.bot.forward_message(
-                chat_id=user_id,
-                from_chat_id=from_chat_id,
-                message_id=message_id
-            )
-            success += 1
-        except TelegramError as e:
-            failure += 1
-            LOGGER.warning(f"Forward broadcast failed for user {user_id}: {e}")
-        await asyncio.sleep(0.1) # Rate limit: 10 messages per second
-
-    report = _("broadcaster.job_report", job_id=context.job.name, total=total, success=success, failure=failure)
-    
-    from shared.keyboards import get_admin_main_menu_keyboard
-    await context.bot.send_message(admin_id, report, parse_mode=ParseMode.HTML)
-    await context.bot.send_message(admin_id, _("broadcaster.back_to_main"), reply_markup=get_admin_main_menu_keyboard())
-    LOGGER.info(f"Forward broadcast job '{context.job.name}' finished. Success: {success}, Failure: {failure}")
-
 # FILE: modules/broadcaster/actions/forwarder.py
 
 async def cancel_forwarder(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -1,19 +1,17 @@
 # --- START OF FILE modules/broadcaster/actions/main.py (REVISED) ---
 
 import logging
-import asyncio
 import html
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes, ConversationHandler
 from telegram.constants import ParseMode
 from telegram.error import TelegramError
 
+from database.crud import panel_credential as crud_panel
+from database.crud import user as crud_user
 from shared.translator import _
 from shared.keyboards import get_broadcaster_menu_keyboard, get_message_builder_cancel_keyboard, get_deeplink_targets_keyboard
-# --- MODIFIED IMPORTS ---
-from database.crud import broadcast as crud_broadcast
-from database.crud import user as crud_user
-# --- ------------------ ---
+from . import runner
 
 LOGGER = logging.getLogger(__name__)
 
@@ -21,8 +19,12 @@ LOGGER = logging.getLogger(__name__)
 (
     BUILDER_MENU, AWAITING_CONTENT, AWAITING_BUTTON_TYPE,
     AWAITING_BUTTON_TARGET_MENU, AWAITING_BUTTON_URL, AWAITING_BUTTON_TEXT,
-    AWAITING_PREVIEW_CONFIRMATION, AWAITING_TARGET_TYPE, AWAITING_SINGLE_USER_ID
-) = range(9)
+    AWAITING_PREVIEW_CONFIRMATION, AWAITING_TARGET_TYPE, AWAITING_SINGLE_USER_ID,
+    AWAITING_SEGMENT_VALUE
+) = range(10)
+
+# Segments that need a number typed by the admin.
+_SEGMENTS_WITH_VALUE = (crud_user.SEGMENT_ACTIVE, crud_user.SEGMENT_MIN_BALANCE)
 
 def _get_builder_data(context: ContextTypes.DEFAULT_TYPE) -> dict:
     if 'builder' not in context.user_data:
@@ -30,15 +32,7 @@ def _get_builder_data(context: ContextTypes.DEFAULT_TYPE) -> dict:
     return context.user_data['builder']
 
 def _build_reply_markup_from_data(builder_data: dict) -> InlineKeyboardMarkup | None:
-    if not builder_data.get('buttons'): return None
-    keyboard = []
-    for row_data in builder_data['buttons']:
-        row = []
-        for btn_data in row_data:
-            btn = InlineKeyboardButton(btn_data['text'], url=btn_data.get('url'), callback_data=btn_data.get('callback_data'))
-            row.append(btn)
-        keyboard.append(row)
-    return InlineKeyboardMarkup(keyboard)
+    return runner.build_reply_markup(builder_data.get('buttons'))
 
 async def _send_or_edit_builder_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     builder_data = _get_builder_data(context)
@@ -235,23 +229,121 @@ async def prompt_for_target_type(update: Update, context: ContextTypes.DEFAULT_T
         await update.callback_query.edit_message_text(_("broadcaster.builder.prompt_single_user"))
         return AWAITING_SINGLE_USER_ID
     else:
-        return await schedule_broadcast(update, context)
+        return await prompt_for_segment(update, context)
+
+# --- Audience segments ---
+
+async def prompt_for_segment(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Lets the admin narrow an 'all users' broadcast down to a segment."""
+    query = update.callback_query
+    await query.answer()
+    context.user_data.pop('broadcast_segment', None)
+    button = lambda key, data: InlineKeyboardButton(_(f"broadcaster.segments.buttons.{key}"), callback_data=data)
+    keyboard = [
+        [button("all", "seg_type_all")],
+        [button("active", f"seg_type_{crud_user.SEGMENT_ACTIVE}"), button("min_balance", f"seg_type_{crud_user.SEGMENT_MIN_BALANCE}")],
+        [button("has_service", f"seg_type_{crud_user.SEGMENT_HAS_SERVICE}"), button("no_service", f"seg_type_{crud_user.SEGMENT_NO_SERVICE}")],
+        [button("panel", f"seg_type_{crud_user.SEGMENT_PANEL}"), button("pending_invoice", f"seg_type_{crud_user.SEGMENT_PENDING_INVOICE}")],
+        [InlineKeyboardButton(_("broadcaster.builder.buttons.back_to_builder"), callback_data="builder_back_to_menu")],
+    ]
+    await query.edit_message_text(_("broadcaster.segments.menu_title"), reply_markup=InlineKeyboardMarkup(keyboard))
+    return AWAITING_TARGET_TYPE
+
+async def select_segment(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    segment_type = query.data[len("seg_type_"):]
+
+    if segment_type == "all":
+        return await _show_segment_preview(update, context, None, _("broadcaster.segments.names.all"))
+
+    if segment_type in _SEGMENTS_WITH_VALUE:
+        await query.answer()
+        context.user_data['broadcast_segment_type'] = segment_type
+        await query.edit_message_text(_(f"broadcaster.segments.prompt_{segment_type}"))
+        return AWAITING_SEGMENT_VALUE
+
+    if segment_type == crud_user.SEGMENT_PANEL:
+        panels = await crud_panel.get_all_panels()
+        if not panels:
+            await query.answer(_("broadcaster.segments.no_panels"), show_alert=True)
+            return AWAITING_TARGET_TYPE
+        await query.answer()
+        keyboard = [[InlineKeyboardButton(panel.name, callback_data=f"seg_panel_{panel.id}")] for panel in panels]
+        keyboard.append([InlineKeyboardButton(_("broadcaster.segments.buttons.back"), callback_data="seg_back")])
+        await query.edit_message_text(_("broadcaster.segments.select_panel"), reply_markup=InlineKeyboardMarkup(keyboard))
+        return AWAITING_TARGET_TYPE
+
+    segment = {'type': segment_type}
+    return await _show_segment_preview(update, context, segment, _(f"broadcaster.segments.names.{segment_type}"))
+
+async def select_segment_panel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    panel = await crud_panel.get_panel_by_id(int(query.data[len("seg_panel_"):]))
+    if not panel:
+        await query.answer(_("broadcaster.segments.no_panels"), show_alert=True)
+        return AWAITING_TARGET_TYPE
+    segment = {'type': crud_user.SEGMENT_PANEL, 'value': panel.id}
+    return await _show_segment_preview(update, context, segment, _("broadcaster.segments.names.panel", value=panel.name))
+
+async def process_segment_value(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    segment_type = context.user_data.get('broadcast_segment_type')
+    try:
+        value = int(update.message.text.strip())
+        if value < 0 or (value == 0 and segment_type == crud_user.SEGMENT_ACTIVE):
+            raise ValueError
+    except (ValueError, TypeError):
+        await update.message.reply_text(_("broadcaster.segments.invalid_number"))
+        return AWAITING_SEGMENT_VALUE
+
+    segment = {'type': segment_type, 'value': value}
+    label = _(f"broadcaster.segments.names.{segment_type}", value=f"{value:,}")
+    return await _show_segment_preview(update, context, segment, label)
+
+async def _show_segment_preview(update: Update, context: ContextTypes.DEFAULT_TYPE, segment: dict | None, label: str) -> int:
+    """Counts the segment in SQL and asks for confirmation before anything is sent."""
+    query = update.callback_query
+    if query:
+        await query.answer()
+    count = await crud_user.count_segment(segment)
+
+    if not count:
+        text = _("broadcaster.segments.count_failed") if count is None else _("broadcaster.segments.empty", segment=label)
+        keyboard = [[InlineKeyboardButton(_("broadcaster.segments.buttons.back"), callback_data="seg_back")]]
+    else:
+        context.user_data['broadcast_segment'] = segment
+        text = _("broadcaster.segments.preview", segment=label, count=f"{count:,}")
+        keyboard = [
+            [InlineKeyboardButton(_("broadcaster.segments.buttons.confirm"), callback_data="seg_confirm")],
+            [InlineKeyboardButton(_("broadcaster.segments.buttons.back"), callback_data="seg_back")],
+        ]
+
+    if query:
+        await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode=ParseMode.HTML)
+    else:
+        await update.message.reply_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode=ParseMode.HTML)
+    return AWAITING_TARGET_TYPE
 
-async def schedule_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE, target_user_ids: list = None) -> int:
-    """Schedules the broadcast job by passing data directly to the job context."""
+async def confirm_segment(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    await update.callback_query.answer()
+    return await schedule_broadcast(update, context, segment=context.user_data.get('broadcast_segment'))
+
+async def schedule_broadcast(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, target_user_ids: list = None, segment: dict = None
+) -> int:
+    """Records the broadcast and schedules its (resumable) delivery job."""
     builder_data = _get_builder_data(context)
     
-    # --- ✨ SQLAlchemy Integration: No more db_manager ✨ ---
-    job_data = {
-        "admin_id": update.effective_chat.id,
-        "message_content": {
-            "text": builder_data.get('text'),
-            "photo_id": builder_data.get('photo_id'),
-            "buttons": builder_data.get('buttons', [])
-        },
-        "target_user_ids": target_user_ids
+    message_content = {
+        "text": builder_data.get('text'),
+        "photo_id": builder_data.get('photo_id'),
+        "buttons": builder_data.get('buttons', [])
     }
-    context.job_queue.run_once(send_broadcast_message_job, 1, data=job_data, name=f"broadcast_{update.effective_chat.id}")
+    broadcast_id = await runner.start_broadcast(
+        context, update.effective_chat.id, runner.KIND_CUSTOM, message_content,
+        target_user_ids=target_user_ids, segment=segment
+    )
+    if broadcast_id is None:
+        await context.bot.send_message(update.effective_chat.id, _("broadcaster.control.start_failed"))
     
     if update.callback_query:
         await update.callback_query.message.delete()
@@ -290,55 +382,4 @@ async def show_broadcast_menu(update: Update, context: ContextTypes.DEFAULT_TYPE
     keyboard = get_broadcaster_menu_keyboard()
     await update.message.reply_text(_("broadcaster.main_menu_prompt"), reply_markup=keyboard)
 
-async def send_broadcast_message_job(context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Executes the broadcast, then logs the result to the database."""
-    job_data = context.job.data
-    admin_id = job_data.get("admin_id")
-    message_content = job_data.get("message_content", {})
-    target_user_ids = job_data.get("target_user_ids", [])
-
-    LOGGER.info(f"Starting broadcast job for admin {admin_id}")
-    
-    text = message_content.get("text")
-    photo_id = message_content.get("photo_id")
-    buttons = message_content.get("buttons", [])
-    reply_markup = _build_reply_markup_from_data({'buttons': buttons})
-
-    if not target_user_ids:
-        target_user_ids = await crud_user.get_all_user_ids()
-
-    if not target_user_ids:
-        LOGGER.warning("Broadcast job stopped: No target users found.")
-        await context.bot.send_message(admin_id, _("broadcaster.errors.no_users_found"))
-        return
-        
-    total, success, failure = len(target_user_ids), 0, 0
-
-    for user_id in target_user_ids:
-        try:
-            if photo_id:
-                await context.bot.send_photo(chat_id=user_id, photo=photo_id, caption=text, parse_mode=ParseMode.HTML, reply_markup=reply_markup)
-            else:
-                await context.bot.send_message(chat_id=user_id, text=text, parse_mode=ParseMode.HTML, reply_markup=reply_markup)
-            success += 1
-        except TelegramError as e:
-            failure += 1
-            LOGGER.warning(f"Broadcast failed for user {user_id}: {e}")
-        await asyncio.sleep(0.1)
-
-    # --- ✨ SQLAlchemy Integration: Log the final result ✨ ---
-    await crud_broadcast.log_broadcast(
-        admin_id=admin_id,
-        message_content=message_content,
-        success_count=success,
-        failure_count=failure
-    )
-    # --- ---------------------------------------------------- ---
-
-    report = _("broadcaster.job_report", total=total, success=success, failure=failure)
-    await context.bot.send_message(admin_id, report, parse_mode=ParseMode.HTML)
-    from shared.keyboards import get_admin_main_menu_keyboard
-    await context.bot.send_message(chat_id=admin_id, text=_("broadcaster.back_to_main"), reply_markup=get_admin_main_menu_keyboard())
-    LOGGER.info(f"Job for admin {admin_id} finished. Success: {success}, Failure: {failure}")
-
 # --- END OF FILE modules/broadcaster/actions/main.py (REVISED) ---
\ No newline at end of file
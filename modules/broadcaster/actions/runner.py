@@ -0,0 +1,266 @@
+# FILE: modules/broadcaster/actions/runner.py
+# Resumable broadcasts: checkpointed delivery, pause/resume/cancel and restart recovery.
+
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.constants import ParseMode
+from telegram.error import TelegramError
+from telegram.ext import Application, ContextTypes, JobQueue
+
+from config import config
+from database.crud import broadcast as crud_broadcast
+from database.crud import user as crud_user
+from database.models.broadcast import (
+    BROADCAST_CANCELLED, BROADCAST_COMPLETED, BROADCAST_PAUSED, BROADCAST_RUNNING, Broadcast
+)
+from shared import broadcast_engine
+from shared.log_channel import send_log
+from shared.translator import _
+
+LOGGER = logging.getLogger(__name__)
+
+# Broadcast kinds (stored in broadcasts.kind) and what their message_content holds.
+KIND_CUSTOM = "custom"    # {'text', 'photo_id', 'buttons'}
+KIND_FORWARD = "forward"  # {'from_chat_id', 'message_id'}
+KIND_GIFT = "gift"        # {'text', 'amount'}
+
+CONTROL_PREFIX = "bcast_"  # bcast_{pause|resume|cancel}_{broadcast_id}
+
+
+@dataclass
+class _Control:
+    """In-process switches of a running broadcast job."""
+    paused: bool = False
+    cancelled: bool = False
+    resumed: asyncio.Event = field(default_factory=asyncio.Event)
+
+    async def wait_while_paused(self) -> None:
+        while self.paused and not self.cancelled:
+            self.resumed.clear()
+            await self.resumed.wait()
+
+
+_controls: Dict[int, _Control] = {}
+
+
+class _Watermark:
+    """
+    Recipients go out in ascending user_id order but finish out of order
+    (several senders). `last` is the highest id such that it and every id
+    before it have been handled: the safe point to resume after.
+    """
+
+    def __init__(self, last: Optional[int]):
+        self.last = last
+        self._queued: deque = deque()
+        self._finished: set = set()
+
+    def queued(self, user_id: int) -> None:
+        self._queued.append(user_id)
+
+    def finished(self, user_id: int) -> None:
+        self._finished.add(user_id)
+        while self._queued and self._queued[0] in self._finished:
+            self.last = self._queued.popleft()
+            self._finished.discard(self.last)
+
+
+def build_reply_markup(buttons: List[List[dict]]) -> Optional[InlineKeyboardMarkup]:
+    if not buttons:
+        return None
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(b['text'], url=b.get('url'), callback_data=b.get('callback_data')) for b in row]
+        for row in buttons
+    ])
+
+
+def _make_sender(bot: Bot, broadcast: Broadcast) -> broadcast_engine.SendFunc:
+    content = broadcast.message_content or {}
+
+    if broadcast.kind == KIND_FORWARD:
+        async def send(user_id: int) -> None:
+            await bot.forward_message(chat_id=user_id, from_chat_id=content['from_chat_id'], message_id=content['message_id'])
+    elif broadcast.kind == KIND_GIFT:
+        async def send(user_id: int) -> None:
+            await bot.send_message(chat_id=user_id, text=content['text'])
+    else:
+        text, photo_id = content.get('text'), content.get('photo_id')
+        reply_markup = build_reply_markup(content.get('buttons', []))
+
+        async def send(user_id: int) -> None:
+            if photo_id:
+                await bot.send_photo(chat_id=user_id, photo=photo_id, caption=text, parse_mode=ParseMode.HTML, reply_markup=reply_markup)
+            else:
+                await bot.send_message(chat_id=user_id, text=text, parse_mode=ParseMode.HTML, reply_markup=reply_markup)
+    return send
+
+
+async def _as_async(items):
+    for item in items:
+        yield item
+
+
+async def _recipients(broadcast: Broadcast, control: _Control, watermark: _Watermark):
+    """Recipients still to be sent to, in ascending id order, honouring pause/cancel."""
+    after = broadcast.last_user_id
+    if broadcast.target_user_ids:
+        user_ids = _as_async(uid for uid in sorted(set(broadcast.target_user_ids)) if after is None or uid > after)
+    else:
+        # Streamed in keyset pages, so sending starts at once and memory stays flat.
+        user_ids = crud_user.iter_recipient_ids(after=after, segment=broadcast.segment)
+    async for user_id in user_ids:
+        await control.wait_while_paused()
+        if control.cancelled:
+            return
+        watermark.queued(user_id)
+        yield user_id
+
+
+# --- Admin controls ---
+
+def _controls_keyboard(broadcast_id: int, paused: bool) -> InlineKeyboardMarkup:
+    toggle = (
+        InlineKeyboardButton(_("broadcaster.control.button_resume"), callback_data=f"{CONTROL_PREFIX}resume_{broadcast_id}")
+        if paused else
+        InlineKeyboardButton(_("broadcaster.control.button_pause"), callback_data=f"{CONTROL_PREFIX}pause_{broadcast_id}")
+    )
+    return InlineKeyboardMarkup([[toggle, InlineKeyboardButton(_("broadcaster.control.button_cancel"), callback_data=f"{CONTROL_PREFIX}cancel_{broadcast_id}")]])
+
+
+async def _send_controls(bot: Bot, admin_id: int, broadcast_id: int, text_key: str, paused: bool = False) -> None:
+    try:
+        await bot.send_message(
+            admin_id, _(text_key, job_id=broadcast_id),
+            reply_markup=_controls_keyboard(broadcast_id, paused), parse_mode=ParseMode.HTML
+        )
+    except TelegramError as e:
+        LOGGER.warning(f"Could not send broadcast controls to admin {admin_id}: {e}")
+
+
+def _schedule(job_queue: JobQueue, broadcast_id: int, when: float = 1) -> None:
+    job_queue.run_once(run_broadcast_job, when, data={'broadcast_id': broadcast_id}, name=f"broadcast_{broadcast_id}")
+
+
+async def start_broadcast(
+    context: ContextTypes.DEFAULT_TYPE, admin_id: int, kind: str, content: dict,
+    target_user_ids: Optional[List[int]] = None, segment: Optional[dict] = None,
+) -> Optional[int]:
+    """Records a new broadcast and schedules its delivery. Returns its id, or None on a database error."""
+    broadcast = await crud_broadcast.create_broadcast(admin_id, kind, content, target_user_ids, segment)
+    if not broadcast:
+        return None
+    _schedule(context.job_queue, broadcast.broadcast_id)
+    await _send_controls(context.bot, admin_id, broadcast.broadcast_id, "broadcaster.control.started")
+    return broadcast.broadcast_id
+
+
+async def resume_unfinished_broadcasts(application: Application) -> None:
+    """Called from post_init: picks up broadcasts that were running when the bot stopped."""
+    broadcasts = await crud_broadcast.get_unfinished_broadcasts(BROADCAST_RUNNING)
+    for broadcast in broadcasts:
+        LOGGER.info(f"Resuming broadcast {broadcast.broadcast_id} after user_id {broadcast.last_user_id}.")
+        _schedule(application.job_queue, broadcast.broadcast_id, when=5)
+        await _send_controls(application.bot, broadcast.admin_id, broadcast.broadcast_id, "broadcaster.control.resumed_after_restart")
+    if broadcasts:
+        LOGGER.info(f"Scheduled {len(broadcasts)} unfinished broadcast(s) to resume.")
+
+
+async def handle_broadcast_control(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    action, _sep, id_str = query.data[len(CONTROL_PREFIX):].partition('_')
+    broadcast_id = int(id_str)
+    control = _controls.get(broadcast_id)
+
+    if action == "pause":
+        changed = await crud_broadcast.set_status(broadcast_id, BROADCAST_PAUSED, only_if_unfinished=True)
+        if changed and control:
+            control.paused = True
+    elif action == "resume":
+        changed = await crud_broadcast.set_status(broadcast_id, BROADCAST_RUNNING, only_if_unfinished=True)
+        if changed:
+            if control:
+                control.paused = False
+                control.resumed.set()
+            else:
+                _schedule(context.job_queue, broadcast_id)  # Paused before a restart: no job is running
+    else:
+        changed = await crud_broadcast.set_status(broadcast_id, BROADCAST_CANCELLED, only_if_unfinished=True)
+        if changed and control:
+            control.cancelled = True
+            control.resumed.set()
+
+    if not changed:
+        await query.answer(_("broadcaster.control.already_finished"), show_alert=True)
+        await query.edit_message_reply_markup(reply_markup=None)
+        return
+
+    await query.answer(_(f"broadcaster.control.{action}_done"))
+    if action == "cancel":
+        await query.edit_message_reply_markup(reply_markup=None)
+    else:
+        await query.edit_message_reply_markup(reply_markup=_controls_keyboard(broadcast_id, paused=(action == "pause")))
+
+
+# --- Delivery ---
+
+async def _report(bot: Bot, broadcast: Broadcast, success: int, failure: int, cancelled: bool) -> None:
+    if broadcast.kind == KIND_GIFT:
+        await send_log(bot, _("log.universal_gift_notification_finished", count=success))
+        return
+    report = _("broadcaster.job_report", job_id=broadcast.broadcast_id, total=success + failure, success=success, failure=failure)
+    if cancelled:
+        report = _("broadcaster.control.cancelled_report_prefix") + report
+    from shared.keyboards import get_admin_main_menu_keyboard
+    await bot.send_message(broadcast.admin_id, report, parse_mode=ParseMode.HTML)
+    await bot.send_message(broadcast.admin_id, _("broadcaster.back_to_main"), reply_markup=get_admin_main_menu_keyboard())
+
+
+async def run_broadcast_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Delivers one broadcast from its saved cursor. Progress is checkpointed every
+    BROADCAST_CHECKPOINT_EVERY sends; if the process stops, the broadcast stays
+    'running' and is resumed from the last checkpoint on the next start.
+    """
+    broadcast_id = context.job.data['broadcast_id']
+    if broadcast_id in _controls:
+        return  # Already being delivered by this process
+
+    broadcast = await crud_broadcast.get_broadcast(broadcast_id)
+    if not broadcast or broadcast.status != BROADCAST_RUNNING:
+        return
+
+    control = _controls[broadcast_id] = _Control()
+    watermark = _Watermark(broadcast.last_user_id)
+    counts = {'success': broadcast.success_count or 0, 'failure': broadcast.failure_count or 0, 'since_checkpoint': 0}
+    send_message = _make_sender(context.bot, broadcast)
+
+    async def send(user_id: int) -> None:
+        await control.wait_while_paused()
+        if control.cancelled:
+            raise broadcast_engine.SkipRecipient()
+        await send_message(user_id)
+
+    async def on_result(user_id: int, ok: bool) -> None:
+        counts['success' if ok else 'failure'] += 1
+        watermark.finished(user_id)
+        counts['since_checkpoint'] += 1
+        if counts['since_checkpoint'] >= config.BROADCAST_CHECKPOINT_EVERY:
+            counts['since_checkpoint'] = 0
+            await crud_broadcast.save_progress(broadcast_id, watermark.last, counts['success'], counts['failure'])
+
+    LOGGER.info(f"Starting {broadcast.kind} broadcast {broadcast_id} for admin {broadcast.admin_id} (after user_id {broadcast.last_user_id}).")
+    try:
+        await broadcast_engine.broadcast(_recipients(broadcast, control, watermark), send, on_result=on_result)
+    finally:
+        _controls.pop(broadcast_id, None)
+        await crud_broadcast.save_progress(broadcast_id, watermark.last, counts['success'], counts['failure'])
+
+    final_status = BROADCAST_CANCELLED if control.cancelled else BROADCAST_COMPLETED
+    await crud_broadcast.set_status(broadcast_id, final_status, only_if_unfinished=True)
+    await _report(context.bot, broadcast, counts['success'], counts['failure'], control.cancelled)
+    LOGGER.info(f"Broadcast {broadcast_id} {final_status}. Success: {counts['success']}, Failure: {counts['failure']}")
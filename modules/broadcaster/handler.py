@@ -5,6 +5,7 @@ from shared.auth import admin_only, admin_only_conv
 from shared.translator import _
 from .actions import main as actions
 from .actions import forwarder
+from .actions import runner
 
 def register(application: Application) -> None:
     """Registers all handlers for the broadcaster module."""
@@ -42,6 +43,14 @@ def register(application: Application) -> None:
                 CallbackQueryHandler(actions.prompt_for_target_type, pattern='^preview_confirm$'),
                 CallbackQueryHandler(actions.back_to_builder_menu, pattern='^builder_back_to_menu$'),
             ],
+            actions.AWAITING_TARGET_TYPE: [
+                CallbackQueryHandler(actions.select_segment, pattern='^seg_type_'),
+                CallbackQueryHandler(actions.select_segment_panel, pattern=r'^seg_panel_\d+$'),
+                CallbackQueryHandler(actions.confirm_segment, pattern='^seg_confirm$'),
+                CallbackQueryHandler(actions.prompt_for_segment, pattern='^seg_back$'),
+                CallbackQueryHandler(actions.back_to_builder_menu, pattern='^builder_back_to_menu$'),
+            ],
+            actions.AWAITING_SEGMENT_VALUE: [MessageHandler(filters.TEXT & ~filters.COMMAND, actions.process_segment_value)],
             actions.AWAITING_SINGLE_USER_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, actions.process_single_user_send)],
         },
         fallbacks=[
@@ -77,4 +86,8 @@ def register(application: Application) -> None:
         group=0
     )
     application.add_handler(message_builder_conv, group=0)
-    application.add_handler(forwarder_conv, group=0)
\ No newline at end of file
+    application.add_handler(forwarder_conv, group=0)
+    application.add_handler(
+        CallbackQueryHandler(admin_only(runner.handle_broadcast_control), pattern=r'^bcast_(pause|resume|cancel)_\d+$'),
+        group=0
+    )
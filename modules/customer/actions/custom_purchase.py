@@ -15,7 +15,7 @@ from modules.marzban.actions.data_manager import normalize_username
 from shared.translator import _
 # ✨ NEW IMPORTS FOR MULTI-PANEL ARCHITECTURE
 from typing import Optional, Dict, Any
-from core.panel_api.marzban import MarzbanPanel
+from core.panel_api.helpers import get_api_for_panel
 from database.crud import panel_credential as crud_panel
 # ---
 LOGGER = logging.getLogger(__name__)
@@ -40,9 +40,9 @@ async def _get_user_from_all_panels(username: str) -> Optional[Dict[str, Any]]:
     """Checks for a user's existence across all panels."""
     all_panels = await crud_panel.get_all_panels()
     for panel in all_panels:
-        # For now, we only support Marzban. In future, you would check panel.panel_type
-        credentials = {'api_url': panel.api_url, 'username': panel.username, 'password': panel.password}
-        api = MarzbanPanel(credentials)
+        api = await get_api_for_panel(panel)
+        if not api:
+            continue
         user_data = await api.get_user_data(username)
         if user_data:
             return user_data # Return as soon as user is found on any panel
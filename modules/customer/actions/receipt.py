@@ -22,8 +22,11 @@ from shared.log_channel import send_log
 from shared.callback_types import SendReceipt
 from database.crud import bot_setting as crud_bot_setting
 from modules.payment.actions.approval import approve_payment
+from shared import media_cache
 LOGGER = logging.getLogger(__name__)
 
+RECEIPT_GUIDE_PATH = "assets/receipt_guide.png"
+
 CHOOSE_INVOICE, GET_RECEIPT_PHOTO = range(2)
 
 async def start_receipt_from_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -85,10 +88,9 @@ async def start_receipt_from_invoice(update: Update, context: ContextTypes.DEFAU
     ])
     
     try:
-        with open("assets/receipt_guide.png", "rb") as photo_file:
-            await context.bot.send_photo(chat_id=update.effective_chat.id, photo=photo_file, caption=text_prompt, reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN)
+        await media_cache.send_asset_photo(context.bot, update.effective_chat.id, RECEIPT_GUIDE_PATH, caption=text_prompt, reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN)
     except FileNotFoundError:
-        LOGGER.warning("assets/receipt_guide.png not found. Sending text fallback.")
+        LOGGER.warning(f"{RECEIPT_GUIDE_PATH} not found. Sending text fallback.")
         await context.bot.send_message(chat_id=update.effective_chat.id, text=text_prompt, reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN)
     
     return GET_RECEIPT_PHOTO
@@ -111,10 +113,9 @@ async def select_invoice_for_receipt(update: Update, context: ContextTypes.DEFAU
     keyboard = InlineKeyboardMarkup([[InlineKeyboardButton(_("keyboards.buttons.cancel_operation"), callback_data="cancel_receipt_upload")]])
     
     try:
-        with open("assets/receipt_guide.png", "rb") as photo_file:
-            await context.bot.send_photo(chat_id=update.effective_chat.id, photo=photo_file, caption=text_prompt, reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN)
+        await media_cache.send_asset_photo(context.bot, update.effective_chat.id, RECEIPT_GUIDE_PATH, caption=text_prompt, reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN)
     except FileNotFoundError:
-        LOGGER.warning("assets/receipt_guide.png not found. Sending text fallback.")
+        LOGGER.warning(f"{RECEIPT_GUIDE_PATH} not found. Sending text fallback.")
         await context.bot.send_message(chat_id=update.effective_chat.id, text=text_prompt, reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN)
     
     return GET_RECEIPT_PHOTO
@@ -10,11 +10,10 @@ from telegram.constants import ParseMode
 from config import config
 from shared.translator import _
 from shared.keyboards import get_customer_main_menu_keyboard, get_admin_main_menu_keyboard, get_back_to_main_menu_keyboard
-from database.models.panel_credential import PanelType
 # ✨ NEW IMPORTS FOR MULTI-PANEL ARCHITECTURE
 from typing import Optional, List, Dict, Any
 from core.panel_api.base import PanelAPI
-from core.panel_api.marzban import MarzbanPanel
+from core.panel_api.helpers import get_api_for_panel
 from database.crud import panel_credential as crud_panel
 from modules.marzban.actions import helpers as marzban_helpers # We will use helpers here
 # ---
@@ -33,12 +32,6 @@ PROMPT_FOR_DATA_AMOUNT, CONFIRM_DATA_PURCHASE = range(4, 6)
 ITEMS_PER_PAGE = 8
 
 
-async def _get_api_for_panel(panel) -> Optional[PanelAPI]:
-    """Factory to create an API object from a panel DB object."""
-    if panel.panel_type == PanelType.MARZBAN:
-        credentials = {'api_url': panel.api_url, 'username': panel.username, 'password': panel.password}
-        return MarzbanPanel(credentials)
-    return None
 async def _get_api_for_user(marzban_username: str) -> Optional[PanelAPI]:
     """Finds which panel a user belongs to and returns an API object for it."""
     link = await crud_marzban_link.get_link_with_panel_by_username(marzban_username)
@@ -46,11 +39,7 @@ async def _get_api_for_user(marzban_username: str) -> Optional[PanelAPI]:
         LOGGER.error(f"Could not find a panel for user '{marzban_username}'.")
         return None
     
-    panel = link.panel
-    if panel.panel_type == PanelType.MARZBAN:
-        credentials = {'api_url': panel.api_url, 'username': panel.username, 'password': panel.password}
-        return MarzbanPanel(credentials)
-    return None
+    return await get_api_for_panel(link.panel)
 
 async def _build_paginated_service_keyboard(services: list, page: int = 0) -> InlineKeyboardMarkup:
     start_index = page * ITEMS_PER_PAGE
@@ -111,7 +100,7 @@ async def handle_my_service(update: Update, context: ContextTypes.DEFAULT_TYPE)
         async def fetch_single_service(link):
             if not link.panel: return None
             try:
-                api = await _get_api_for_panel(link.panel)
+                api = await get_api_for_panel(link.panel)
                 if not api: return None
                 
                 # ✨ OPTIMIZATION: Get ONLY this user's data, not the whole list
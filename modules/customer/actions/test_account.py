@@ -1,8 +1,6 @@
 # FILE: modules/customer/actions/test_account.py (FULLY REWRITTEN FOR MULTI-PANEL AND STABILITY)
 import random
 import logging
-import qrcode
-import io
 import html
 import re
 import datetime
@@ -11,7 +9,6 @@ from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from telegram.constants import ParseMode
 from typing import Optional
-from database.models.panel_credential import PanelType
 
 # Local project imports
 from database.crud import (
@@ -25,10 +22,11 @@ from database.crud import (
 from modules.marzban.actions.add_user import add_user_to_panel_from_template
 from shared.translator import translator
 from shared.log_channel import send_log
+from shared import media_cache
+from shared import qr_service
 from shared.keyboards import get_connection_guide_keyboard
 from shared.auth import is_user_admin
-from core.panel_api.base import PanelAPI
-from core.panel_api.marzban import MarzbanPanel
+from core.panel_api.helpers import get_api_for_panel
 
 LOGGER = logging.getLogger(__name__)
 
@@ -36,15 +34,6 @@ LOGGER = logging.getLogger(__name__)
 ASK_USERNAME = 0
 
 
-async def _get_api_for_panel(panel) -> Optional[PanelAPI]:
-    """Helper factory to create an API object from a panel DB object."""
-    # اصلاح شده: استفاده از PanelType.MARZBAN برای مقایسه دقیق
-    if panel.panel_type == PanelType.MARZBAN:
-        credentials = {'api_url': panel.api_url, 'username': panel.username, 'password': panel.password}
-        return MarzbanPanel(credentials)
-    return None
-
-
 async def _cleanup_test_account_job(context: ContextTypes.DEFAULT_TYPE):
     """
     This job runs when a test account expires, notifies the user, and deletes the account.
@@ -60,7 +49,7 @@ async def _cleanup_test_account_job(context: ContextTypes.DEFAULT_TYPE):
         LOGGER.error(f"Cleanup job for '{marzban_username}' failed: Could not find panel link in DB.")
         return
 
-    api = await _get_api_for_panel(link.panel)
+    api = await get_api_for_panel(link.panel)
     if not api:
         LOGGER.error(f"Cleanup job for '{marzban_username}' failed: Could not create API object for panel.")
         return
@@ -143,7 +132,7 @@ async def get_username_and_create_account(update: Update, context: ContextTypes.
     # Select one panel randomly from the active ones
     panel_for_test = random.choice(active_test_panels)
     panel_name_for_log = panel_for_test.name
-    api = await _get_api_for_panel(panel_for_test)
+    api = await get_api_for_panel(panel_for_test)
     if not api:
         await update.message.reply_text(translator.get('marzban.marzban_add_user.error_generic'))
         return ConversationHandler.END
@@ -228,18 +217,14 @@ async def get_username_and_create_account(update: Update, context: ContextTypes.
     qr_code_image = None
     if "N/A" not in sub_link:
         try:
-            img = qrcode.make(sub_link)
-            buffer = io.BytesIO()
-            img.save(buffer, 'PNG')
-            buffer.seek(0)
-            qr_code_image = buffer
+            qr_code_image = await qr_service.render_png(sub_link)
         except Exception as e:
             LOGGER.error(f"Failed to generate QR code for test account: {e}")
 
     await processing_message.delete()
     
     if qr_code_image:
-        await update.message.reply_photo(photo=qr_code_image, caption=caption_text, parse_mode=ParseMode.HTML, reply_markup=reply_markup)
+        await media_cache.send_photo(context.bot, update.effective_chat.id, qr_code_image, caption=caption_text, parse_mode=ParseMode.HTML, reply_markup=reply_markup)
     else:
         await update.message.reply_text(text=caption_text, parse_mode=ParseMode.HTML, disable_web_page_preview=True, reply_markup=reply_markup)
 
@@ -20,14 +20,13 @@ from modules.general.actions import end_conv_and_reroute
 from shared.translator import _
 # ✨ NEW IMPORTS FOR MULTI-PANEL ARCHITECTURE
 from typing import Optional, Dict, Any
-from core.panel_api.marzban import MarzbanPanel
+from core.panel_api.helpers import get_api_for_panel
 from database.crud import panel_credential as crud_panel
 # ---
 LOGGER = logging.getLogger(__name__)
 
 # ✨ MODIFIED IMPORTS AND STATES
 from typing import Optional, Dict, Any
-from core.panel_api.marzban import MarzbanPanel
 from database.crud import panel_credential as crud_panel
 
 SELECT_PANEL, ASK_USERNAME, CHOOSE_PLAN, CONFIRM_UNLIMITED_PLAN = range(4)
@@ -42,9 +41,8 @@ async def _get_user_from_all_panels(username: str) -> Optional[Dict[str, Any]]:
     """Checks for a user's existence across all panels."""
     all_panels = await crud_panel.get_all_panels()
     for panel in all_panels:
-        if panel.panel_type.value == "marzban":
-            credentials = {'api_url': panel.api_url, 'username': panel.username, 'password': panel.password}
-            api = MarzbanPanel(credentials)
+        api = await get_api_for_panel(panel)
+        if api:
             user_data = await api.get_user_data(username)
             if user_data:
                 return user_data
@@ -63,9 +61,8 @@ async def _get_user_from_all_panels(username: str) -> Optional[Dict[str, Any]]:
     """Checks for a user's existence across all panels."""
     all_panels = await crud_panel.get_all_panels()
     for panel in all_panels:
-        if panel.panel_type.value == "marzban":
-            credentials = {'api_url': panel.api_url, 'username': panel.username, 'password': panel.password}
-            api = MarzbanPanel(credentials)
+        api = await get_api_for_panel(panel)
+        if api:
             user_data = await api.get_user_data(username)
             if user_data:
                 return user_data
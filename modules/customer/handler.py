@@ -10,6 +10,7 @@ from telegram.ext import (
 from telegram.ext.filters import BaseFilter
 
 from shared.translator import _
+from shared.router import Router
 from .actions import (
     purchase, renewal, service, panel, guide, wallet,
     receipt as receipt_actions,
@@ -267,19 +268,23 @@ def register(app: Application):
     app.add_handler(wallet_conv, group=1)
     app.add_handler(test_account_conv, group=1)
 
-    app.add_handler(CallbackQueryHandler(guide.show_guides_as_new_message, pattern=r'^show_connection_guides$'), group=1)
-    app.add_handler(MessageHandler(filters.Regex(f'^{re.escape(_("keyboards.customer_main_menu.shop"))}$'), panel.show_customer_panel), group=1)
-    app.add_handler(MessageHandler(filters.Regex(f'^{re.escape(_("keyboards.customer_main_menu.connection_guide"))}$'), guide.show_guides_to_customer), group=1)
-    app.add_handler(MessageHandler(filters.Regex(f'^{re.escape(_("keyboards.general.back_to_main_menu"))}$'), start), group=1)
-    app.add_handler(CallbackQueryHandler(renewal.handle_renewal_request, pattern=r'^customer_renew_request_'), group=1)
-    
-    app.add_handler(CallbackQueryHandler(_gatekeeper(panel.show_customer_panel, not_in_builder_mode_filter), pattern=r'^customer_shop$'), group=1)
-    app.add_handler(CallbackQueryHandler(_gatekeeper(service.handle_my_service, not_in_builder_mode_filter), pattern=r'^customer_my_services$'), group=1)
-    app.add_handler(CallbackQueryHandler(_gatekeeper(guide.show_guides_to_customer, not_in_builder_mode_filter), pattern=r'^customer_guides$'), group=1)
-    app.add_handler(CallbackQueryHandler(_gatekeeper(test_account_actions.handle_test_account_request, not_in_builder_mode_filter), pattern=r'^customer_test_account$'), group=1)
+    # Main-menu buttons and their inline twins, resolved by lookup instead of a regex chain.
+    router = Router("customer")
+    router.add_callback(r'^show_connection_guides$', guide.show_guides_as_new_message)
+    router.add_text(_("keyboards.customer_main_menu.shop"), panel.show_customer_panel)
+    router.add_text(_("keyboards.customer_main_menu.connection_guide"), guide.show_guides_to_customer)
+    router.add_text(_("keyboards.general.back_to_main_menu"), start)
+    router.add_callback(r'^customer_renew_request_', renewal.handle_renewal_request)
+
+    router.add_callback(r'^customer_shop$', _gatekeeper(panel.show_customer_panel, not_in_builder_mode_filter))
+    router.add_callback(r'^customer_my_services$', _gatekeeper(service.handle_my_service, not_in_builder_mode_filter))
+    router.add_callback(r'^customer_guides$', _gatekeeper(guide.show_guides_to_customer, not_in_builder_mode_filter))
+    router.add_callback(r'^customer_test_account$', _gatekeeper(test_account_actions.handle_test_account_request, not_in_builder_mode_filter))
 
     if config.SUPPORT_USERNAME:
-        app.add_handler(MessageHandler(filters.Regex(f'^{re.escape(_("keyboards.customer_main_menu.support"))}$'), purchase.handle_support_button), group=1)
-        app.add_handler(CallbackQueryHandler(guide.send_guide_content_to_customer, pattern=r'^customer_show_guide_'), group=1)
-        app.add_handler(CallbackQueryHandler(guide.show_guides_to_customer, pattern=r'^customer_back_to_guides$'), group=1)
-        app.add_handler(CallbackQueryHandler(guide.close_guide_menu, pattern=r'^close_guide_menu$'), group=1)
\ No newline at end of file
+        router.add_text(_("keyboards.customer_main_menu.support"), purchase.handle_support_button)
+        router.add_callback(r'^customer_show_guide_', guide.send_guide_content_to_customer)
+        router.add_callback(r'^customer_back_to_guides$', guide.show_guides_to_customer)
+        router.add_callback(r'^close_guide_menu$', guide.close_guide_menu)
+
+    app.add_handler(router, group=1)
\ No newline at end of file
@@ -1,7 +1,6 @@
 # --- START OF FILE modules/financials/actions/gift.py (REVISED) ---
 
 import logging
-import asyncio
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from telegram.constants import ParseMode
@@ -13,6 +12,7 @@ from database.crud import user as crud_user
 from shared.keyboards import get_gift_management_keyboard
 from shared.translator import _
 from shared.log_channel import send_log
+from modules.broadcaster.actions import runner as broadcast_runner
 
 LOGGER = logging.getLogger(__name__)
 
@@ -109,11 +109,11 @@ async def process_universal_gift(update: Update, context: ContextTypes.DEFAULT_T
     if affected_users_count is None:
         await update.message.reply_text(_("financials_gift.db_error"))
     elif affected_users_count > 0:
-        user_ids = await crud_user.get_all_user_ids()
-        
-        context.job_queue.run_once(send_gift_notification_job, 1, 
-                           data={'user_ids': user_ids, 'amount': amount}, 
-                           name=f"universal_gift_{update.effective_chat.id}")
+        message = _("financials_gift.universal_gift_user_notification", amount=f"{amount:,}")
+        # Delivered as a resumable broadcast, so a restart doesn't re-notify anyone.
+        await broadcast_runner.start_broadcast(
+            context, admin_user.id, broadcast_runner.KIND_GIFT, {"text": message, "amount": amount}
+        )
         
         feedback = _("financials_gift.universal_gift_success_admin", count=affected_users_count)
         await update.message.reply_text(feedback)
@@ -131,26 +131,4 @@ async def process_universal_gift(update: Update, context: ContextTypes.DEFAULT_T
     await show_financial_menu(update, context, query_to_use=query)
     return ConversationHandler.END
 
-async def send_gift_notification_job(context: ContextTypes.DEFAULT_TYPE):
-    job_context = context.job.data
-    user_ids = job_context['user_ids']
-    amount = job_context['amount']
-    message = _("financials_gift.universal_gift_user_notification", amount=f"{amount:,}")
-    
-    LOGGER.info(f"Starting universal gift notification job for {len(user_ids)} users.")
-    
-    sent_count = 0
-    for user_id in user_ids:
-        try:
-            await context.bot.send_message(chat_id=user_id, text=message)
-            sent_count += 1
-        except Exception as e:
-            LOGGER.warning(f"Failed to send gift notification to user {user_id}: {e}")
-        
-        await asyncio.sleep(0.1)
-
-    log_message = _("log.universal_gift_notification_finished", count=sent_count)
-    await send_log(context.bot, log_message)
-    LOGGER.info(f"Universal gift notification job finished. Sent to {sent_count} users.")
-
 # --- END OF FILE modules/financials/actions/gift.py (REVISED) ---
\ No newline at end of file
@@ -6,6 +6,7 @@ from telegram.ext import (
     filters, ConversationHandler, CommandHandler
 )
 from shared.translator import _
+from shared.router import Router
 from .actions.settings import (
     card_settings_conv,
     plan_name_settings_conv,
@@ -121,24 +122,21 @@ def register(application: Application):
     application.add_handler(gift_management_conv)
 
     # --- Register Standalone Handlers ---
-    financial_settings_btn = f'^{_("keyboards.settings_and_tools.financial_settings")}$'
-    
-    standalone_handlers = [
-        MessageHandler(filters.Regex(financial_settings_btn), show_financial_menu),
-        CallbackQueryHandler(show_payment_methods_menu, pattern=r'^show_payment_methods$'),
-        CallbackQueryHandler(show_plan_management_menu, pattern=r'^show_plan_management$'),
-        CallbackQueryHandler(wallet_admin.show_wallet_settings_menu, pattern=r'^admin_wallet_settings$'),
-        CallbackQueryHandler(show_financial_menu, pattern=r'^back_to_financial_settings$'),
-        CallbackQueryHandler(back_to_main_settings_menu, pattern=r'^back_to_main_settings$'),
-        CallbackQueryHandler(show_plan_management_menu, pattern=r'^back_to_plan_management$'),
-        CallbackQueryHandler(unlimited_plans_admin.manage_unlimited_plans_menu, pattern=r'^admin_manage_unlimited$'),
-        CallbackQueryHandler(unlimited_plans_admin.confirm_delete_plan, pattern=r'^unlimplan_delete_'),
-        CallbackQueryHandler(unlimited_plans_admin.execute_delete_plan, pattern=r'^unlimplan_do_delete_'),
-        CallbackQueryHandler(unlimited_plans_admin.toggle_plan_status, pattern=r'^unlimplan_toggle_'),
-        CallbackQueryHandler(volumetric_plans_admin.manage_volumetric_plans_menu, pattern=r'^admin_manage_volumetric$'),
-        CallbackQueryHandler(volumetric_plans_admin.confirm_delete_tier, pattern=r'^vol_delete_tier_'),
-        CallbackQueryHandler(volumetric_plans_admin.execute_delete_tier, pattern=r'^vol_do_delete_tier_'),
-        CallbackQueryHandler(show_coming_soon, pattern=r'^coming_soon$'),
-    ]
-    application.add_handlers(standalone_handlers)
+    router = Router("financials")
+    router.add_text(_("keyboards.settings_and_tools.financial_settings"), show_financial_menu)
+    router.add_callback(r'^show_payment_methods$', show_payment_methods_menu)
+    router.add_callback(r'^show_plan_management$', show_plan_management_menu)
+    router.add_callback(r'^admin_wallet_settings$', wallet_admin.show_wallet_settings_menu)
+    router.add_callback(r'^back_to_financial_settings$', show_financial_menu)
+    router.add_callback(r'^back_to_main_settings$', back_to_main_settings_menu)
+    router.add_callback(r'^back_to_plan_management$', show_plan_management_menu)
+    router.add_callback(r'^admin_manage_unlimited$', unlimited_plans_admin.manage_unlimited_plans_menu)
+    router.add_callback(r'^unlimplan_delete_', unlimited_plans_admin.confirm_delete_plan)
+    router.add_callback(r'^unlimplan_do_delete_', unlimited_plans_admin.execute_delete_plan)
+    router.add_callback(r'^unlimplan_toggle_', unlimited_plans_admin.toggle_plan_status)
+    router.add_callback(r'^admin_manage_volumetric$', volumetric_plans_admin.manage_volumetric_plans_menu)
+    router.add_callback(r'^vol_delete_tier_', volumetric_plans_admin.confirm_delete_tier)
+    router.add_callback(r'^vol_do_delete_tier_', volumetric_plans_admin.execute_delete_tier)
+    router.add_callback(r'^coming_soon$', show_coming_soon)
+    application.add_handler(router)
     LOGGER.info("Financials settings module handlers registered successfully.")
\ No newline at end of file
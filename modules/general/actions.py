@@ -24,7 +24,7 @@ from shared.keyboards import (
     get_customer_view_for_admin_keyboard
 )
 from modules.marzban.actions.data_manager import normalize_username
-from core.panel_api.marzban import MarzbanPanel
+from core.panel_api.helpers import get_api_for_panel
 
 LOGGER = logging.getLogger(__name__)
 
@@ -39,8 +39,9 @@ async def get_user_data(username: str):
     # Try to find user in all panels
     for panel in all_panels:
         try:
-            credentials = {'api_url': panel.api_url, 'username': panel.username, 'password': panel.password}
-            api = MarzbanPanel(credentials)
+            api = await get_api_for_panel(panel)
+            if not api:
+                continue
             user_data = await api.get_user_data(username)
             if user_data:
                 user_data['panel_id'] = panel.id
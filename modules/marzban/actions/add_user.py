@@ -1,8 +1,6 @@
 # FILE: modules/marzban/actions/add_user.py (FINAL, COMPLETE, AND REWRITTEN FOR MULTI-PANEL)
 
 import datetime
-import qrcode
-import io
 import logging
 import copy
 import secrets
@@ -17,12 +15,13 @@ from telegram.helpers import escape_markdown
 
 # ✨ NEW IMPORTS
 from core.panel_api.base import PanelAPI
-from core.panel_api.marzban import MarzbanPanel
+from core.panel_api.helpers import get_api_for_panel_by_id
 from database.crud import panel_credential as crud_panel
 from modules.marzban.actions import helpers as marzban_helpers
 # ---
-from database.models.panel_credential import PanelType
 from shared.log_channel import send_log
+from shared import media_cache
+from shared import qr_service
 from shared.callback_types import StartManualInvoice
 from .constants import GB_IN_BYTES
 from database.crud import bot_setting as crud_bot_setting
@@ -51,27 +50,6 @@ def generate_random_username(length=8):
     alphabet = string.ascii_lowercase + string.digits
     return ''.join(secrets.choice(alphabet) for i in range(length))
 
-async def _get_api_for_panel(panel_id: int) -> Optional[PanelAPI]:
-    """Factory function to create an API object for a given panel ID."""
-    try:
-        panel = await crud_panel.get_panel_by_id(int(panel_id)) # Ensure int
-        if not panel: 
-            LOGGER.error(f"Panel with ID {panel_id} not found in DB.")
-            return None
-            
-        # Check panel type case-insensitively
-        p_type = str(panel.panel_type.value).lower().strip()
-        
-        if p_type == "marzban":
-            credentials = {'api_url': panel.api_url, 'username': panel.username, 'password': panel.password}
-            return MarzbanPanel(credentials)
-            
-        LOGGER.warning(f"Unsupported panel type: {p_type} for panel {panel_id}")
-        return None
-    except Exception as e:
-        LOGGER.error(f"Error creating API for panel {panel_id}: {e}")
-        return None
-
 async def add_user_to_panel_from_template(
     api: PanelAPI, panel_id: int, data_limit_gb: int, expire_days: int, username: Optional[str] = None, max_ips: Optional[int] = None
 ) -> Optional[Dict[str, Any]]:
@@ -223,7 +201,7 @@ async def add_user_get_username(update: Update, context: ContextTypes.DEFAULT_TY
 
     username = normalize_username(username_input)
     
-    api = await _get_api_for_panel(panel_id)
+    api = await get_api_for_panel_by_id(int(panel_id))
     if not api:
         await update.message.reply_text(translator.get("panel_manager.add.panel_not_found"))
         return ConversationHandler.END
@@ -291,7 +269,7 @@ async def add_user_create(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await query.edit_message_text(translator.get("errors.conversation_data_lost"))
         return ConversationHandler.END
 
-    api = await _get_api_for_panel(panel_id)
+    api = await get_api_for_panel_by_id(int(panel_id))
     if not api:
         await query.edit_message_text(translator.get("panel_manager.add.panel_not_found"))
         return ConversationHandler.END
@@ -326,10 +304,9 @@ async def add_user_create(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             customer_message = await marzban_helpers.format_user_info_for_customer(api, marzban_username)
             subscription_url = new_user_data.get('subscription_url', '')
 
-            qr_image = qrcode.make(subscription_url)
-            bio = io.BytesIO(); bio.name = 'qrcode.png'; qr_image.save(bio, 'PNG'); bio.seek(0)
+            qr_png = await qr_service.render_png(subscription_url)
             try:
-                await context.bot.send_photo(chat_id=customer_id, photo=bio, caption=customer_message, parse_mode=ParseMode.MARKDOWN)
+                await media_cache.send_photo(context.bot, customer_id, qr_png, caption=customer_message, parse_mode=ParseMode.MARKDOWN)
                 
                 # Only show invoice option to Super Admin
                 if admin_user.id in config.AUTHORIZED_USER_IDS:
@@ -1,7 +1,5 @@
 # FILE: modules/marzban/actions/display.py (FINAL VERSION - MODIFIED FOR CALLBACK_TYPES)
 
-import qrcode
-import io
 import time
 import math
 import datetime
@@ -23,12 +21,17 @@ from typing import List, Dict, Any, Optional
 from core.panel_api.base import PanelAPI
 from core.panel_api.marzban import MarzbanPanel
 from database.crud import panel_credential as crud_panel
+from database.crud import bot_managed_user as crud_bot_managed_user
 from modules.marzban.actions import helpers as marzban_helpers
 from shared.translator import _
 # ---
 from modules.general.actions import start as show_main_menu_action
 from shared.auth import admin_only
+from core.panel_api.helpers import get_api_for_panel
 from shared import panel_utils
+from shared import user_columns
+from shared import media_cache
+from shared import qr_service
 
 LOGGER = logging.getLogger(__name__)
 
@@ -55,7 +58,9 @@ def get_user_display_info(user: dict) -> tuple[str, str, bool, str, str]:
     if online_at:
         try:
             online_at_dt = datetime.datetime.fromisoformat(online_at.replace("Z", "+00:00"))
-            if (datetime.datetime.now(datetime.timezone.utc) - online_at_dt).total_seconds() < 180:
+            if online_at_dt.tzinfo is None:
+                online_at_dt = online_at_dt.replace(tzinfo=datetime.timezone.utc)
+            if (datetime.datetime.now(datetime.timezone.utc) - online_at_dt).total_seconds() < user_columns.ONLINE_WINDOW_SECONDS:
                 is_online = True
                 prefix = translator.get("marzban.marzban_display.status_online")
         except (ValueError, TypeError): pass
@@ -69,13 +74,13 @@ def get_user_display_info(user: dict) -> tuple[str, str, bool, str, str]:
             time_left = datetime.datetime.fromtimestamp(expire_timestamp) - datetime.datetime.now()
             days_left_val = time_left.days + (1 if time_left.seconds > 0 else 0)
             days_left_str = translator.get("marzban.marzban_display.days_left", days=days_left_val)
-            if 0 < days_left_val <= 3:
+            if 0 < days_left_val <= user_columns.WARNING_DAYS:
                 is_warning = True
         
         if data_limit > 0:
             data_left_gb = (data_limit - used_traffic) / GB_IN_BYTES
             data_left_str = translator.get("marzban.marzban_display.data_left_gb", gb=data_left_gb)
-            if data_left_gb < 1:
+            if data_left_gb < user_columns.WARNING_DATA_GB:
                 is_warning = True
         
         if is_warning and not is_online:
@@ -83,65 +88,57 @@ def get_user_display_info(user: dict) -> tuple[str, str, bool, str, str]:
             
     return prefix, sanitized_username, is_online, days_left_str, data_left_str
 
-# ----------------- START OF MODIFIED CODE -----------------
+# Telegram rejects callback_data longer than 64 bytes.
+MAX_CALLBACK_DATA_BYTES = 64
 
-# ----------------- START OF FINAL CODE -----------------
-def _get_status_emoji(user: dict) -> str:
-    """Determines the correct status emoji for a user based on their state."""
-    # This check for 'unused' status has the highest priority after online status
-    used_traffic = user.get('used_traffic') or 0
-    if used_traffic == 0:
-        return "🟣" # Unused user
-        
-    online_at = user.get('online_at')
-    if online_at:
-        try:
-            online_at_dt = datetime.datetime.strptime(online_at, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=datetime.timezone.utc)
-            if (datetime.datetime.now(datetime.timezone.utc) - online_at_dt).total_seconds() < 180:
-                return "🟢" # Online user
-        except (ValueError, TypeError):
-            pass
 
-    status = user.get('status', 'disabled')
-    expire_timestamp = user.get('expire')
+def build_page_callback(prefix: str, page: int, after: Optional[str] = None, before: Optional[str] = None) -> str:
+    """
+    Encodes a list page as '{prefix}_{page}' plus an optional keyset cursor
+    ('_a{username}' for the page after a user, '_b{username}' for the page before).
+    Falls back to the bare page number if the cursor would not fit.
+    """
+    callback_data = f"{prefix}_{page}"
+    cursor = f"a{after}" if after is not None else f"b{before}" if before is not None else None
+    if cursor and len(f"{callback_data}_{cursor}".encode('utf-8')) <= MAX_CALLBACK_DATA_BYTES:
+        callback_data = f"{callback_data}_{cursor}"
+    return callback_data
 
-    if status != 'active' or (expire_timestamp and datetime.datetime.fromtimestamp(expire_timestamp) < datetime.datetime.now()):
-        return "🔴" # Expired/Disabled user
 
-    is_warning = False
-    if expire_timestamp:
-        days_left_val = (datetime.datetime.fromtimestamp(expire_timestamp) - datetime.datetime.now()).days
-        if 0 <= days_left_val <= 3:
-            is_warning = True
-    
-        data_limit = user.get('data_limit') or 0
-    if data_limit > 0:
-        data_left_gb = (data_limit - used_traffic) / GB_IN_BYTES
-        if data_left_gb < 1:
-            is_warning = True
-            
-    if is_warning:
-        return "🟡" # Warning user
-        
-    return "⚪️" # Offline but active user
+def parse_page_callback(data: str, prefix: str) -> tuple[int, Optional[str], Optional[str]]:
+    """Inverse of build_page_callback. Returns (page, after, before)."""
+    page_str, _sep, cursor = data[len(prefix) + 1:].partition('_')
+    try:
+        page = int(page_str)
+    except ValueError:
+        page = 1
+    after = cursor[1:] if cursor.startswith('a') else None
+    before = cursor[1:] if cursor.startswith('b') else None
+    return page, after, before
+
 
-def build_users_keyboard(users: list, current_page: int, total_pages: int, list_type: str) -> InlineKeyboardMarkup:
+def build_users_keyboard(
+    users: list, current_page: int, total_pages: int, list_type: str, page_callback_prefix: Optional[str] = None
+) -> InlineKeyboardMarkup:
     """
     Builds a 3-column, translated keyboard for a list of users.
     Places the "Guide" button in the center of the navigation row.
+    Navigation buttons carry keyset cursors taken from the first and last user on the page.
     """
     from shared.translator import _  # Import the translator shortcut
 
     keyboard_rows = []
+    # Status emojis for the whole page in one vectorized pass
+    status_emojis = user_columns.classify_users(users).status_emojis()
     
     # --- Create main rows with 3 user buttons per row ---
     for i in range(0, len(users), 3):
         row = []
-        for user in users[i : i + 3]:
+        for user, status_emoji in zip(users[i : i + 3], status_emojis[i : i + 3]):
             username = user.get('username', 'N/A')
             panel_name = user.get('panel_name')
             panel_emoji = "🖥️" if panel_name else ""
-            button_text = f"{_get_status_emoji(user)} {username}{panel_emoji}"
+            button_text = f"{status_emoji} {username}{panel_emoji}"
             panel_id = user.get('panel_id', 0)
             callback_data = f"user_details_{username}_{list_type}_{current_page}_{panel_id}"
             row.append(InlineKeyboardButton(button_text, callback_data=callback_data))
@@ -150,11 +147,17 @@ def build_users_keyboard(users: list, current_page: int, total_pages: int, list_
     # --- Build the navigation row with translated buttons ---
     nav_row = []
     
+    page_callback_prefix = page_callback_prefix or f"show_users_page_{list_type}"
+    # Search results are ranked rather than sorted by username, so they page by offset only.
+    use_cursors = list_type != 'search' and bool(users)
+
     # "Previous" button
     if current_page > 1:
         nav_row.append(InlineKeyboardButton(
             _("marzban.marzban_display.keyboard_nav_previous"),
-            callback_data=f"show_users_page_{list_type}_{current_page - 1}"
+            callback_data=build_page_callback(
+                page_callback_prefix, current_page - 1, before=users[0].get('username') if use_cursors else None
+            )
         ))
     else:
         # Add a placeholder to keep the layout consistent
@@ -170,7 +173,9 @@ def build_users_keyboard(users: list, current_page: int, total_pages: int, list_
     if current_page < total_pages:
         nav_row.append(InlineKeyboardButton(
             _("marzban.marzban_display.keyboard_nav_next"),
-            callback_data=f"show_users_page_{list_type}_{current_page + 1}"
+            callback_data=build_page_callback(
+                page_callback_prefix, current_page + 1, after=users[-1].get('username') if use_cursors else None
+            )
         ))
     else:
         # Add a placeholder
@@ -255,86 +260,71 @@ async def show_user_management_menu(update: Update, context: ContextTypes.DEFAUL
     from shared.translator import translator  
     await update.message.reply_text(translator.get("marzban.marzban_display.user_management_section"), reply_markup=get_user_management_keyboard())
 
-# FILE: modules/marzban/actions/display.py
-# REPLACE THE ENTIRE _list_users_base FUNCTION WITH THIS OPTIMIZED VERSION
+async def get_search_page(context: ContextTypes.DEFAULT_TYPE, searcher_id: int, page: int) -> tuple[list, int, int]:
+    """Re-runs the stored search query against the username index. Returns (page_users, page, total_pages)."""
+    query = context.user_data.get('last_search_query')
+    if not query:
+        return [], 1, 1
 
-async def _list_users_base(update: Update, context: ContextTypes.DEFAULT_TYPE, list_type: str, page: int = 1):
+    offset = (max(page, 1) - 1) * USERS_PER_PAGE
+    if searcher_id in config.AUTHORIZED_USER_IDS:
+        total, page_users = await panel_utils.search_users_by_username(query, offset, USERS_PER_PAGE)
+    else:
+        my_usernames = set(await crud_bot_managed_user.get_users_created_by(searcher_id))
+        _total, found_users = await panel_utils.search_users_by_username(query)
+        found_users = [u for u in found_users if u['username'] in my_usernames]
+        total, page_users = len(found_users), found_users[offset:offset + USERS_PER_PAGE]
+
+    total_pages = max(1, math.ceil(total / USERS_PER_PAGE))
+    if total and not page_users:
+        # The result set shrank since the page button was built: show the last page instead.
+        return await get_search_page(context, searcher_id, total_pages)
+    return page_users, max(page, 1), total_pages
+
+
+async def _list_users_base(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, list_type: str, page: int = 1,
+    after: Optional[str] = None, before: Optional[str] = None
+):
+    """
+    Shows one page of a user list. Nothing but the selected panel (or the search
+    query) is kept in user_data; each page is sliced out of the shared, sorted
+    list views in panel_utils using the keyset cursor from the callback data.
+    """
     from shared.translator import translator
-    import time
 
     is_callback = update.callback_query is not None
     message = update.callback_query.message if is_callback else await update.message.reply_text(translator.get("marzban.marzban_display.loading"))
     
-    # Clear search results cache if we are not in a search context
+    # Clear the stored search query if we are not in a search context
     if list_type != 'search':
-        context.user_data.pop('last_search_results', None)
+        context.user_data.pop('last_search_query', None)
     
     if is_callback:
         await update.callback_query.answer()
     else:
         await message.edit_text(translator.get("marzban.marzban_display.fetching_users"))
     
-    target_users = []
-    
     try:
-        panel_id = context.user_data.get('selected_panel_id')
-        if not panel_id:
-            await message.edit_text(translator.get("marzban.marzban_display.no_panel_selected_error"))
-            return
-
-        # --- ✨ START OF CACHING LOGIC ---
-        CACHE_EXPIRY_SECONDS = 60  # Cache lists for 60 seconds
-        now = time.time()
-        
-        # Define cache keys based on list type and panel ID to avoid conflicts
-        users_cache_key = f'cached_users_{panel_id}_{list_type}'
-        cache_time_key = f'cache_time_{panel_id}_{list_type}'
-        
-        cached_users = context.user_data.get(users_cache_key)
-        cache_time = context.user_data.get(cache_time_key, 0)
-
-        # Check if cache is valid
-        if cached_users is not None and (now - cache_time) < CACHE_EXPIRY_SECONDS:
-            LOGGER.info(f"Using cached user list for panel {panel_id}, type '{list_type}'.")
-            target_users = cached_users
+        if list_type == 'search':
+            page_users, page, total_pages = await get_search_page(context, update.effective_user.id, page)
         else:
-            LOGGER.info(f"Cache expired or not found for panel {panel_id}, type '{list_type}'. Fetching from API.")
-            
-            # --- START: API Fetching Block (only runs when cache is invalid) ---
-            if list_type == 'search':
-                # Search results are handled differently and have their own cache
-                target_users = context.user_data.get('last_search_results', [])
-            else:
-                panel = await crud_panel.get_panel_by_id(panel_id)
-                if not panel:
-                     await message.edit_text(translator.get("panel_manager.delete.not_found")); return
-                
-                api = await panel_utils._get_api_for_panel(panel)
-                if not api:
-                    await message.edit_text(translator.get("marzban.marzban_display.panel_connection_error")); return
-                
-                all_users = await api.get_all_users()
-                if all_users is None:
-                    await message.edit_text(translator.get("marzban.marzban_display.panel_connection_error")); return
-                
-                # Process and sort the fetched list
-                if list_type == 'warning':
-                    warning_users = []
-                    warning_status = translator.get("marzban.marzban_display.status_warning")
-                    inactive_status = translator.get("marzban.marzban_display.status_inactive")
-                    for u in all_users:
-                        prefix, _, is_online, _, _ = get_user_display_info(u)
-                        if not is_online and prefix in [warning_status, inactive_status]:
-                            warning_users.append(u)
-                    target_users = sorted(warning_users, key=lambda u: u.get('username','').lower())
-                else: # list_type == 'all'
-                    target_users = sorted(all_users, key=lambda u: u.get('username','').lower())
-
-                # Store the newly fetched and processed list in the cache
-                context.user_data[users_cache_key] = target_users
-                context.user_data[cache_time_key] = now
-            # --- END: API Fetching Block ---
-        # --- ✨ END OF CACHING LOGIC ---
+            panel_id = context.user_data.get('selected_panel_id')
+            if not panel_id:
+                await message.edit_text(translator.get("marzban.marzban_display.no_panel_selected_error"))
+                return
+
+            panel = await crud_panel.get_panel_by_id(panel_id)
+            if not panel:
+                 await message.edit_text(translator.get("panel_manager.delete.not_found")); return
+
+            select = (lambda c: c.warning) if list_type == 'warning' else None
+            entries = await panel_utils.get_list_view(panel, list_type, select)
+            if entries is None:
+                await message.edit_text(translator.get("marzban.marzban_display.panel_connection_error")); return
+
+            page_entries, page, total_pages = panel_utils.paginate_entries(entries, USERS_PER_PAGE, page, after, before)
+            page_users = panel_utils.resolve_entries(page_entries)
 
         # Determine titles and not-found texts
         if list_type == 'search':
@@ -344,15 +334,9 @@ async def _list_users_base(update: Update, context: ContextTypes.DEFAULT_TYPE, l
             title_text = translator.get("marzban.marzban_display.warning_list_title") if list_type == 'warning' else translator.get("marzban.marzban_display.all_users_list_title")
             not_found_text = translator.get("marzban.marzban_display.no_warning_users") if list_type == 'warning' else translator.get("marzban.marzban_display.no_users_in_panel")
 
-        if not target_users:
+        if not page_users:
             await message.edit_text(not_found_text); return
             
-        # --- Pagination and Display (No changes needed here) ---
-        total_pages = math.ceil(len(target_users) / USERS_PER_PAGE)
-        page = max(1, min(page, total_pages))
-        start_index = (page - 1) * USERS_PER_PAGE
-        page_users = target_users[start_index : start_index + USERS_PER_PAGE]
-        
         keyboard = build_users_keyboard(page_users, page, total_pages, list_type)
         
         panel_name = context.user_data.get('selected_panel_name', '')
@@ -374,7 +358,10 @@ async def list_warning_users_paginated(update: Update, context: ContextTypes.DEF
     await _list_users_base(update, context, list_type='warning')
 
 async def update_user_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    await _list_users_base(update, context, list_type=update.callback_query.data.split('_')[-2], page=int(update.callback_query.data.split('_')[-1]))
+    # Callback format: show_users_page_{list_type}_{page}[_{cursor}]
+    list_type = update.callback_query.data[len("show_users_page_"):].split('_', 1)[0]
+    page, after, before = parse_page_callback(update.callback_query.data, f"show_users_page_{list_type}")
+    await _list_users_base(update, context, list_type=list_type, page=page, after=after, before=before)
 
 async def show_user_details_panel(context: ContextTypes.DEFAULT_TYPE, chat_id: int, username: str, list_type: str, page_number: int, success_message: str = None, message_id: int = None) -> None:
     from shared.translator import translator
@@ -389,7 +376,7 @@ async def show_user_details_panel(context: ContextTypes.DEFAULT_TYPE, chat_id: i
         await context.bot.send_message(chat_id=chat_id, text=translator.get("panel_manager.delete.not_found"))
         return
 
-    api = await panel_utils._get_api_for_panel(panel)
+    api = await get_api_for_panel(panel)
     if not api:
         await context.bot.send_message(chat_id=chat_id, text=translator.get("marzban.marzban_display.panel_connection_error"))
         return
@@ -579,7 +566,7 @@ async def send_subscription_qr_code_and_link(update: Update, context: ContextTyp
         await query.edit_message_text(translator.get("panel_manager.delete.not_found"))
         return
 
-    api = await panel_utils._get_api_for_panel(panel)
+    api = await get_api_for_panel(panel)
     if not api:
         await query.edit_message_text(translator.get("marzban.marzban_display.panel_connection_error"))
         return
@@ -589,11 +576,7 @@ async def send_subscription_qr_code_and_link(update: Update, context: ContextTyp
     if not subscription_url:
         await query.edit_message_text(text=translator.get("marzban.marzban_display.link_not_found_for_user", username=f"`{username}`"), parse_mode=ParseMode.MARKDOWN)
         return
-    qr_image = qrcode.make(subscription_url)
-    bio = io.BytesIO()
-    bio.name = 'qrcode.png'
-    qr_image.save(bio, 'PNG')
-    bio.seek(0)
+    qr_png = await qr_service.render_png(subscription_url)
     caption = translator.get("marzban.marzban_display.qr_caption", username=f"`{username}`", url=f"`{subscription_url}`")
     list_type = context.user_data.get('current_list_type', 'all')
     page_number = context.user_data.get('current_page', 1)
@@ -602,7 +585,7 @@ async def send_subscription_qr_code_and_link(update: Update, context: ContextTyp
         InlineKeyboardButton(translator.get("marzban.marzban_display.back_to_user_details"), callback_data=back_button_callback)
     ]])
     await query.message.delete()
-    await context.bot.send_photo(
-        chat_id=query.message.chat_id, photo=bio, caption=caption,
+    await media_cache.send_photo(
+        context.bot, query.message.chat_id, qr_png, caption=caption,
         reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN
     )
\ No newline at end of file
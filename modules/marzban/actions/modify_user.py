@@ -18,33 +18,12 @@ from .data_manager import normalize_username
 # ✨ NEW IMPORTS FOR MULTI-PANEL ARCHITECTURE
 from typing import Optional
 from core.panel_api.base import PanelAPI
-from core.panel_api.marzban import MarzbanPanel
+from core.panel_api.helpers import get_api_for_panel
 from database.crud import panel_credential as crud_panel
 from modules.marzban.actions import helpers as marzban_helpers
-# ✨ Import PanelType Enum
-from database.models.panel_credential import PanelType
 
 LOGGER = logging.getLogger(__name__)
 
-async def _get_api_for_panel(panel_id: int) -> Optional[PanelAPI]:
-    """Helper factory to create an API object from a panel DB object."""
-    try:
-        panel = await crud_panel.get_panel_by_id(panel_id)
-        if not panel:
-            LOGGER.error(f"[API FACTORY] Panel with ID {panel_id} not found in DB.")
-            return None
-        
-        # ✨ ROBUST FIX: Use Enum directly for comparison
-        if panel.panel_type == PanelType.MARZBAN:
-            credentials = {'api_url': panel.api_url, 'username': panel.username, 'password': panel.password}
-            return MarzbanPanel(credentials)
-        
-        LOGGER.warning(f"[API FACTORY] Panel type '{panel.panel_type}' is not supported/implemented for panel ID {panel_id}.")
-        return None
-    except Exception as e:
-        LOGGER.error(f"[API FACTORY] Error creating API for panel {panel_id}: {e}")
-        return None
-
 # Define conversation states (Global constants)
 ADD_DAYS_PROMPT, ADD_DATA_PROMPT = range(2)
 
@@ -61,7 +40,7 @@ async def _get_api_for_user(marzban_username: str, context: ContextTypes.DEFAULT
     
     if link and link.panel:
         # Try to connect using the linked panel
-        api = await _get_api_for_panel(link.panel.id)
+        api = await get_api_for_panel(link.panel)
         if api:
             LOGGER.info(f"[API FINDER] Found panel '{link.panel.name}' (ID: {link.panel.id}) via DB link.")
             return api
@@ -74,7 +53,7 @@ async def _get_api_for_user(marzban_username: str, context: ContextTypes.DEFAULT
     
     for panel in all_panels:
         try:
-            api = await _get_api_for_panel(panel.id)
+            api = await get_api_for_panel(panel)
             if not api: continue
 
             # Check if user exists in this panel
@@ -7,7 +7,8 @@ from telegram.ext import ContextTypes, ConversationHandler
 from .constants import SEARCH_PROMPT, USERS_PER_PAGE
 from shared.keyboards import get_back_to_main_menu_keyboard
 
-from .display import build_users_keyboard, get_all_users_from_all_panels
+from .display import build_users_keyboard
+from shared.panel_utils import search_users_by_username
 from shared.keyboards import get_user_management_keyboard
 from .data_manager import normalize_username
 
@@ -29,7 +30,8 @@ from telegram.ext import ContextTypes, ConversationHandler
 
 from .constants import SEARCH_PROMPT, USERS_PER_PAGE
 
-from .display import build_users_keyboard, get_all_users_from_all_panels
+from .display import build_users_keyboard
+from shared.panel_utils import search_users_by_username
 from shared.keyboards import get_back_to_main_menu_keyboard
 from .data_manager import normalize_username
 
@@ -57,22 +59,13 @@ async def search_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     )
 
     try:
-        all_users = await get_all_users_from_all_panels()
-        if all_users is None:
-            await update.message.reply_text(translator.get("marzban_display.panel_connection_error"))
-            return ConversationHandler.END
+        total, page_users = await search_users_by_username(search_query_normalized, 0, USERS_PER_PAGE)
 
-        found_users = sorted(
-            [user for user in all_users if user.get('username') and search_query_normalized in normalize_username(user['username'])],
-            key=lambda u: u['username'].lower()
-        )
-
-        if not found_users:
+        if not page_users:
             await update.message.reply_text(translator.get("marzban_search.no_users_found", query=f"«{search_query_raw}»"))
         else:
-            context.user_data['last_search_results'] = found_users
-            total_pages = math.ceil(len(found_users) / USERS_PER_PAGE)
-            page_users = found_users[:USERS_PER_PAGE]
+            context.user_data['last_search_query'] = search_query_normalized
+            total_pages = math.ceil(total / USERS_PER_PAGE)
             
             keyboard = build_users_keyboard(users=page_users, current_page=1, total_pages=total_pages, list_type='search')
             
@@ -9,6 +9,7 @@ from telegram.ext import (
 from shared.callbacks import cancel_conversation_and_stop_propagation, cancel_to_helper_tools
 from shared.keyboards import get_admin_main_menu_keyboard 
 from shared.translator import translator
+from shared.router import Router
 from modules.general.actions import switch_to_customer_view
 from modules.payment.actions import renewal as payment_actions
 from config import config
@@ -253,24 +254,23 @@ def register(application: Application) -> None:
     application.add_handler(add_data_conv)
     application.add_handler(add_user_for_customer_conv)
 
-    application.add_handler(MessageHandler(filters.Regex(f'^{translator.get("keyboards.admin_main_menu.customer_panel_view")}$') & admin_filter, switch_to_customer_view))
-    
     # --- Register Standalone Handlers ---
-    standalone_handlers = [
-        CallbackQueryHandler(display.show_status_legend, pattern=r'^show_status_legend$'),
-        CallbackQueryHandler(display.update_user_page, pattern=r'^show_users_page_'),
-        CallbackQueryHandler(display.show_user_details, pattern=r'^user_details_'),
-        CallbackQueryHandler(display.send_subscription_qr_code_and_link, pattern=r'^sub_link_'),
-        CallbackQueryHandler(modify_user.renew_user_smart, pattern=r'^renew_'),
-        CallbackQueryHandler(modify_user.reset_user_traffic, pattern=r'^reset_traffic_'),
-        CallbackQueryHandler(modify_user.confirm_delete_user, pattern=r'^delete_'),
-        CallbackQueryHandler(modify_user.do_delete_user, pattern=r'^do_delete_user_'),
-        CallbackQueryHandler(note.list_users_with_subscriptions, pattern=r'^list_subs_page_'),
-        CallbackQueryHandler(payment_actions.send_manual_invoice, pattern=r'^send_invoice_'),
-        CommandHandler("start", display.handle_deep_link_details, filters=filters.Regex(r'details_')),
-        MessageHandler(filters.Regex(f'^{translator.get("keyboards.user_management.back_to_panel_selection")}$'), display.prompt_for_panel_selection)
-    ]
-    for handler in standalone_handlers:
-        application.add_handler(handler)
+    # Menu texts and callback prefixes resolve through one lookup instead of a regex chain.
+    router = Router("marzban")
+    router.add_text(translator.get("keyboards.admin_main_menu.customer_panel_view"), switch_to_customer_view, filters=admin_filter)
+    router.add_callback(r'^show_status_legend$', display.show_status_legend)
+    router.add_callback(r'^show_users_page_', display.update_user_page)
+    router.add_callback(r'^user_details_', display.show_user_details)
+    router.add_callback(r'^sub_link_', display.send_subscription_qr_code_and_link)
+    router.add_callback(r'^renew_', modify_user.renew_user_smart)
+    router.add_callback(r'^reset_traffic_', modify_user.reset_user_traffic)
+    router.add_callback(r'^delete_', modify_user.confirm_delete_user)
+    router.add_callback(r'^do_delete_user_', modify_user.do_delete_user)
+    router.add_callback(r'^list_subs_page_', note.list_users_with_subscriptions)
+    router.add_callback(r'^send_invoice_', payment_actions.send_manual_invoice)
+    router.add_text(translator.get("keyboards.user_management.back_to_panel_selection"), display.prompt_for_panel_selection)
+    application.add_handler(router)
+
+    application.add_handler(CommandHandler("start", display.handle_deep_link_details, filters=filters.Regex(r'details_')))
 
 # --- END OF FILE ---
\ No newline at end of file
@@ -2,14 +2,11 @@
 # Note: All instances of parse_mode have been reviewed and set to ParseMode.HTML 
 # to correctly render HTML tags like <b> and <code> in Telegram messages.
 
-import qrcode
-import io
 import logging
 from telegram import Update
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 from decimal import Decimal
-from database.models.panel_credential import PanelType
 
 from database.crud import (
     pending_invoice as crud_invoice,
@@ -21,35 +18,25 @@ from database.crud import (
 )
 from shared.keyboards import get_customer_main_menu_keyboard
 from core.panel_api.base import PanelAPI
-from core.panel_api.marzban import MarzbanPanel
+from core.panel_api.helpers import get_api_for_panel_by_id
 from modules.marzban.actions import helpers as marzban_helpers
 from typing import Optional
 from shared.translator import _
 from shared.log_channel import send_log
+from shared import media_cache
+from shared import qr_service
+from shared.locks import invoice_lock
 from database.models.pending_invoice import PendingInvoice
 
 LOGGER = logging.getLogger(__name__)
 
-async def _get_api_for_panel(panel_id: int) -> Optional[PanelAPI]:
-    panel = await crud_panel.get_panel_by_id(panel_id)
-    if not panel:
-        LOGGER.error(f"Panel with ID {panel_id} not found.")
-        return None
-    
-    if panel.panel_type == PanelType.MARZBAN:
-        credentials = {'api_url': panel.api_url, 'username': panel.username, 'password': panel.password}
-        return MarzbanPanel(credentials)
-    
-    LOGGER.warning(f"Panel type '{panel.panel_type.value}' is not yet supported.")
-    return None
-
 async def _get_api_for_user(marzban_username: str) -> Optional[PanelAPI]:
     link = await crud_marzban_link.get_link_with_panel_by_username(marzban_username)
     if not link or not link.panel:
         LOGGER.error(f"Could not find a panel for user '{marzban_username}'. Link or panel data is missing.")
         return None
     
-    return await _get_api_for_panel(link.panel_id)
+    return await get_api_for_panel_by_id(link.panel_id)
 
 
 async def _approve_manual_invoice(context: ContextTypes.DEFAULT_TYPE, invoice: PendingInvoice, query: Update, admin_user):
@@ -125,7 +112,7 @@ async def _approve_new_user_creation(context: ContextTypes.DEFAULT_TYPE, invoice
         return
 
     try:
-        api = await _get_api_for_panel(panel_id)
+        api = await get_api_for_panel_by_id(panel_id)
         if not api:
             raise Exception(f"Could not create API object for panel ID {panel_id}.")
 
@@ -154,8 +141,7 @@ async def _approve_new_user_creation(context: ContextTypes.DEFAULT_TYPE, invoice
     try:
         subscription_url = new_user_data.get('subscription_url')
         if subscription_url:
-            qr_image = qrcode.make(subscription_url)
-            bio = io.BytesIO(); bio.name = 'qrcode.png'; qr_image.save(bio, 'PNG'); bio.seek(0)
+            qr_png = await qr_service.render_png(subscription_url)
             
             volume_text = _("marzban_display.unlimited") if plan_type == "unlimited" else f"{data_limit_gb} گیگابایت"
             user_limit_text = _("financials_payment.user_creation_success_message_ips", ips=max_ips) if max_ips else ""
@@ -171,7 +157,7 @@ async def _approve_new_user_creation(context: ContextTypes.DEFAULT_TYPE, invoice
             caption += _("financials_payment.user_creation_success_qr_guide")
             
             # ✨ FIX: Added reply_markup
-            await context.bot.send_photo(chat_id=customer_id, photo=bio, caption=caption, parse_mode=ParseMode.MARKDOWN, reply_markup=customer_keyboard)
+            await media_cache.send_photo(context.bot, customer_id, qr_png, caption=caption, parse_mode=ParseMode.MARKDOWN, reply_markup=customer_keyboard)
         else:
             # ✨ FIX: Added reply_markup
             await context.bot.send_message(customer_id, _("financials_payment.user_creation_fallback_message", username=f"`{marzban_username}`"), parse_mode=ParseMode.MARKDOWN, reply_markup=customer_keyboard)
@@ -350,12 +336,22 @@ async def approve_payment(update: Update, context: ContextTypes.DEFAULT_TYPE, au
             for job in current_jobs:
                 job.schedule_removal()
             LOGGER.info(f"Manual approval by {admin_user.full_name}: Removed scheduled auto-approve job for invoice #{invoice_id}.")
-    invoice = await crud_invoice.get_pending_invoice_by_id(invoice_id)
-    if not invoice or invoice.status != 'pending':
-        if query.message:
-            await query.edit_message_caption(caption=f"{query.message.caption}\n\n{_('financials_payment.invoice_already_processed')}")
-        return
+    # Held until the invoice is marked approved, so a second click, another admin or the
+    # auto-approve job can't charge the wallet or create the service twice.
+    async with invoice_lock(invoice_id):
+        invoice = await crud_invoice.get_pending_invoice_by_id(invoice_id)
+        if not invoice or invoice.status != 'pending':
+            if query.message:
+                await query.edit_message_caption(caption=f"{query.message.caption}\n\n{_('financials_payment.invoice_already_processed')}")
+            return
+        await _approve_locked(context, invoice, query, admin_user)
+
 
+async def _approve_locked(context: ContextTypes.DEFAULT_TYPE, invoice: PendingInvoice, query: Update, admin_user) -> None:
+    """
+    Approves a pending invoice. The caller must hold invoice_lock(invoice.invoice_id)
+    and have checked that the invoice is still pending.
+    """
     if invoice.from_wallet_amount > 0:
         new_balance = await crud_user.decrease_wallet_balance(user_id=invoice.user_id, amount=invoice.from_wallet_amount)
         if new_balance is None:
@@ -398,13 +394,14 @@ async def reject_payment(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 job.schedule_removal()
             LOGGER.info(f"Manual rejection by {admin_user.full_name}: Removed scheduled auto-approve job for invoice #{invoice_id}.")
             
-    invoice = await crud_invoice.get_pending_invoice_by_id(invoice_id)
-    if not invoice or invoice.status != 'pending':
-        if query.message:
-            await query.edit_message_caption(caption=f"{query.message.caption}\n\n{_('financials_payment.invoice_already_processed')}")
-        return
+    async with invoice_lock(invoice_id):
+        invoice = await crud_invoice.get_pending_invoice_by_id(invoice_id)
+        if not invoice or invoice.status != 'pending':
+            if query.message:
+                await query.edit_message_caption(caption=f"{query.message.caption}\n\n{_('financials_payment.invoice_already_processed')}")
+            return
 
-    await crud_invoice.update_invoice_status(invoice.invoice_id, 'rejected')
+        await crud_invoice.update_invoice_status(invoice.invoice_id, 'rejected')
     LOGGER.info(f"Admin {admin_user.id} rejected payment for invoice #{invoice.invoice_id}.")
     
     try:
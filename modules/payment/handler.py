@@ -1,8 +1,9 @@
 # FILE: modules/payment/handler.py (CORRECTED VERSION)
 
-from telegram.ext import Application, CallbackQueryHandler
+from telegram.ext import Application
 from modules.general.actions import send_main_menu
 from shared.translator import _
+from shared.router import Router
 
 # Import actions from the refactored files
 from .actions.approval import approve_payment, reject_payment, confirm_manual_payment
@@ -25,21 +26,20 @@ def register(application: Application):
     
     application.add_handler(manual_invoice_conv)
 
-    handlers = [
-        # Approval/Rejection Handlers
-        CallbackQueryHandler(approve_payment, pattern=r'^admin_approve_'),
-        CallbackQueryHandler(reject_payment, pattern=r'^admin_reject_'),
-        CallbackQueryHandler(confirm_manual_payment, pattern=r'^confirm_manual_receipt_'),
-        CallbackQueryHandler(approve_payment, pattern=r'^approve_data_top_up_'),
-
-        # Wallet Payment Handler
-        CallbackQueryHandler(pay_with_wallet, pattern=r'^wallet_pay_'),
-
-        # Manual invoice trigger from admin panel
-        CallbackQueryHandler(send_manual_invoice, pattern=r'^fin_send_invoice_'),
-        
-        # Generic back button on invoices
-        CallbackQueryHandler(handle_payment_back_button, pattern=r'^payment_back_to_menu$'),
-    ]
-    
-    application.add_handlers(handlers)
\ No newline at end of file
+    router = Router("payment")
+    # Approval/Rejection Handlers
+    router.add_callback(r'^admin_approve_', approve_payment)
+    router.add_callback(r'^admin_reject_', reject_payment)
+    router.add_callback(r'^confirm_manual_receipt_', confirm_manual_payment)
+    router.add_callback(r'^approve_data_top_up_', approve_payment)
+
+    # Wallet Payment Handler
+    router.add_callback(r'^wallet_pay_', pay_with_wallet)
+
+    # Manual invoice trigger from admin panel
+    router.add_callback(r'^fin_send_invoice_', send_manual_invoice)
+
+    # Generic back button on invoices
+    router.add_callback(r'^payment_back_to_menu$', handle_payment_back_button)
+
+    application.add_handler(router)
\ No newline at end of file
@@ -1,18 +1,26 @@
 # FILE: modules/reminder/actions/jobs.py (FULLY REWRITTEN FOR MULTI-PANEL)
 # --- START OF FILE ---
 
+import asyncio
 import datetime
 import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
 import jdatetime
+import numpy as np
 from telegram.ext import ContextTypes, Application
 from telegram.constants import ParseMode
 from telegram import InlineKeyboardMarkup, InlineKeyboardButton
 
 # Use the correct, panel-aware functions and helpers
-from shared import panel_utils
+from core.panel_api.base import PanelRequestError
+from core.panel_api.helpers import get_api_for_panel
 from database.crud import panel_credential as crud_panel
 from modules.marzban.actions.constants import GB_IN_BYTES
+from shared.activity_tracker import is_unreachable_error, record_unreachable
 from shared.log_channel import send_log
+from shared.user_columns import DAY_SECONDS, UserColumns, classify
 from database.crud import (
     bot_setting as crud_bot_setting,
     non_renewal_user as crud_non_renewal,
@@ -27,8 +35,24 @@ from modules.payment.actions.approval import approve_payment
 
 LOGGER = logging.getLogger(__name__)
 
+# Streamed panel users are processed in batches so their notes can be loaded with one query per batch.
+USER_BATCH_SIZE = 500
 
-async def _perform_auto_renewal(context: ContextTypes.DEFAULT_TYPE, telegram_user_id: int, marzban_username: str, subscription_price: int, api) -> bool:
+
+async def _iter_user_batches(api, batch_size: int = USER_BATCH_SIZE):
+    batch = []
+    async for user in api.iter_users():
+        if not user.get('username'):
+            continue
+        batch.append(user)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _perform_auto_renewal(context: ContextTypes.DEFAULT_TYPE, telegram_user_id: int, marzban_username: str, subscription_price: int, api, note_data=None) -> bool:
     price = float(subscription_price)
     
     # 1. کسر مبلغ از کیف پول (کسر اول و اصلی)
@@ -38,7 +62,8 @@ async def _perform_auto_renewal(context: ContextTypes.DEFAULT_TYPE, telegram_use
         LOGGER.error(f"Auto-renew for {marzban_username} aborted: Insufficient funds.")
         return False
 
-    note_data = await crud_user_note.get_user_note(marzban_username)
+    if note_data is None:
+        note_data = await crud_user_note.get_user_note(marzban_username)
     duration = note_data.subscription_duration if note_data else 30
     user_panel_data = await api.get_user_data(marzban_username)
     if not user_panel_data:
@@ -91,12 +116,187 @@ async def _perform_auto_renewal(context: ContextTypes.DEFAULT_TYPE, telegram_use
         return False
 
 
+# --- Daily Job Pipeline ---
+# Panels are read concurrently (a few at a time). Each panel's users are
+# classified as they stream in, and the resulting work (auto-renewals, customer
+# reminders, deletions) is fed through queues to separate worker stages, so a
+# slow or dead panel no longer holds up the others.
+
+PANEL_JOB_CONCURRENCY = 4      # Panels read at the same time
+STAGE_QUEUE_SIZE = 1000        # Backpressure between classification and the worker stages
+NOTIFICATION_WORKERS = 3       # Concurrent customer reminder senders
+DELETION_WORKERS = 2           # Concurrent panel deletions
+
+
+@dataclass
+class _StageStats:
+    """Items handled by a pipeline stage and the time spent on them."""
+    items: int = 0
+    seconds: float = 0.0
+
+    def add(self, started_at: float) -> None:
+        self.items += 1
+        self.seconds += time.monotonic() - started_at
+
+
+@dataclass
+class _PanelTiming:
+    users: int = 0
+    seconds: float = 0.0
+    failed: bool = False
+
+
+@dataclass
+class _ReminderRun:
+    """Shared state of one check_users_for_reminders run."""
+    days_threshold: int
+    data_gb_threshold: float
+    non_renewal_list: Set[str]
+    links_by_username: Dict[str, Any]      # keyed by lowercased username
+    auto_renew_usernames: Set[str]
+    wallet_balances: Dict[int, Any]
+    unreachable_user_ids: Set[int]
+    renewal_queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=STAGE_QUEUE_SIZE))
+    notification_queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=STAGE_QUEUE_SIZE))
+    panel_timings: Dict[str, _PanelTiming] = field(default_factory=dict)
+    renewal_stats: _StageStats = field(default_factory=_StageStats)
+    notification_stats: _StageStats = field(default_factory=_StageStats)
+    expiring: List[dict] = field(default_factory=list)
+    low_data: List[dict] = field(default_factory=list)
+    success_renew: List[dict] = field(default_factory=list)
+    fail_renew: List[dict] = field(default_factory=list)
+
+
+async def _run_stage(queue: asyncio.Queue, worker, worker_count: int) -> List[asyncio.Task]:
+    """Starts `worker_count` consumers that call `worker(item)` until they receive None."""
+    async def consume():
+        while True:
+            item = await queue.get()
+            try:
+                if item is None:
+                    return
+                await worker(item)
+            except Exception as e:
+                LOGGER.error(f"Daily job stage worker failed on an item: {e}", exc_info=True)
+            finally:
+                queue.task_done()
+    return [asyncio.create_task(consume()) for _ in range(worker_count)]
+
+
+async def _finish_stage(queue: asyncio.Queue, workers: List[asyncio.Task]) -> None:
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+
+
+def _build_customer_reminder(translator, username: str, days_left: Optional[int], data_left_gb: Optional[float]):
+    customer_message = translator.get("reminder_jobs.customer_reminder_title", username=f"`{username}`")
+    if days_left is not None:
+        customer_message += translator.get("reminder_jobs.customer_reminder_days_left", days=days_left)
+    if data_left_gb is not None:
+        customer_message += translator.get("reminder_jobs.customer_reminder_data_left", gb=f"{data_left_gb:.2f}")
+    customer_message += translator.get("reminder_jobs.customer_reminder_footer")
+    keyboard = InlineKeyboardMarkup([[
+        InlineKeyboardButton(translator.get("reminder_jobs.button_request_renewal"), callback_data=f"customer_renew_request_{username}"),
+        InlineKeyboardButton(translator.get("reminder_jobs.button_do_not_renew"), callback_data=f"customer_do_not_renew_{username}")]])
+    return customer_message, keyboard
+
+
+async def _classify_panel_users(run: _ReminderRun, panel, semaphore: asyncio.Semaphore) -> None:
+    """Stage 1: streams one panel's users and queues renewals and reminders."""
+    from shared.translator import translator
+
+    async with semaphore:
+        timing = run.panel_timings[panel.name] = _PanelTiming()
+        started_at = time.monotonic()
+        LOGGER.info(f"--- Processing panel: {panel.name} (ID: {panel.id}) ---")
+        try:
+            api = await get_api_for_panel(panel)
+            if not api:
+                LOGGER.error(f"Could not create API for panel {panel.name}. Skipping.")
+                timing.failed = True
+                return
+
+            # Users are streamed page by page, so the full panel list is never held in memory.
+            # Each batch's notes are loaded with one query instead of one per user.
+            async for batch in _iter_user_batches(api):
+                timing.users += len(batch)
+                columns = UserColumns.from_users(batch)
+                c = classify(columns, days_threshold=run.days_threshold, data_gb_threshold=run.data_gb_threshold)
+                with np.errstate(invalid='ignore'):
+                    renewal_due = c.seconds_left < run.days_threshold * DAY_SECONDS
+                flagged = c.expiring | c.low_data
+                # Only flagged users and auto-renew candidates need any further work.
+                relevant = [
+                    i for i, username in enumerate(columns.usernames)
+                    if flagged[i] or username.lower() in run.auto_renew_usernames
+                ]
+                if not relevant:
+                    continue
+                notes = await crud_user_note.get_notes_for_usernames(columns.usernames[i] for i in relevant)
+
+                for i in relevant:
+                    panel_user = batch[i]
+                    username = panel_user['username']
+                    note_info = notes.get(username.lower())
+                    link = run.links_by_username.get(username.lower())
+
+                    if link and link.auto_renew and link.panel_id == panel.id:
+                        LOGGER.info(f"🔍 [Auto-Renew Check] User: {username}")
+                        user_status = panel_user.get('status')
+
+                        if user_status not in ['active', 'limited', 'expired'] or (note_info and note_info.is_test_account):
+                            LOGGER.info(f"   -> SKIPPED: Invalid status or is test account.")
+                        elif panel_user.get('expire'):
+                            LOGGER.info(f"   Days Left: {int(c.seconds_left[i] // DAY_SECONDS)} (Threshold: {run.days_threshold})")
+
+                            if renewal_due[i]:
+                                panel_user['panel_name'] = panel.name
+                                await run.renewal_queue.put((api, panel_user, link, note_info))
+                                # Handled by auto-renewal: no separate reminder for this user.
+                                continue
+                            else:
+                                LOGGER.info(f"   -> SKIPPED: Not time yet.")
+                        else:
+                            LOGGER.info(f"   -> SKIPPED: No expire date.")
+
+                    if not flagged[i] or username in run.non_renewal_list:
+                        continue
+
+                    if note_info and note_info.is_test_account:
+                        continue
+
+                    is_expiring, is_low_data = bool(c.expiring[i]), bool(c.low_data[i])
+                    if link and link.telegram_user_id not in run.unreachable_user_ids:
+                        text, keyboard = _build_customer_reminder(
+                            translator, username,
+                            days_left=int(c.seconds_left[i] // DAY_SECONDS) + 1 if is_expiring else None,
+                            data_left_gb=c.data_left[i] / GB_IN_BYTES if is_low_data else None,
+                        )
+                        await run.notification_queue.put((link.telegram_user_id, username, text, keyboard))
+
+                    panel_user['panel_name'] = panel.name
+                    if is_expiring:
+                        run.expiring.append(panel_user)
+                    else:
+                        run.low_data.append(panel_user)
+        except PanelRequestError as e:
+            LOGGER.error(f"Failed to fetch users from panel {panel.name}: {e}. Skipping the rest of this panel.")
+            timing.failed = True
+        except Exception as e:
+            LOGGER.error(f"Unexpected error while processing panel {panel.name}: {e}", exc_info=True)
+            timing.failed = True
+        finally:
+            timing.seconds = time.monotonic() - started_at
+
+
 async def check_users_for_reminders(context: ContextTypes.DEFAULT_TYPE) -> None:
     from shared.translator import translator
     
     admin_id = context.job.chat_id
     bot_username = context.bot.username
     LOGGER.info(f"Executing daily multi-panel job for admin {admin_id}...")
+    job_started_at = time.monotonic()
 
     try:
         expired_count = await crud_invoice.expire_old_pending_invoices()
@@ -106,12 +306,18 @@ async def check_users_for_reminders(context: ContextTypes.DEFAULT_TYPE) -> None:
             await send_log(context.bot, log_message, parse_mode=ParseMode.MARKDOWN)
 
         settings = await crud_bot_setting.load_bot_settings()
-        days_threshold = settings.get('reminder_days', 3)
-        data_gb_threshold = settings.get('reminder_data_gb', 1)
-        non_renewal_list = await crud_non_renewal.get_all_non_renewal_users()
-        
         all_links = await crud_marzban_link.get_all_marzban_links_with_panel()
-        username_to_link_map = {link.marzban_username: link for link in all_links}
+        run = _ReminderRun(
+            days_threshold=settings.get('reminder_days', 3),
+            data_gb_threshold=settings.get('reminder_data_gb', 1),
+            non_renewal_list=set(await crud_non_renewal.get_all_non_renewal_users()),
+            links_by_username={link.marzban_username.lower(): link for link in all_links},
+            auto_renew_usernames={link.marzban_username.lower() for link in all_links if link.auto_renew},
+            # Prefetched once; updated locally as auto-renewals spend from it.
+            wallet_balances=await crud_user.get_wallet_balances(link.telegram_user_id for link in all_links if link.auto_renew),
+            # Customers who blocked the bot get no reminder; they still show up in the admin report.
+            unreachable_user_ids=await crud_user.get_unreachable_user_ids(link.telegram_user_id for link in all_links),
+        )
         
         all_panels = await crud_panel.get_all_panels()
         if not all_panels:
@@ -125,124 +331,54 @@ async def check_users_for_reminders(context: ContextTypes.DEFAULT_TYPE) -> None:
         except: pass
         return
 
-    total_expiring, total_low_data, total_success_renew, total_fail_renew = [], [], [], []
+    async def renew(item) -> None:
+        # A single renewal worker: wallet balances are tracked locally and must not race.
+        api, panel_user, link, note_info = item
+        started_at = time.monotonic()
+        username, telegram_user_id = panel_user['username'], link.telegram_user_id
+        wallet_balance = float(run.wallet_balances.get(telegram_user_id) or 0.0)
+        price = float(note_info.subscription_price) if note_info and note_info.subscription_price else 0.0
+
+        if wallet_balance >= price and price > 0:
+            LOGGER.info(f"   🚀 STARTING RENEWAL for {username}...")
+            if await _perform_auto_renewal(context, telegram_user_id, username, int(price), api, note_data=note_info):
+                run.wallet_balances[telegram_user_id] = wallet_balance - price
+                run.success_renew.append(panel_user)
+            else:
+                run.fail_renew.append(panel_user)
+        else:
+            LOGGER.info(f"   ⚠️ SKIPPED {username}: Insufficient funds.")
+            try:
+                await context.bot.send_message(telegram_user_id, translator.get("reminder_jobs.auto_renew_failed_customer_funds"))
+                run.fail_renew.append(panel_user)
+            except Exception as e:
+                if is_unreachable_error(e):
+                    record_unreachable(telegram_user_id)
+        run.renewal_stats.add(started_at)
+
+    async def notify(item) -> None:
+        chat_id, username, text, keyboard = item
+        started_at = time.monotonic()
+        try:
+            await context.bot.send_message(chat_id=chat_id, text=text, reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN)
+        except Exception as e:
+            if is_unreachable_error(e):
+                record_unreachable(chat_id)
+            LOGGER.warning(f"Failed to send reminder to customer {chat_id} for user {username}: {e}")
+        run.notification_stats.add(started_at)
 
-    for panel in all_panels:
-        LOGGER.info(f"--- Processing panel: {panel.name} (ID: {panel.id}) ---")
-        api = await panel_utils._get_api_for_panel(panel)
-        if not api:
-            LOGGER.error(f"Could not create API for panel {panel.name}. Skipping.")
-            continue
+    renewal_workers = await _run_stage(run.renewal_queue, renew, 1)
+    notification_workers = await _run_stage(run.notification_queue, notify, NOTIFICATION_WORKERS)
 
-        panel_users = await api.get_all_users()
-        if panel_users is None:
-            LOGGER.error(f"Failed to fetch users from panel {panel.name}. Skipping.")
-            continue
-        
-        panel_users_dict = {user['username']: user for user in panel_users if user.get('username')}
-        
-        processed_users_in_panel = set()
+    semaphore = asyncio.Semaphore(PANEL_JOB_CONCURRENCY)
+    await asyncio.gather(*(_classify_panel_users(run, panel, semaphore) for panel in all_panels))
+    await _finish_stage(run.renewal_queue, renewal_workers)
+    await _finish_stage(run.notification_queue, notification_workers)
+    reminders_seconds = time.monotonic() - job_started_at
 
-        auto_renew_links_for_this_panel = [link for link in all_links if link.panel_id == panel.id and link.auto_renew]
-        
-        for link in auto_renew_links_for_this_panel:
-            marzban_username = link.marzban_username
-            telegram_user_id = link.telegram_user_id
-            
-            LOGGER.info(f"🔍 [Auto-Renew Check] User: {marzban_username}")
-            
-            panel_user = panel_users_dict.get(marzban_username)
-            note_info = await crud_user_note.get_user_note(marzban_username)
-            
-            user_status = panel_user.get('status') if panel_user else "NOT_FOUND"
-            
-            if not panel_user or user_status not in ['active', 'limited', 'expired'] or (note_info and note_info.is_test_account):
-                LOGGER.info(f"   -> SKIPPED: Invalid status or is test account.")
-                continue
-
-            if expire_ts := panel_user.get('expire'):
-                expire_date = datetime.datetime.fromtimestamp(expire_ts)
-                now = datetime.datetime.now()
-                
-                days_left = (expire_date - now).days
-                LOGGER.info(f"   Days Left: {days_left} (Threshold: {days_threshold})")
-                
-                if days_left < days_threshold:
-                    wallet_balance = await crud_user.get_user_wallet_balance(telegram_user_id) or 0.0
-                    price = float(note_info.subscription_price) if note_info and note_info.subscription_price else 0.0
-                    
-                    if wallet_balance >= price and price > 0:
-                        LOGGER.info(f"   🚀 STARTING RENEWAL...")
-                        
-                        full_user_data = {
-                            "telegram_user_id": telegram_user_id, "marzban_username": marzban_username,
-                            "subscription_price": int(price), "api": api
-                        }
-                        if await _perform_auto_renewal(context, **full_user_data):
-                            panel_user['panel_name'] = panel.name
-                            total_success_renew.append(panel_user)
-                        else:
-                            panel_user['panel_name'] = panel.name
-                            total_fail_renew.append(panel_user)
-                    else:
-                        LOGGER.info(f"   ⚠️ SKIPPED: Insufficient funds.")
-                        try:
-                            await context.bot.send_message(telegram_user_id, translator.get("reminder_jobs.auto_renew_failed_customer_funds"))
-                            panel_user['panel_name'] = panel.name
-                            total_fail_renew.append(panel_user)
-                        except Exception: pass
-                    
-                    processed_users_in_panel.add(marzban_username)
-                else:
-                    LOGGER.info(f"   -> SKIPPED: Not time yet.")
-            else:
-                LOGGER.info(f"   -> SKIPPED: No expire date.")
-        
-        for panel_user in panel_users:
-            username = panel_user.get('username')
-            if not username or username in processed_users_in_panel or username in non_renewal_list:
-                continue
-
-            note_info = await crud_user_note.get_user_note(username)
-            if panel_user.get('status') != 'active' or (note_info and note_info.is_test_account):
-                continue
-
-            is_expiring, is_low_data, expire_date = False, False, None
-            if expire_ts := panel_user.get('expire'):
-                expire_date = datetime.datetime.fromtimestamp(expire_ts)
-                if datetime.datetime.now() < expire_date < (datetime.datetime.now() + datetime.timedelta(days=days_threshold)):
-                    is_expiring = True
-            
-            data_limit = panel_user.get('data_limit') or 0
-            if data_limit > 0 and (data_limit - (panel_user.get('used_traffic') or 0)) < (data_gb_threshold * GB_IN_BYTES):
-                is_low_data = True
-            
-            user_link = username_to_link_map.get(username)
-            if user_link and (is_expiring or is_low_data):
-                try:
-                    customer_message = translator.get("reminder_jobs.customer_reminder_title", username=f"`{username}`")
-                    if is_expiring and expire_date:
-                        time_left = expire_date - datetime.datetime.now()
-                        customer_message += translator.get("reminder_jobs.customer_reminder_days_left", days=time_left.days + 1)
-                    if is_low_data:
-                        remaining_gb = (data_limit - (panel_user.get('used_traffic') or 0)) / GB_IN_BYTES
-                        customer_message += translator.get("reminder_jobs.customer_reminder_data_left", gb=f"{remaining_gb:.2f}")
-                    customer_message += translator.get("reminder_jobs.customer_reminder_footer")
-                    keyboard = InlineKeyboardMarkup([[
-                        InlineKeyboardButton(translator.get("reminder_jobs.button_request_renewal"), callback_data=f"customer_renew_request_{username}"),
-                        InlineKeyboardButton(translator.get("reminder_jobs.button_do_not_renew"), callback_data=f"customer_do_not_renew_{username}")]])
-                    await context.bot.send_message(chat_id=user_link.telegram_user_id, text=customer_message, reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN)
-                except Exception as e:
-                    LOGGER.warning(f"Failed to send reminder to customer {user_link.telegram_user_id} for user {username}: {e}")
-
-            if is_expiring:
-                panel_user['panel_name'] = panel.name
-                total_expiring.append(panel_user)
-            if is_low_data and not is_expiring:
-                panel_user['panel_name'] = panel.name
-                total_low_data.append(panel_user)
-
-    if any([total_expiring, total_low_data, total_success_renew, total_fail_renew]):
+    deletion = await auto_delete_expired_users(context)
+
+    if any([run.expiring, run.low_data, run.success_renew, run.fail_renew]):
         jalali_today = jdatetime.datetime.now().strftime('%Y/%m/%d')
         report_parts = [translator.get("reminder_jobs.admin_daily_report_title", date=jalali_today)]
         
@@ -251,75 +387,131 @@ async def check_users_for_reminders(context: ContextTypes.DEFAULT_TYPE) -> None:
             pname = u.get('panel_name', '??')
             return f"▪️ <a href='https://t.me/{bot_username}?start=details_{uname}'>{uname}</a> ({pname}) - <i>{reason}</i>"
 
-        if total_success_renew:
+        if run.success_renew:
             report_parts.append("\n✅ **تمدیدهای خودکار موفق**")
-            for u in total_success_renew: report_parts.append(format_user_line(u, "موفقیت‌آمیز"))
-        if total_fail_renew:
+            for u in run.success_renew: report_parts.append(format_user_line(u, "موفقیت‌آمیز"))
+        if run.fail_renew:
             report_parts.append("\n⚠️ **تمدیدهای خودکار ناموفق**")
-            for u in total_fail_renew: report_parts.append(format_user_line(u, "ناموفق (موجودی ناکافی)"))
-        if total_expiring:
+            for u in run.fail_renew: report_parts.append(format_user_line(u, "ناموفق (موجودی ناکافی)"))
+        if run.expiring:
             report_parts.append(translator.get("reminder_jobs.admin_report_expiring_users_title"))
-            for u in total_expiring:
+            for u in run.expiring:
                 time_left = datetime.datetime.fromtimestamp(u['expire']) - datetime.datetime.now()
                 reason = translator.get("reminder_jobs.admin_report_expiring_reason", days=time_left.days + 1)
                 report_parts.append(format_user_line(u, reason))
-        if total_low_data:
+        if run.low_data:
             report_parts.append(translator.get("reminder_jobs.admin_report_low_data_users_title"))
-            for u in total_low_data:
+            for u in run.low_data:
                 rem_gb = ((u.get('data_limit', 0)) - (u.get('used_traffic', 0))) / GB_IN_BYTES
                 reason = translator.get("reminder_jobs.admin_report_low_data_reason", gb=f"{rem_gb:.1f}")
                 report_parts.append(format_user_line(u, reason))
-                
+
+        report_parts.extend(_format_stage_timings(translator, run, deletion, reminders_seconds, time.monotonic() - job_started_at))
         await context.bot.send_message(admin_id, "\n".join(report_parts), parse_mode=ParseMode.HTML, disable_web_page_preview=True)
     else:
         LOGGER.info("No items to report today across all panels. Reminder job finished.")
-    
-    await auto_delete_expired_users(context)
-
+        LOGGER.info("\n".join(_format_stage_timings(translator, run, deletion, reminders_seconds, time.monotonic() - job_started_at)))
+
+
+def _format_stage_timings(translator, run: _ReminderRun, deletion: Optional[Dict[str, Any]], reminders_seconds: float, total_seconds: float) -> List[str]:
+    lines = [translator.get("reminder_jobs.admin_report_timings_title")]
+    for panel_name, timing in run.panel_timings.items():
+        key = "reminder_jobs.admin_report_timing_panel_failed" if timing.failed else "reminder_jobs.admin_report_timing_panel"
+        lines.append(translator.get(key, panel=panel_name, users=timing.users, seconds=f"{timing.seconds:.1f}"))
+    stages = [
+        ("reminder_jobs.stage_renewal", run.renewal_stats),
+        ("reminder_jobs.stage_notification", run.notification_stats),
+    ]
+    if deletion:
+        stages.append(("reminder_jobs.stage_deletion", deletion['stats']))
+    for stage_key, stats in stages:
+        lines.append(translator.get(
+            "reminder_jobs.admin_report_timing_stage",
+            stage=translator.get(stage_key), items=stats.items, seconds=f"{stats.seconds:.1f}"
+        ))
+    lines.append(translator.get("reminder_jobs.admin_report_timing_reminders", seconds=f"{reminders_seconds:.1f}"))
+    if deletion:
+        lines.append(translator.get("reminder_jobs.admin_report_timing_deletion_total", seconds=f"{deletion['seconds']:.1f}"))
+    lines.append(translator.get("reminder_jobs.admin_report_timing_total", seconds=f"{total_seconds:.1f}"))
+    return lines
+
+
+async def _collect_expired_users(panel, managed_users_set: Set[str], grace_period: datetime.timedelta, queue: asyncio.Queue, semaphore: asyncio.Semaphore) -> None:
+    """Deletion stage 1: finds one panel's expired, bot-managed users and queues them."""
+    async with semaphore:
+        LOGGER.info(f"--- [Auto-Delete] Checking panel: {panel.name} ---")
+        api = await get_api_for_panel(panel)
+        if not api:
+            return
 
-async def auto_delete_expired_users(context: ContextTypes.DEFAULT_TYPE) -> None:
+        # Collect candidates first: deleting while paging would shift the panel's offsets.
+        usernames_to_delete = []
+        try:
+            async for user in api.iter_users():
+                username = user.get('username')
+                if not username or user.get('status') == 'active' or username not in managed_users_set:
+                    continue
+
+                if expire_ts := user.get('expire'):
+                    expire_date = datetime.datetime.fromtimestamp(expire_ts)
+                    if datetime.datetime.now() > (expire_date + grace_period):
+                        usernames_to_delete.append(username)
+        except PanelRequestError as e:
+            LOGGER.error(f"[Auto-Delete] Failed to fetch users from panel '{panel.name}': {e}")
+
+    for username in usernames_to_delete:
+        await queue.put((panel, api, username))
+
+
+async def auto_delete_expired_users(context: ContextTypes.DEFAULT_TYPE) -> Optional[Dict[str, Any]]:
+    """
+    Deletes bot-managed users whose grace period has passed, reading panels concurrently.
+    Returns {'deleted': [...], 'stats': _StageStats, 'seconds': float}, or None if the job did not run.
+    """
     from shared.translator import translator
     LOGGER.info("Starting multi-panel auto-delete job for expired users...")
+    started_at = time.monotonic()
     
     settings = await crud_bot_setting.load_bot_settings()
     grace_days = settings.get('auto_delete_grace_days', 0)
     if grace_days <= 0:
-        LOGGER.info("Auto-delete is disabled. Skipping."); return
+        LOGGER.info("Auto-delete is disabled. Skipping."); return None
 
     managed_users_set = set(await crud_managed_user.get_all_managed_users())
     if not managed_users_set:
-        LOGGER.info("No bot-managed users found. Auto-delete job finished."); return
+        LOGGER.info("No bot-managed users found. Auto-delete job finished."); return None
     
     all_panels = await crud_panel.get_all_panels()
     if not all_panels:
-        LOGGER.warning("Auto-delete job failed: No panels configured."); return
+        LOGGER.warning("Auto-delete job failed: No panels configured."); return None
 
     total_deleted_users = []
+    stats = _StageStats()
     grace_period = datetime.timedelta(days=grace_days)
-
-    for panel in all_panels:
-        LOGGER.info(f"--- [Auto-Delete] Checking panel: {panel.name} ---")
-        api = await panel_utils._get_api_for_panel(panel)
-        if not api: continue
-
-        panel_users = await api.get_all_users()
-        if panel_users is None: continue
-
-        for user in panel_users:
-            username = user.get('username')
-            if not username or user.get('status') == 'active' or username not in managed_users_set:
-                continue
-                
-            if expire_ts := user.get('expire'):
-                expire_date = datetime.datetime.fromtimestamp(expire_ts)
-                if datetime.datetime.now() > (expire_date + grace_period):
-                    LOGGER.info(f"User '{username}' on panel '{panel.name}' is expired for more than {grace_days} days. Deleting...")
-                    success, _ = await api.delete_user(username)
-                    if success:
-                        await cleanup_marzban_user_data(username)
-                        total_deleted_users.append(f"{username} ({panel.name})")
-                    else:
-                        LOGGER.error(f"Failed to delete user '{username}' from panel '{panel.name}'.")
+    deletion_queue: asyncio.Queue = asyncio.Queue(maxsize=STAGE_QUEUE_SIZE)
+
+    async def delete(item) -> None:
+        panel, api, username = item
+        item_started_at = time.monotonic()
+        LOGGER.info(f"User '{username}' on panel '{panel.name}' is expired for more than {grace_days} days. Deleting...")
+        success, _ = await api.delete_user(username)
+        if success:
+            await cleanup_marzban_user_data(username)
+            total_deleted_users.append(f"{username} ({panel.name})")
+        else:
+            LOGGER.error(f"Failed to delete user '{username}' from panel '{panel.name}'.")
+        stats.add(item_started_at)
+
+    workers = await _run_stage(deletion_queue, delete, DELETION_WORKERS)
+    semaphore = asyncio.Semaphore(PANEL_JOB_CONCURRENCY)
+    results = await asyncio.gather(
+        *(_collect_expired_users(panel, managed_users_set, grace_period, deletion_queue, semaphore) for panel in all_panels),
+        return_exceptions=True
+    )
+    for panel, result in zip(all_panels, results):
+        if isinstance(result, Exception):
+            LOGGER.error(f"[Auto-Delete] Checking panel '{panel.name}' failed: {result}", exc_info=result)
+    await _finish_stage(deletion_queue, workers)
     
     if total_deleted_users:
         safe_deleted_list = ", ".join(f"`{u}`" for u in total_deleted_users)
@@ -328,6 +520,7 @@ async def auto_delete_expired_users(context: ContextTypes.DEFAULT_TYPE) -> None:
         await send_log(context.bot, log_message, parse_mode=ParseMode.MARKDOWN)
     else:
         LOGGER.info("Auto-delete job finished. No users met deletion criteria across all panels.")
+    return {'deleted': total_deleted_users, 'stats': stats, 'seconds': time.monotonic() - started_at}
 
 
 async def cleanup_expired_test_accounts(context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -343,11 +536,10 @@ async def cleanup_expired_test_accounts(context: ContextTypes.DEFAULT_TYPE) -> N
         LOGGER.warning("Test account cleanup failed: No panels configured."); return
 
     deleted_users_count = 0
-    all_links = await crud_marzban_link.get_all_marzban_links_with_panel()
-    username_to_link_map = {link.marzban_username: link for link in all_links}
+    username_to_link_map = await crud_marzban_link.get_links_for_usernames(t.username for t in test_accounts)
 
     # Create a map for quick API object retrieval
-    panel_apis = {panel.id: await panel_utils._get_api_for_panel(panel) for panel in all_panels}
+    panel_apis = {panel.id: await get_api_for_panel(panel) for panel in all_panels}
 
     for test_account in test_accounts:
         username = test_account.username
@@ -11,6 +11,7 @@ from telegram.ext import (
 from .actions.daily_note import daily_notes_conv
 from .actions import jobs, settings
 from shared.keyboards import get_notes_management_keyboard
+from shared.router import Router
 from modules.marzban.actions import note
 
 LOGGER = logging.getLogger(__name__)
@@ -58,8 +59,10 @@ def register(application: Application) -> None:
     application.add_handler(settings.reminder_settings_conv, group=1)
     application.add_handler(complete_daily_notes_conv, group=1) # <-- از ConversationHandler جدید استفاده می‌کنیم
     
-    application.add_handler(MessageHandler(filters.Regex('^📓 مدیریت یادداشت‌ها$'), show_notes_management_menu), group=1)
-    application.add_handler(MessageHandler(filters.Regex('^👤 اشتراک‌های ثبت‌شده$'), note.list_users_with_subscriptions), group=1)
+    router = Router("reminder")
+    router.add_text('📓 مدیریت یادداشت‌ها', show_notes_management_menu)
+    router.add_text('👤 اشتراک‌های ثبت‌شده', note.list_users_with_subscriptions)
+    application.add_handler(router, group=1)
 
     if application.job_queue:
         application.job_queue.run_once(
@@ -1,6 +1,5 @@
 # --- START: Replace the ENTIRE content of modules/search/actions.py ---
 import logging
-import math
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import ContextTypes, ConversationHandler
 from database.crud import bot_managed_user as crud_bot_managed_user
@@ -14,9 +13,8 @@ from shared.callback_types import SEARCH_RESULT_PREFIX
 from telegram.constants import ParseMode
 
 # Imports from Marzban module for username search results
-from modules.marzban.actions.display import build_users_keyboard, show_user_details
+from modules.marzban.actions.display import build_users_keyboard, show_user_details, get_search_page
 from modules.marzban.actions.data_manager import normalize_username
-from modules.marzban.actions.constants import USERS_PER_PAGE
 from database.crud import marzban_link as crud_marzban_link
 
 
@@ -92,29 +90,36 @@ async def _search_by_telegram_id(update: Update, context: ContextTypes.DEFAULT_T
         my_managed_usernames = await crud_bot_managed_user.get_users_created_by(searcher_id)
         
         await update.message.reply_text("🔍 در حال جستجو و اعتبارسنجی...")
-        all_users_panel = await panel_utils.get_all_users_from_all_panels()
+        all_users_panel, all_panels_read = await panel_utils.get_all_users_from_all_panels_with_status()
         
         if not all_users_panel:
             await update.message.reply_text(_("marzban_display.panel_connection_error"))
             return SEARCH_PROMPT
 
+        users_by_name = {u['username'].lower(): u for u in all_users_panel}
         valid_target_user = None
         
         for link in links:
             if link.marzban_username in my_managed_usernames:
                 
-                found_in_panel = next((u for u in all_users_panel if u['username'].lower() == link.marzban_username.lower()), None)
+                found_in_panel = users_by_name.get(link.marzban_username.lower())
                 
                 if found_in_panel:
                     valid_target_user = found_in_panel
                     break
-                else:
+                if not all_panels_read or not link.panel_id:
+                    continue  # Can't tell a dead link from an unreachable panel; keep it.
+
+                # The cached list may be older than the account: confirm against a fresh fetch before deleting.
+                found_in_panel, panel_read = await panel_utils.find_user_in_fresh_snapshot(link.panel_id, link.marzban_username)
+                if found_in_panel:
+                    valid_target_user = found_in_panel
+                    break
+                if panel_read:
                     LOGGER.info(f"Auto-cleaning dead link: {link.marzban_username} for telegram_id {telegram_id}")
                     await crud_marzban_link.delete_marzban_link(link.marzban_username)
         
         if valid_target_user:
-            context.user_data['last_search_results'] = [valid_target_user]
-            
             keyboard = build_users_keyboard(
                 users=[valid_target_user], 
                 current_page=1, 
@@ -142,33 +147,15 @@ async def _search_by_service_username(update: Update, context: ContextTypes.DEFA
     )
 
     try:
-        all_users = await panel_utils.get_all_users_from_all_panels()
-        if all_users is None:
-            await update.message.reply_text(_("marzban_display.panel_connection_error"))
-            return SEARCH_PROMPT
-
-        found_users = [
-            user for user in all_users 
-            if user.get('username') and isinstance(user.get('username'), str) 
-            and search_query_normalized in normalize_username(user['username'])
-        ]
-
-        if user_id not in config.AUTHORIZED_USER_IDS:
-            my_managed_usernames = await crud_bot_managed_user.get_users_created_by(user_id)
-            
-            found_users = [u for u in found_users if u['username'] in my_managed_usernames]
-        # ----------------------------------------
-
-        found_users.sort(key=lambda u: u.get('username', '').lower())
+        # Ranked by the username index: exact, then prefix, then substring matches.
+        # Only the query is kept; further pages re-run it (see display.get_search_page).
+        context.user_data['last_search_query'] = search_query_normalized
+        page_users, _page, total_pages = await get_search_page(context, user_id, 1)
 
-        if not found_users:
+        if not page_users:
             await update.message.reply_text(_("search.no_users_found_by_username", query=f"«{query}»"))
             return SEARCH_PROMPT
         else:
-            context.user_data['last_search_results'] = found_users
-            page_users = found_users[:USERS_PER_PAGE]
-            total_pages = math.ceil(len(found_users) / USERS_PER_PAGE)
-            
             keyboard = build_users_keyboard(users=page_users, current_page=1, total_pages=total_pages, list_type='search')
             title = _("search.search_results_title_username", query=f"«{query}»")
             
@@ -5,8 +5,11 @@ import subprocess
 from telegram import Update
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
+from telegram.helpers import escape_markdown
 
 from database.crud import user as crud_user
+from database.crud import panel_credential as crud_panel
+from core.panel_api.helpers import get_panel_api_stats
 from shared.auth import admin_only
 
 LOGGER = logging.getLogger(__name__)
@@ -51,6 +54,19 @@ async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     stats_text += _("stats.total_users", count=total_users)
     stats_text += _("stats.ping_to_telegram", ping=ping_text)
 
+    # Counters of the live panel API clients (since start, or since the panel's credentials last changed).
+    panel_stats = get_panel_api_stats()
+    if panel_stats:
+        panel_names = {panel.id: panel.name for panel in await crud_panel.get_all_panels()}
+        stats_text += _("stats.panel_api_title")
+        for panel_id, panel_stat in sorted(panel_stats.items()):
+            stats_text += _(
+                "stats.panel_api_line",
+                name=escape_markdown(panel_names.get(panel_id, str(panel_id))),
+                requests=panel_stat.requests, failures=panel_stat.failures,
+                logins=panel_stat.logins, latency_ms=panel_stat.avg_latency * 1000,
+            )
+
     await message.edit_text(stats_text, parse_mode=ParseMode.MARKDOWN)
 
 # --- END OF FILE modules/stats/actions.py ---
\ No newline at end of file
@@ -1,7 +1,6 @@
 # FILE: modules/support_panel/actions.py
 
 import logging
-import math
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes, ConversationHandler
 from telegram.constants import ParseMode
@@ -12,7 +11,7 @@ from database.crud import bot_managed_user as crud_bot_managed_user
 from shared import panel_utils
 from config import config
 
-from modules.marzban.actions.display import build_users_keyboard
+from modules.marzban.actions.display import build_users_keyboard, parse_page_callback
 from modules.marzban.actions.constants import USERS_PER_PAGE
 
 LOGGER = logging.getLogger(__name__)
@@ -47,6 +46,38 @@ async def show_support_menu(update: Update, context: ContextTypes.DEFAULT_TYPE)
         parse_mode=ParseMode.MARKDOWN
     )
 
+MY_USERS_PAGE_PREFIX = "myusers_page"
+
+
+async def _render_my_users_page(user_id: int, page: int = 1, after: str = None, before: str = None):
+    """
+    Builds one page of the support admin's own users.
+    Returns (text, keyboard), or (text, None) if there is nothing to list.
+    """
+    my_usernames = await crud_bot_managed_user.get_users_created_by(user_id)
+    if not my_usernames:
+        return _("support_panel.my_users.empty"), None
+
+    entries = await panel_utils.get_entries_for_usernames(my_usernames)
+    if not entries:
+        return _("support_panel.my_users.panel_empty"), None
+
+    page_entries, page, total_pages = panel_utils.paginate_entries(entries, USERS_PER_PAGE, page, after, before)
+    keyboard = build_users_keyboard(
+        users=panel_utils.resolve_entries(page_entries),
+        current_page=page,
+        total_pages=total_pages,
+        list_type='myusers',
+        page_callback_prefix=MY_USERS_PAGE_PREFIX
+    )
+
+    if page == 1 and after is None and before is None:
+        title = _("support_panel.my_users.title", count=len(entries))
+    else:
+        title = _("support_panel.my_users.title_page", count=len(entries), page=page, total=total_pages)
+    return title, keyboard
+
+
 async def show_my_users(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Fetches and displays users created by the current support admin.
@@ -56,45 +87,11 @@ async def show_my_users(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     waiting_msg = await update.message.reply_text(_("support_panel.my_users.loading"))
 
     try:
-        my_usernames = await crud_bot_managed_user.get_users_created_by(user_id)
-        
-        if not my_usernames:
-            await waiting_msg.edit_text(_("support_panel.my_users.empty"))
-            return
-
-        all_panel_users = await panel_utils.get_all_users_from_all_panels()
-        
-        if not all_panel_users:
-             await waiting_msg.edit_text(_("marzban_display.panel_connection_error"))
-             return
-
-        my_usernames_set = set(my_usernames)
-        
-        my_filtered_users = [
-            u for u in all_panel_users 
-            if u.get('username') in my_usernames_set
-        ]
-        
-        my_filtered_users.sort(key=lambda u: u.get('username', '').lower())
-        
-        if not my_filtered_users:
-            await waiting_msg.edit_text(_("support_panel.my_users.panel_empty"))
+        title, keyboard = await _render_my_users_page(user_id)
+        if keyboard is None:
+            await waiting_msg.edit_text(title)
             return
 
-        context.user_data['last_search_results'] = my_filtered_users
-        
-        page_users = my_filtered_users[:USERS_PER_PAGE]
-        total_pages = math.ceil(len(my_filtered_users) / USERS_PER_PAGE)
-        
-        keyboard = build_users_keyboard(
-            users=page_users, 
-            current_page=1, 
-            total_pages=total_pages, 
-            list_type='myusers' 
-        )
-        
-        title = _("support_panel.my_users.title", count=len(my_filtered_users))
-        
         await waiting_msg.delete()
         await update.message.reply_text(title, reply_markup=keyboard)
 
@@ -104,74 +101,23 @@ async def show_my_users(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 
 async def handle_my_users_pagination(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
-    Handles pagination with auto-refetch logic.
+    Handles pagination. Pages are sliced from the shared panel snapshots using
+    the keyset cursor in the callback data, so nothing is kept in user_data.
     """
     query = update.callback_query
     await query.answer()
     user_id = update.effective_user.id
     
-    try:
-        page = int(query.data.split('_')[-1])
-    except:
-        page = 1
-        
-    users_list = context.user_data.get('last_search_results', [])
-    
-    if not users_list:
-        try:
-            await query.edit_message_text(_("support_panel.my_users.refreshing"))
-        except:
-            pass
-
-        try:
-            my_usernames = await crud_bot_managed_user.get_users_created_by(user_id)
-            if not my_usernames:
-                await query.edit_message_text(_("support_panel.my_users.empty"))
-                return
-
-            all_panel_users = await panel_utils.get_all_users_from_all_panels()
-            if not all_panel_users:
-                await query.edit_message_text(_("marzban_display.panel_connection_error"))
-                return
-
-            my_usernames_set = set(my_usernames)
-            users_list = [
-                u for u in all_panel_users 
-                if u.get('username') in my_usernames_set
-            ]
-            users_list.sort(key=lambda u: u.get('username', '').lower())
-            
-            context.user_data['last_search_results'] = users_list
-            
-        except Exception as e:
-            LOGGER.error(f"Auto-refetch failed: {e}")
-            await query.edit_message_text(_("support_panel.my_users.refetch_error"))
-            return
-    # -----------------------------
+    page, after, before = parse_page_callback(query.data, MY_USERS_PAGE_PREFIX)
 
-    if not users_list:
-        await query.edit_message_text(_("support_panel.my_users.not_found"))
+    try:
+        title, keyboard = await _render_my_users_page(user_id, page, after, before)
+    except Exception as e:
+        LOGGER.error(f"My users pagination failed: {e}")
+        await query.edit_message_text(_("support_panel.my_users.refetch_error"))
         return
 
-    total_pages = math.ceil(len(users_list) / USERS_PER_PAGE)
-    if page > total_pages: page = total_pages
-    if page < 1: page = 1
-
-    start_idx = (page - 1) * USERS_PER_PAGE
-    end_idx = start_idx + USERS_PER_PAGE
-    
-    page_users = users_list[start_idx:end_idx]
-    
-    keyboard = build_users_keyboard(
-        users=page_users, 
-        current_page=page, 
-        total_pages=total_pages, 
-        list_type='myusers'
-    )
-    
-    title = _("support_panel.my_users.title_page", count=len(users_list), page=page, total=total_pages)
-
     try:
         await query.edit_message_text(text=title, reply_markup=keyboard)
     except Exception as e:
-        LOGGER.warning(f"Pagination edit warning: {e}")
\ No newline at end of file
+        LOGGER.warning(f"Pagination edit warning: {e}")
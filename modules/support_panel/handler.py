@@ -6,6 +6,7 @@ from telegram.ext import (
     CallbackQueryHandler, ConversationHandler, CommandHandler, ContextTypes
 )
 from shared.translator import translator
+from shared.router import Router
 from . import actions
 import re
 from modules.marzban.actions import add_user
@@ -34,23 +35,11 @@ def register(application: Application) -> None:
     exit_pattern = f"^({'|'.join(map(re.escape, EXIT_BUTTONS))})$"
     exit_handler = MessageHandler(filters.Regex(exit_pattern), support_exit_handler)
 
-    application.add_handler(
-        MessageHandler(
-            filters.Regex(f"^{re.escape(support_btn_text)}$"), 
-            actions.show_support_menu
-        )
-    )
-
-    application.add_handler(
-        MessageHandler(
-            filters.Regex(f"^{re.escape(my_users_btn_text)}$"), 
-            actions.show_my_users
-        )
-    )
-    
-    application.add_handler(
-        CallbackQueryHandler(actions.handle_my_users_pagination, pattern="^myusers_page_")
-    )
+    router = Router("support_panel")
+    router.add_text(support_btn_text, actions.show_support_menu)
+    router.add_text(my_users_btn_text, actions.show_my_users)
+    router.add_callback("^myusers_page_", actions.handle_my_users_pagination)
+    application.add_handler(router)
 
     support_add_user_conv = ConversationHandler(
         entry_points=[
@@ -0,0 +1,71 @@
+# FILE: shared/activity_tracker.py
+# Write-behind buffer for users.last_activity and users.is_reachable.
+
+import logging
+from datetime import datetime
+from typing import Dict
+
+from telegram.error import BadRequest, Forbidden
+from telegram.ext import ContextTypes
+
+from database.crud import user as crud_user
+
+LOGGER = logging.getLogger(__name__)
+
+# user_id -> most recent activity time not yet written to the database
+_pending_activity: Dict[int, datetime] = {}
+# user_id -> when a send to them failed because the chat is gone
+_pending_unreachable: Dict[int, datetime] = {}
+
+
+def record_activity(user_id: int) -> None:
+    """Notes that a user was active. Cheap enough to call for every update."""
+    _pending_activity[user_id] = datetime.now()
+    _pending_unreachable.pop(user_id, None)
+
+
+def is_unreachable_error(error: Exception) -> bool:
+    """True for send errors that will keep failing until the user contacts the bot again."""
+    if isinstance(error, Forbidden):
+        return True
+    return isinstance(error, BadRequest) and "chat not found" in str(error).lower()
+
+
+def record_unreachable(user_id: int) -> None:
+    """Notes that sending to a user failed for good (see is_unreachable_error)."""
+    _pending_unreachable[user_id] = datetime.now()
+
+
+async def _flush_unreachable() -> None:
+    global _pending_unreachable
+    if not _pending_unreachable:
+        return
+    batch, _pending_unreachable = _pending_unreachable, {}
+    if await crud_user.mark_users_unreachable(batch) is None:
+        for user_id, failed_at in batch.items():
+            if user_id not in _pending_activity:
+                _pending_unreachable.setdefault(user_id, failed_at)
+
+
+async def flush_activity() -> int:
+    """Writes all buffered timestamps in one bulk update. Returns the number of users flushed."""
+    global _pending_activity
+    flushed = 0
+    if _pending_activity:
+        batch, _pending_activity = _pending_activity, {}
+        if await crud_user.bulk_update_last_activity(batch) is None:
+            # Put the batch back, without overwriting anything newer recorded meanwhile.
+            for user_id, seen_at in batch.items():
+                _pending_activity.setdefault(user_id, seen_at)
+        else:
+            flushed = len(batch)
+
+    # After the activity write (which marks users reachable): a failure recorded
+    # after the user's last update wins, an update after the failure already dropped it.
+    await _flush_unreachable()
+    return flushed
+
+
+async def flush_activity_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback for the periodic flush."""
+    await flush_activity()
@@ -8,7 +8,7 @@ from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, filt
 from telegram import error, InlineKeyboardButton, InlineKeyboardMarkup
 from config import config
 from shared.translator import _
-from database.crud.admin import is_support_admin
+from database.crud.admin import is_support_admin, refresh_admin_cache_if_changed
 
 LOGGER = logging.getLogger(__name__)
 
@@ -20,7 +20,7 @@ async def is_admin(user_id: int) -> bool:
     if user_id in config.AUTHORIZED_USER_IDS:
         return True
     
-    # 2. Check Support Admin (Database)
+    # 2. Check Support Admin (in-memory copy of the admins table)
     try:
         if await is_support_admin(user_id):
             return True
@@ -29,6 +29,11 @@ async def is_admin(user_id: int) -> bool:
         
     return False
 
+async def sync_admin_cache_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback: picks up admin changes made by other bot processes."""
+    if await refresh_admin_cache_if_changed():
+        LOGGER.info("Admin cache reloaded after a change in the admins table.")
+
 def admin_only(func):
     @wraps(func)
     async def wrapped(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
@@ -105,8 +110,8 @@ def get_admin_fallbacks():
     # Filter out any potential None values if a translation key is missing
     valid_buttons = [btn for btn in admin_menu_and_back_buttons if btn]
     
-    # Create a single filter for all these buttons
-    main_menu_filter = filters.Text(valid_buttons)
+    # Create a single filter for all these buttons (a set, so the membership test is a hash lookup)
+    main_menu_filter = filters.Text(frozenset(valid_buttons))
 
     # ✨ FIX: The fallback list is now simple and clear. Both pressing a menu button
     # and using /cancel will trigger the same clean exit function.
@@ -0,0 +1,200 @@
+# FILE: shared/broadcast_engine.py
+# Rate-limited, concurrent bulk sending (broadcasts, forwards, gift notifications).
+
+import asyncio
+import datetime
+import logging
+import time
+from dataclasses import dataclass
+from typing import AsyncIterable, Awaitable, Callable, Iterable, Optional, Union
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+from config import config
+from shared.activity_tracker import is_unreachable_error, record_unreachable
+
+LOGGER = logging.getLogger(__name__)
+
+RETRY_BASE_DELAY = 1.0  # Seconds before the first retry of a transient error; doubles per attempt
+MAX_FLOOD_WAITS = 5     # A recipient that keeps hitting RetryAfter is given up on after this many waits
+
+SendFunc = Callable[[int], Awaitable[object]]
+ResultCallback = Callable[[int, bool], Awaitable[None]]
+Recipients = Union[Iterable[int], AsyncIterable[int]]
+
+
+class SkipRecipient(Exception):
+    """Raised by a send function to drop a recipient without counting it (e.g. the broadcast was cancelled)."""
+    pass
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, up to `capacity` stored.
+    acquire() waits until a token is available. Waiters are served in order.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+# --- Global send budget ---
+# One bucket and one flood-control deadline for the whole process: Telegram's
+# limits (and its RetryAfter penalties) apply to the bot, not to a single job.
+_bucket: Optional[TokenBucket] = None
+_flood_wait_until = 0.0
+
+
+def _get_bucket() -> TokenBucket:
+    global _bucket
+    if _bucket is None:
+        _bucket = TokenBucket(config.BROADCAST_RATE_PER_SECOND)
+    return _bucket
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    value = error.retry_after
+    return value.total_seconds() if isinstance(value, datetime.timedelta) else float(value)
+
+
+async def _wait_for_slot() -> None:
+    while True:
+        delay = _flood_wait_until - time.monotonic()
+        if delay <= 0:
+            break
+        await asyncio.sleep(delay)
+    await _get_bucket().acquire()
+
+
+@dataclass
+class BroadcastResult:
+    total: int = 0
+    success: int = 0
+    failure: int = 0
+    retries: int = 0
+    flood_waits: int = 0
+    unreachable: int = 0
+    seconds: float = 0.0
+
+
+async def send_with_retry(chat_id: int, send: SendFunc, result: BroadcastResult, max_retries: int) -> Optional[bool]:
+    """
+    Sends to one recipient through the global budget.
+    RetryAfter pauses every sender for the requested time and then retries;
+    timeouts and network errors are retried up to `max_retries` times with backoff;
+    anything else (blocked, chat not found, bad request) fails immediately, and
+    recipients whose chat is gone are flagged unreachable for later sends.
+    Returns None if the send function skipped the recipient.
+    """
+    global _flood_wait_until
+    attempt, flood_waits = 0, 0
+    while True:
+        await _wait_for_slot()
+        try:
+            await send(chat_id)
+            return True
+        except SkipRecipient:
+            return None
+        except RetryAfter as e:
+            wait = _retry_after_seconds(e)
+            _flood_wait_until = max(_flood_wait_until, time.monotonic() + wait)
+            result.flood_waits += 1
+            flood_waits += 1
+            LOGGER.warning(f"[Broadcast] Flood control hit, pausing all sends for {wait:.0f}s.")
+            if flood_waits > MAX_FLOOD_WAITS:
+                LOGGER.warning(f"[Broadcast] Giving up on {chat_id} after {flood_waits} flood waits.")
+                return False
+        except (Forbidden, BadRequest) as e:
+            # BadRequest is a NetworkError subclass, but retrying won't help (e.g. chat not found).
+            if is_unreachable_error(e):
+                record_unreachable(chat_id)
+                result.unreachable += 1
+            LOGGER.warning(f"[Broadcast] Send to {chat_id} rejected: {e}")
+            return False
+        except (TimedOut, NetworkError) as e:
+            attempt += 1
+            if attempt > max_retries:
+                LOGGER.warning(f"[Broadcast] Send to {chat_id} failed after {max_retries} retries: {e}")
+                return False
+            result.retries += 1
+            await asyncio.sleep(RETRY_BASE_DELAY * 2 ** (attempt - 1))
+        except Exception as e:
+            LOGGER.warning(f"[Broadcast] Send to {chat_id} failed: {e}")
+            return False
+
+
+async def _feed(recipients: Recipients, queue: asyncio.Queue, workers: int) -> None:
+    try:
+        if hasattr(recipients, '__aiter__'):
+            async for chat_id in recipients:
+                await queue.put(chat_id)
+        else:
+            for chat_id in recipients:
+                await queue.put(chat_id)
+    finally:
+        for _ in range(workers):
+            await queue.put(None)
+
+
+async def broadcast(
+    recipients: Recipients, send: SendFunc, concurrency: Optional[int] = None, max_retries: Optional[int] = None,
+    on_result: Optional[ResultCallback] = None,
+) -> BroadcastResult:
+    """
+    Calls `send(chat_id)` for every recipient with `concurrency` senders sharing
+    the global token bucket. `recipients` may be a list or an async iterator
+    (consumed lazily). `on_result(chat_id, ok)` is awaited after each counted send.
+    Returns the counts once every recipient has been handled.
+    """
+    concurrency = concurrency or config.BROADCAST_CONCURRENCY
+    max_retries = config.BROADCAST_MAX_RETRIES if max_retries is None else max_retries
+    result = BroadcastResult()
+    started_at = time.monotonic()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 4)
+
+    async def sender() -> None:
+        while (chat_id := await queue.get()) is not None:
+            ok = await send_with_retry(chat_id, send, result, max_retries)
+            if ok is None:
+                continue
+            result.total += 1
+            if ok:
+                result.success += 1
+            else:
+                result.failure += 1
+            if on_result:
+                try:
+                    await on_result(chat_id, ok)
+                except Exception as e:
+                    LOGGER.error(f"[Broadcast] Result callback failed for {chat_id}: {e}", exc_info=True)
+
+    feeder = asyncio.create_task(_feed(recipients, queue, concurrency))
+    try:
+        await asyncio.gather(*(sender() for _ in range(concurrency)))
+    finally:
+        feeder.cancel()
+    if feeder.done() and not feeder.cancelled() and feeder.exception():
+        LOGGER.error(f"[Broadcast] Reading recipients failed part-way: {feeder.exception()}")
+    result.seconds = time.monotonic() - started_at
+    LOGGER.info(
+        f"[Broadcast] Finished {result.total} sends in {result.seconds:.1f}s: "
+        f"{result.success} ok, {result.failure} failed, {result.retries} retries, {result.flood_waits} flood waits, {result.unreachable} newly unreachable."
+    )
+    return result
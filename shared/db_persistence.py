@@ -0,0 +1,331 @@
+# FILE: shared/db_persistence.py
+# Conversation/user_data persistence stored key by key in the database.
+
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import pickle
+from typing import Any, Dict, Optional, Set, Tuple
+
+from telegram import Bot
+from telegram.ext import BasePersistence, PersistenceInput, PicklePersistence
+
+from database.crud import bot_persistence as crud_persistence
+
+LOGGER = logging.getLogger(__name__)
+
+# Data keys that can't be stored in their own row (non-string or too long)
+# are kept together in this reserved row.
+_OTHER_KEYS_ROW = "\x00other"
+_MAX_KEY_LENGTH = 191
+
+EntryKey = Tuple[str, str, str]  # (namespace, owner, data_key)
+
+# Placeholders stored instead of a Bot instance. The values match the ones
+# PicklePersistence writes, so rows pickled before this module had its own
+# picklers still load.
+_REPLACED_KNOWN_BOT = "a known bot replaced by PTB's PicklePersistence"
+_REPLACED_UNKNOWN_BOT = "an unknown bot replaced by PTB's PicklePersistence"
+
+
+class _BotPickler(pickle.Pickler):
+    """Pickles the running Bot as a placeholder, so stored Telegram objects (e.g. a
+    Message kept in user_data) are re-bound to the bot after a restart."""
+
+    def __init__(self, bot: Bot, *args, **kwargs):
+        self._bot = bot
+        super().__init__(*args, **kwargs)
+
+    def persistent_id(self, obj: object) -> Optional[str]:
+        if obj is self._bot:
+            return _REPLACED_KNOWN_BOT
+        if isinstance(obj, Bot):
+            LOGGER.warning("[Persistence] Storing a Bot other than the running one; it will load as None.")
+            return _REPLACED_UNKNOWN_BOT
+        return None
+
+
+class _BotUnpickler(pickle.Unpickler):
+    """Puts the running Bot back where _BotPickler left a placeholder."""
+
+    def __init__(self, bot: Bot, *args, **kwargs):
+        self._bot = bot
+        super().__init__(*args, **kwargs)
+
+    def persistent_load(self, pid: str) -> Optional[Bot]:
+        if pid == _REPLACED_KNOWN_BOT:
+            return self._bot
+        if pid == _REPLACED_UNKNOWN_BOT:
+            return None
+        raise pickle.UnpicklingError(f"Unknown persistent id {pid!r}.")
+
+
+class DatabasePersistence(BasePersistence):
+    """
+    A BasePersistence that keeps each user_data/chat_data/bot_data key in its own
+    database row and only writes the keys whose pickled value changed.
+
+    - user_data and chat_data are loaded lazily, the first time PTB refreshes a
+      user/chat for an update or job, instead of all at startup.
+    - Writes coming from one persistence run are collected and committed in one
+      batched transaction.
+    - On first start, an existing PicklePersistence file is imported and renamed.
+    """
+
+    def __init__(self, legacy_pickle_path: Optional[str] = None, update_interval: float = 60):
+        super().__init__(store_data=PersistenceInput(), update_interval=update_interval)
+        self.legacy_pickle_path = legacy_pickle_path
+        # (namespace, owner) -> {data_key: digest of the stored value}; presence means "loaded".
+        self._digests: Dict[Tuple[str, str], Dict[str, str]] = {}
+        self._pending_upserts: Dict[EntryKey, bytes] = {}
+        self._pending_deletes: Set[EntryKey] = set()
+        self._write_task: Optional[asyncio.Task] = None
+        self._migration_lock = asyncio.Lock()
+        self._migrated = False
+
+    # --- Serialization ---
+
+    def _dumps(self, value: Any) -> bytes:
+        buffer = io.BytesIO()
+        _BotPickler(self.bot, buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(value)
+        return buffer.getvalue()
+
+    def _loads(self, blob: bytes) -> Any:
+        return _BotUnpickler(self.bot, io.BytesIO(blob)).load()
+
+    @staticmethod
+    def _digest(blob: bytes) -> str:
+        return hashlib.md5(blob).hexdigest()
+
+    @staticmethod
+    def _split_keys(data: Dict) -> Dict[str, Any]:
+        rows, other = {}, {}
+        for key, value in data.items():
+            if isinstance(key, str) and key != _OTHER_KEYS_ROW and len(key) <= _MAX_KEY_LENGTH:
+                rows[key] = value
+            else:
+                other[key] = value
+        if other:
+            rows[_OTHER_KEYS_ROW] = other
+        return rows
+
+    def _decode_rows(self, rows) -> Dict[str, Dict]:
+        """Groups (owner, data_key, value) rows into {owner: data}."""
+        grouped: Dict[str, Dict] = {}
+        for owner, data_key, blob in rows:
+            try:
+                value = self._loads(blob)
+            except Exception as e:
+                LOGGER.warning(f"[Persistence] Dropping unreadable entry '{data_key}' of '{owner}': {e}")
+                continue
+            data = grouped.setdefault(owner, {})
+            if data_key == _OTHER_KEYS_ROW:
+                data.update(value)
+            else:
+                data[data_key] = value
+        return grouped
+
+    # --- Batched writes ---
+
+    def _stage(self, namespace: str, owner: str, data: Dict) -> None:
+        """Queues the keys of `data` whose value differs from what is stored."""
+        stored = self._digests.setdefault((namespace, owner), {})
+        current = {}
+        for data_key, value in self._split_keys(data).items():
+            try:
+                blob = self._dumps(value)
+            except Exception as e:
+                LOGGER.warning(f"[Persistence] Skipping unpicklable key '{data_key}' of {namespace} '{owner}': {e}")
+                if data_key in stored:
+                    current[data_key] = stored[data_key]  # Keep whatever was stored before
+                continue
+            digest = self._digest(blob)
+            current[data_key] = digest
+            if stored.get(data_key) != digest:
+                entry = (namespace, owner, data_key)
+                self._pending_upserts[entry] = blob
+                self._pending_deletes.discard(entry)
+
+        for data_key in set(stored) - set(current):
+            entry = (namespace, owner, data_key)
+            self._pending_upserts.pop(entry, None)
+            self._pending_deletes.add(entry)
+        self._digests[(namespace, owner)] = current
+
+    async def _write_pending(self) -> None:
+        # Loops so entries staged while a write is in flight are picked up too.
+        while self._pending_upserts or self._pending_deletes:
+            upserts, deletes = self._pending_upserts, self._pending_deletes
+            self._pending_upserts, self._pending_deletes = {}, set()
+            if not await crud_persistence.write_entries(upserts, deletes):
+                # Forget the digests so the next run rewrites these entries.
+                for namespace, owner, data_key in list(upserts) + list(deletes):
+                    self._digests.get((namespace, owner), {}).pop(data_key, None)
+                return
+
+    async def _commit(self) -> None:
+        """
+        PTB gathers all update_* calls of a persistence run concurrently. The
+        first one starts the write task; the rest have staged their changes by
+        the time it runs, so the whole run lands in one transaction.
+        """
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._write_pending())
+        await asyncio.shield(self._write_task)
+
+    # --- Lazy loading ---
+
+    async def _load_owner(self, namespace: str, owner: str, data: Dict) -> None:
+        if (namespace, owner) in self._digests:
+            return
+        await self._migrate_legacy_pickle()
+        rows = await crud_persistence.load_namespace(namespace, owner)
+        if (namespace, owner) in self._digests:
+            return  # Loaded by a concurrent refresh of the same user/chat
+        self._digests[(namespace, owner)] = {data_key: self._digest(blob) for _, data_key, blob in rows}
+        for key, value in self._decode_rows(rows).get(owner, {}).items():
+            data.setdefault(key, value)
+
+    # --- Migration from PicklePersistence ---
+
+    async def _migrate_legacy_pickle(self) -> None:
+        async with self._migration_lock:
+            if self._migrated:
+                return
+            self._migrated = True
+            path = self.legacy_pickle_path
+            if not path or not os.path.exists(path):
+                return
+            if await crud_persistence.has_entries():
+                LOGGER.warning(f"[Persistence] '{path}' exists but the database already holds state; not importing it.")
+                return
+
+            LOGGER.info(f"[Persistence] Importing legacy pickle file '{path}'...")
+            legacy = PicklePersistence(filepath=path)
+            legacy.set_bot(self.bot)
+            user_data = await legacy.get_user_data()
+            chat_data = await legacy.get_chat_data()
+            bot_data = await legacy.get_bot_data()
+            callback_data = await legacy.get_callback_data()
+            conversation_names = list(legacy.conversations or {})
+
+            for user_id, data in user_data.items():
+                self._stage("user", str(user_id), data)
+            for chat_id, data in chat_data.items():
+                self._stage("chat", str(chat_id), data)
+            self._stage("bot", "", bot_data)
+            if callback_data is not None:
+                self._stage("callback", "", {"data": callback_data})
+            for name in conversation_names:
+                states = await legacy.get_conversations(name)
+                self._stage("conversation", name, {json.dumps(list(key)): state for key, state in states.items()})
+
+            # Imported users/chats are reloaded lazily like everything else.
+            self._digests = {k: v for k, v in self._digests.items() if k[0] not in ("user", "chat")}
+            await self._commit()
+            os.replace(path, f"{path}.migrated")
+            LOGGER.info(f"[Persistence] Imported {len(user_data)} users and {len(chat_data)} chats; renamed the file to '{path}.migrated'.")
+
+    # --- BasePersistence: loading ---
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        await self._migrate_legacy_pickle()
+        return {}  # Loaded per user in refresh_user_data
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        await self._migrate_legacy_pickle()
+        return {}  # Loaded per chat in refresh_chat_data
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        await self._migrate_legacy_pickle()
+        rows = await crud_persistence.load_namespace("bot")
+        self._digests[("bot", "")] = {data_key: self._digest(blob) for _, data_key, blob in rows}
+        return self._decode_rows(rows).get("", {})
+
+    async def get_callback_data(self):
+        await self._migrate_legacy_pickle()
+        rows = await crud_persistence.load_namespace("callback")
+        self._digests[("callback", "")] = {data_key: self._digest(blob) for _, data_key, blob in rows}
+        return self._decode_rows(rows).get("", {}).get("data")
+
+    async def get_conversations(self, name: str) -> Dict:
+        await self._migrate_legacy_pickle()
+        rows = await crud_persistence.load_namespace("conversation", name)
+        self._digests[("conversation", name)] = {data_key: self._digest(blob) for _, data_key, blob in rows}
+        states = self._decode_rows(rows).get(name, {})
+        return {tuple(json.loads(key)): state for key, state in states.items()}
+
+    # --- BasePersistence: refreshing (lazy loads) ---
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict) -> None:
+        await self._load_owner("user", str(user_id), user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict) -> None:
+        await self._load_owner("chat", str(chat_id), chat_data)
+
+    async def refresh_bot_data(self, bot_data: Dict) -> None:
+        pass  # Loaded at startup; only this process writes it.
+
+    # --- BasePersistence: writing ---
+
+    async def update_user_data(self, user_id: int, data: Dict) -> None:
+        owner = str(user_id)
+        if ("user", owner) not in self._digests:
+            # Written without having been refreshed (e.g. by a job): merge with what's stored first.
+            await self._load_owner("user", owner, data)
+        self._stage("user", owner, data)
+        await self._commit()
+
+    async def update_chat_data(self, chat_id: int, data: Dict) -> None:
+        owner = str(chat_id)
+        if ("chat", owner) not in self._digests:
+            await self._load_owner("chat", owner, data)
+        self._stage("chat", owner, data)
+        await self._commit()
+
+    async def update_bot_data(self, data: Dict) -> None:
+        self._stage("bot", "", data)
+        await self._commit()
+
+    async def update_callback_data(self, data) -> None:
+        self._stage("callback", "", {"data": data})
+        await self._commit()
+
+    async def update_conversation(self, name: str, key: Tuple, new_state: Optional[object]) -> None:
+        stored = self._digests.setdefault(("conversation", name), {})
+        entry = ("conversation", name, json.dumps(list(key)))
+        if new_state is None:
+            if stored.pop(entry[2], None) is not None:
+                self._pending_upserts.pop(entry, None)
+                self._pending_deletes.add(entry)
+        else:
+            blob = self._dumps(new_state)
+            digest = self._digest(blob)
+            if stored.get(entry[2]) == digest:
+                return
+            stored[entry[2]] = digest
+            self._pending_upserts[entry] = blob
+            self._pending_deletes.discard(entry)
+        await self._commit()
+
+    def _discard_pending(self, namespace: str, owner: str) -> None:
+        self._digests.pop((namespace, owner), None)
+        for entry in [e for e in self._pending_upserts if e[:2] == (namespace, owner)]:
+            del self._pending_upserts[entry]
+        self._pending_deletes = {e for e in self._pending_deletes if e[:2] != (namespace, owner)}
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._discard_pending("user", str(user_id))
+        await crud_persistence.delete_owner("user", str(user_id))
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._discard_pending("chat", str(chat_id))
+        await crud_persistence.delete_owner("chat", str(chat_id))
+
+    async def flush(self) -> None:
+        if self._write_task and not self._write_task.done():
+            await self._write_task
+        await self._write_pending()
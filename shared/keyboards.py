@@ -8,11 +8,65 @@ from shared.translator import _
 from database.crud import bot_setting as crud_bot_setting
 # --- ----------------- ---
 from math import ceil
+import asyncio
+import functools
+from typing import Any, Dict, Hashable, Optional, Tuple
 from shared.translator import translator, _
+
+# =============================================================================
+#  Keyboard cache
+# =============================================================================
+# Static and settings/panel-driven keyboards are built once and reused until the
+# translations, bot settings or panel list change (each exposes a version number).
+# Markups are immutable, so one instance can be sent to every user.
+
+_keyboard_cache: Dict[Tuple[str, Hashable], Any] = {}
+_keyboard_cache_versions: Optional[Tuple] = None
+
+
+def _current_versions() -> Tuple:
+    from database.crud import panel_credential as crud_panel
+    return (translator.lang_code, translator.version, crud_bot_setting.get_settings_version(), crud_panel.get_panels_version())
+
+
+def _cached(name: str, role: Hashable = None) -> Tuple[Any, Tuple]:
+    """Returns (cached keyboard or None, versions it must be built against)."""
+    global _keyboard_cache_versions
+    versions = _current_versions()
+    if versions != _keyboard_cache_versions:
+        _keyboard_cache.clear()
+        _keyboard_cache_versions = versions
+    return _keyboard_cache.get((name, role)), versions
+
+
+def _store(name: str, role: Hashable, keyboard, versions: Tuple):
+    # Not kept if settings/panels/translations changed while an async builder was running.
+    if versions == _keyboard_cache_versions:
+        _keyboard_cache[(name, role)] = keyboard
+    return keyboard
+
+
+def _memoized(builder):
+    """Caches a keyboard builder that takes no arguments (sync or async)."""
+    name = builder.__name__
+    if asyncio.iscoroutinefunction(builder):
+        @functools.wraps(builder)
+        async def async_wrapper():
+            keyboard, versions = _cached(name)
+            return keyboard if keyboard is not None else _store(name, None, await builder(), versions)
+        return async_wrapper
+
+    @functools.wraps(builder)
+    def wrapper():
+        keyboard, versions = _cached(name)
+        return keyboard if keyboard is not None else _store(name, None, builder(), versions)
+    return wrapper
+
 # =============================================================================
 #  ReplyKeyboardMarkup Section
 # =============================================================================
 
+@_memoized
 def get_admin_main_menu_keyboard() -> ReplyKeyboardMarkup:
     keyboard = [
         [KeyboardButton(translator.get("keyboards.admin_main_menu.manage_users"))],
@@ -24,6 +78,7 @@ def get_admin_main_menu_keyboard() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
 # --- ADD THIS NEW FUNCTION to shared/keyboards.py ---
+@_memoized
 async def get_panel_selection_keyboard() -> ReplyKeyboardMarkup:
     """Dynamically builds a ReplyKeyboard for selecting a panel to manage."""
     # Local import to prevent circular dependency issues
@@ -61,6 +116,7 @@ def get_panel_type_selection_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(keyboard)
 
 
+@_memoized
 def get_user_management_keyboard() -> ReplyKeyboardMarkup:
     """The main keyboard for managing users of a specific, selected panel."""
     
@@ -72,6 +128,7 @@ def get_user_management_keyboard() -> ReplyKeyboardMarkup:
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@_memoized
 def get_settings_and_tools_keyboard() -> ReplyKeyboardMarkup:
     keyboard = [
         # --- FIX: All keys now use the 'keyboards.' namespace ---
@@ -83,6 +140,7 @@ def get_settings_and_tools_keyboard() -> ReplyKeyboardMarkup:
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@_memoized
 def get_helper_tools_keyboard() -> ReplyKeyboardMarkup:
     keyboard = [
 
@@ -100,6 +158,18 @@ async def get_customer_main_menu_keyboard(user_id: int) -> ReplyKeyboardMarkup:
     from database.crud.admin import is_support_admin
     from config import config
 
+    is_super_admin = user_id in config.AUTHORIZED_USER_IDS
+    is_support = False
+    try:
+        is_support = await is_support_admin(user_id)
+    except Exception:
+        pass 
+    # Only the role changes this keyboard, so it is cached per role.
+    role = "admin" if (is_super_admin or is_support) else "customer"
+    cached, versions = _cached("get_customer_main_menu_keyboard", role)
+    if cached is not None:
+        return cached
+
     keyboard_layout = [
         [KeyboardButton(_("keyboards.customer_main_menu.shop"))],
         [
@@ -115,20 +185,14 @@ async def get_customer_main_menu_keyboard(user_id: int) -> ReplyKeyboardMarkup:
     if config.SUPPORT_USERNAME:
         keyboard_layout.append([KeyboardButton(_("keyboards.customer_main_menu.support"))])
 
-    is_super_admin = user_id in config.AUTHORIZED_USER_IDS
-    is_support = False
-    try:
-        is_support = await is_support_admin(user_id)
-    except Exception:
-        pass 
-
-    if is_super_admin or is_support:
+    if role == "admin":
         keyboard_layout.append([KeyboardButton(_("keyboards.customer_main_menu.support_panel"))])
     # ------------------------------------------
     
-    return ReplyKeyboardMarkup(keyboard_layout, resize_keyboard=True)
+    return _store("get_customer_main_menu_keyboard", role, ReplyKeyboardMarkup(keyboard_layout, resize_keyboard=True), versions)
 
 
+@_memoized
 async def get_customer_shop_keyboard() -> ReplyKeyboardMarkup:
     bot_settings = await crud_bot_setting.load_bot_settings()
     is_sub_creation_active = bot_settings.get('is_sub_creation_active', True)
@@ -143,6 +207,7 @@ async def get_customer_shop_keyboard() -> ReplyKeyboardMarkup:
 
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@_memoized
 def get_back_to_main_menu_keyboard() -> ReplyKeyboardMarkup:
     keyboard = [
         [KeyboardButton(_("keyboards.general.back_to_main_menu"))]
@@ -153,6 +218,7 @@ def get_back_to_main_menu_keyboard() -> ReplyKeyboardMarkup:
         is_persistent=True  
     )
 
+@_memoized
 async def get_customer_view_for_admin_keyboard() -> ReplyKeyboardMarkup:
     bot_settings = await crud_bot_setting.load_bot_settings()
     is_wallet_enabled = bot_settings.get('is_wallet_enabled', False)
@@ -177,6 +243,7 @@ async def get_customer_view_for_admin_keyboard() -> ReplyKeyboardMarkup:
     
     return ReplyKeyboardMarkup(keyboard_layout, resize_keyboard=True)
 
+@_memoized
 def get_notes_management_keyboard() -> ReplyKeyboardMarkup:
     keyboard = [
         # --- FIX: All keys now use the 'keyboards.' namespace ---
@@ -185,6 +252,7 @@ def get_notes_management_keyboard() -> ReplyKeyboardMarkup:
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+@_memoized
 def get_financial_settings_keyboard() -> ReplyKeyboardMarkup:
     keyboard = [
         # --- FIX: All keys now use the 'keyboards.' namespace ---
@@ -196,6 +264,7 @@ def get_financial_settings_keyboard() -> ReplyKeyboardMarkup:
 
 # FILE: shared/keyboards.py
 
+@_memoized
 def get_broadcaster_menu_keyboard() -> ReplyKeyboardMarkup:
     """Creates the ReplyKeyboardMarkup for the new broadcaster module."""
     keyboard = [
@@ -248,6 +317,7 @@ def get_plan_management_keyboard() -> InlineKeyboardMarkup:
     ]
     return InlineKeyboardMarkup(keyboard)
 
+@_memoized
 def get_back_to_management_keyboard() -> ReplyKeyboardMarkup:
     keyboard = [
         # --- FIX: All keys now use the 'keyboards.' namespace ---
@@ -300,6 +370,7 @@ def get_connection_guide_keyboard(is_for_test_account_expired: bool = False) ->
     keyboard = [[button]]
     return InlineKeyboardMarkup(keyboard)
 
+@_memoized
 def get_cancel_keyboard() -> ReplyKeyboardMarkup:
     """Creates a standard cancel/back keyboard for conversations."""
     keyboard = [
@@ -309,6 +380,7 @@ def get_cancel_keyboard() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
 # --- ✨ NEW FUNCTION ADDED HERE ✨ ---
+@_memoized
 def get_balance_management_keyboard() -> ReplyKeyboardMarkup:
     """
     Creates a dedicated ReplyKeyboard for the balance management conversation.
@@ -349,6 +421,7 @@ def get_gift_management_keyboard() -> InlineKeyboardMarkup:
 
 
 
+@_memoized
 def get_message_builder_cancel_keyboard() -> ReplyKeyboardMarkup:
     """Creates a ReplyKeyboard with a single button to cancel the message builder."""
     keyboard = [
@@ -449,6 +522,7 @@ def build_paginated_keyboard(
     return InlineKeyboardMarkup(keyboard)
 
 # --- START: Replace get_panel_management_keyboard in shared/keyboards.py ---
+@_memoized
 async def get_panel_management_keyboard() -> ReplyKeyboardMarkup:
     """Dynamically builds a ReplyKeyboard with all panel names and control buttons."""
     # Local import to prevent circular dependency issues at startup
@@ -482,6 +556,7 @@ async def get_panel_management_keyboard() -> ReplyKeyboardMarkup:
 # --- END: Replacement ---
 
 # ADD THIS to the ReplyKeyboardMarkup section
+@_memoized
 def get_single_panel_management_keyboard() -> ReplyKeyboardMarkup:
     keyboard = [
         [KeyboardButton(_("keyboards.single_panel_management.connection_status")), KeyboardButton(_("keyboards.single_panel_management.delete_panel"))],
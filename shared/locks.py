@@ -0,0 +1,93 @@
+# FILE: shared/locks.py
+# Keyed asyncio locks: per-user update ordering and per-invoice approval guards.
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Dict, Hashable, List, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+LOGGER = logging.getLogger(__name__)
+
+
+class KeyedLocks:
+    """
+    One asyncio.Lock per key, created on first use and dropped again once nobody
+    holds or waits for it, so the dict only ever holds keys that are busy.
+    """
+
+    def __init__(self):
+        # key -> [lock, holders + waiters]
+        self._locks: Dict[Hashable, List[Any]] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._locks.pop(key, None)
+
+    def locked(self, key: Hashable) -> bool:
+        entry = self._locks.get(key)
+        return bool(entry) and entry[0].locked()
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+# Separate managers, so keys of different kinds never share a lock.
+update_locks = KeyedLocks()
+invoice_locks = KeyedLocks()
+
+
+def invoice_lock(invoice_id: int):
+    """Serialises approval / rejection of one invoice (admins, auto-approve job)."""
+    return invoice_locks.hold(invoice_id)
+
+
+def update_key(update: object) -> Optional[int]:
+    """The user an update belongs to (its chat when there is no user), or None for updates of nobody."""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user:
+        return update.effective_user.id
+    if update.effective_chat:
+        return update.effective_chat.id
+    return None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Runs updates concurrently, but one at a time per user: a user's updates are
+    handled in arrival order (asyncio.Lock wakes waiters FIFO), so their
+    ConversationHandler state and user_data never see two updates at once,
+    while other users proceed in parallel. The per-user wait happens before a
+    concurrency slot is taken, so one user clicking repeatedly cannot occupy
+    every slot.
+    """
+
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = update_key(update)
+        if key is None:
+            await super().process_update(update, coroutine)
+            return
+        async with update_locks.hold(key):
+            await super().process_update(update, coroutine)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
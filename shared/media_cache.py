@@ -0,0 +1,95 @@
+# FILE: shared/media_cache.py
+# Upload-once photo sending: content hash -> Telegram file_id, kept in memory and in the database.
+
+import hashlib
+import io
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from telegram import Bot, Message
+from telegram.error import BadRequest
+
+from database.crud import media_file as crud_media_file
+
+LOGGER = logging.getLogger(__name__)
+
+MEMORY_CACHE_SIZE = 4096  # file_ids kept in memory; the database keeps all of them
+
+# content hash -> file_id (LRU)
+_file_ids: "OrderedDict[str, str]" = OrderedDict()
+# asset path -> (mtime, bytes)
+_assets: Dict[str, Tuple[float, bytes]] = {}
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _remember(digest: str, file_id: str) -> None:
+    _file_ids[digest] = file_id
+    _file_ids.move_to_end(digest)
+    while len(_file_ids) > MEMORY_CACHE_SIZE:
+        _file_ids.popitem(last=False)
+
+
+async def _lookup(digest: str) -> Optional[str]:
+    file_id = _file_ids.get(digest)
+    if file_id:
+        _file_ids.move_to_end(digest)
+        return file_id
+    file_id = await crud_media_file.get_file_id(digest)
+    if file_id:
+        _remember(digest, file_id)
+    return file_id
+
+
+async def _forget(digest: str) -> None:
+    _file_ids.pop(digest, None)
+    await crud_media_file.delete_file_id(digest)
+
+
+async def send_photo(bot: Bot, chat_id: int, data: bytes, filename: str = "photo.png", **kwargs) -> Message:
+    """
+    bot.send_photo for in-memory image bytes. The first send uploads them and
+    records the returned file_id; every later send of the same bytes (to anyone)
+    references the file_id. Extra keyword arguments go to bot.send_photo.
+    """
+    digest = content_hash(data)
+    file_id = await _lookup(digest)
+    if file_id:
+        try:
+            return await bot.send_photo(chat_id=chat_id, photo=file_id, **kwargs)
+        except BadRequest as e:
+            if "file" not in str(e).lower():
+                raise
+            # Telegram no longer accepts this file_id: upload again below.
+            LOGGER.warning(f"Cached file_id for media {digest[:12]} was rejected ({e}); re-uploading.")
+            await _forget(digest)
+
+    bio = io.BytesIO(data)
+    bio.name = filename
+    message = await bot.send_photo(chat_id=chat_id, photo=bio, **kwargs)
+    if message and message.photo:
+        new_file_id = message.photo[-1].file_id
+        _remember(digest, new_file_id)
+        await crud_media_file.save_file_id(digest, new_file_id)
+    return message
+
+
+def _read_asset(path: str) -> bytes:
+    """Reads a bundled asset once (again only if it changes on disk). Raises FileNotFoundError."""
+    mtime = os.path.getmtime(path)
+    cached = _assets.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, "rb") as f:
+        data = f.read()
+    _assets[path] = (mtime, data)
+    return data
+
+
+async def send_asset_photo(bot: Bot, chat_id: int, path: str, **kwargs) -> Message:
+    """send_photo for an image file shipped with the bot (e.g. assets/receipt_guide.png)."""
+    return await send_photo(bot, chat_id, _read_asset(path), filename=os.path.basename(path), **kwargs)
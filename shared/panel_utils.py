@@ -1,69 +1,342 @@
 # در بالای shared/panel_utils.py
 import logging
 import asyncio
-from typing import List, Dict, Any, Optional
-from core.panel_api.base import PanelAPI
-from core.panel_api.marzban import MarzbanPanel
+import bisect
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Dict, Any, Optional, Tuple
+from config import config
+from core.panel_api.base import register_user_write_listener
+from core.panel_api.helpers import get_api_for_panel
+from core.panel_api.panel_user import PanelUser
 from database.crud import panel_credential as crud_panel
-from database.models.panel_credential import PanelType
+from shared.username_index import username_index
+from shared.user_columns import UserClassification, UserColumns, classify
 
 LOGGER = logging.getLogger(__name__)
 
+# --- Panel User Snapshot Cache ---
+# A process-wide, per-panel copy of each panel's user list. Readers get the
+# snapshot while it is fresh, get the stale one while a single background
+# refresh runs, and only wait on the panel when nothing usable is cached.
+# Concurrent refreshes of the same panel share one in-flight fetch.
+# Users are cached as compact PanelUser records, shared between callers and to be treated as read-only.
 
+@dataclass
+class _PanelSnapshot:
+    panel_name: str
+    users: Dict[str, PanelUser] = field(default_factory=dict)
+    fetched_at: float = 0.0
+    dirty: bool = False
+    version: int = 0  # Bumped on every in-place change, so derived views know to rebuild
+    columns: Optional[UserColumns] = None
+    columns_version: int = -1
 
-async def _get_api_for_panel(panel) -> Optional[PanelAPI]:
-    """Factory to create an API object from a panel DB object."""
-    if panel.panel_type == PanelType.MARZBAN:
-        credentials = {'api_url': panel.api_url, 'username': panel.username, 'password': panel.password}
-        return MarzbanPanel(credentials)
-    return None
+    def get_columns(self) -> UserColumns:
+        """Columnar copy of the users for the vectorized classifiers, rebuilt only after a change."""
+        if self.columns is None or self.columns_version != self.version:
+            self.columns = UserColumns.from_users(self.users.values())
+            self.columns_version = self.version
+        return self.columns
+
+
+_snapshots: Dict[int, _PanelSnapshot] = {}
+_inflight_refreshes: Dict[int, asyncio.Task] = {}
+
+
+async def _fetch_panel_snapshot(panel) -> Optional[_PanelSnapshot]:
+    LOGGER.info(f"[Panel Utils] -> Fetching users for panel '{panel.name}'...")
+    api = await get_api_for_panel(panel)
+    if not api:
+        LOGGER.warning(f"[Panel Utils] -> Could not create API for panel '{panel.name}'. Skipping.")
+        return None
+
+    users = await api.get_all_users()
+    if users is None:
+        LOGGER.warning(f"[Panel Utils] -> Received no users (API error) from '{panel.name}'.")
+        return None
+
+    snapshot = _PanelSnapshot(panel_name=panel.name, fetched_at=time.time())
+    for user in users:
+        if not user.username:
+            continue
+        user.panel_name = panel.name
+        user.panel_id = panel.id
+        snapshot.users[user.username] = user
+    _snapshots[panel.id] = snapshot
+    await username_index.replace_panel(panel.id, list(snapshot.users))
+    LOGGER.info(f"[Panel Utils] -> Cached {len(snapshot.users)} users from '{panel.name}'.")
+    return snapshot
+
+
+async def _refresh_panel_snapshot(panel) -> Optional[_PanelSnapshot]:
+    """Single-flight refresh: concurrent callers for the same panel await one fetch."""
+    task = _inflight_refreshes.get(panel.id)
+    if task is None:
+        task = asyncio.create_task(_fetch_panel_snapshot(panel))
+        _inflight_refreshes[panel.id] = task
+        task.add_done_callback(lambda _t, pid=panel.id: _inflight_refreshes.pop(pid, None))
+    # shield() so a cancelled caller doesn't cancel the fetch other callers are waiting on.
+    return await asyncio.shield(task)
+
+
+def _log_background_refresh_error(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception():
+        LOGGER.error(f"[Panel Utils] Background snapshot refresh failed: {task.exception()}")
+
+
+async def _get_snapshot(panel) -> Optional[_PanelSnapshot]:
+    snapshot = _snapshots.get(panel.id)
+    age = time.time() - snapshot.fetched_at if snapshot else None
+
+    if snapshot and not snapshot.dirty and age < config.PANEL_USERS_CACHE_TTL:
+        return snapshot
+
+    if snapshot and age < config.PANEL_USERS_STALE_TTL:
+        # Stale-while-revalidate: answer now, refresh in the background.
+        if panel.id not in _inflight_refreshes:
+            refresh = asyncio.create_task(_refresh_panel_snapshot(panel))
+            refresh.add_done_callback(_log_background_refresh_error)
+        return snapshot
+
+    try:
+        return await _refresh_panel_snapshot(panel)
+    except Exception as e:
+        LOGGER.error(f"[Panel Utils] -> CRITICAL ERROR while fetching from panel '{panel.name}': {e}", exc_info=True)
+        return None
+
+
+async def get_panel_users(panel) -> Optional[List[PanelUser]]:
+    """
+    Returns the users of a single panel from the snapshot cache.
+    Returns None if the panel could not be reached and nothing is cached.
+    """
+    snapshot = await _get_snapshot(panel)
+    return list(snapshot.users.values()) if snapshot else None
+
+
+async def search_users_by_username(query: str, offset: int = 0, limit: Optional[int] = None) -> Tuple[int, List[PanelUser]]:
+    """
+    Searches service usernames across all panels using the in-memory username index.
+    Exact matches come first, then prefix matches, then other substring matches.
+    Returns (total_matches, users of the requested page).
+    """
+    all_panels = await crud_panel.get_all_panels()
+    snapshots = await asyncio.gather(*(_get_snapshot(panel) for panel in all_panels))
+    live_panels = {panel.id: snapshot for panel, snapshot in zip(all_panels, snapshots) if snapshot}
+
+    # Panels without a snapshot are left out before counting, so the total and the pages only cover showable users.
+    total, keys = username_index.search(query, offset, limit, panel_ids=live_panels)
+    results = []
+    for panel_id, username in keys:
+        user = live_panels[panel_id].users.get(username)
+        if user:
+            results.append(user)
+    return total, results
+
+
+# --- Paginated List Views ---
+# Sorted, optionally filtered views over a panel snapshot, rebuilt only when the
+# snapshot changes. Pages are addressed by keyset cursors (the username at the
+# edge of the previous page), so handlers keep nothing between requests except
+# what fits in the callback data.
+
+ListEntry = Tuple[str, str, int]  # (sort key, username, panel_id)
+
+
+@dataclass
+class _ListView:
+    snapshot: _PanelSnapshot
+    version: int
+    entries: List[ListEntry]
+
+
+_list_views: Dict[Tuple[int, str], _ListView] = {}
+
+
+def _list_entry(user: PanelUser) -> ListEntry:
+    return (user.username.lower(), user.username, user.panel_id or 0)
+
+
+async def get_list_view(panel, list_type: str, select: Optional[Callable[[UserClassification], Any]] = None) -> Optional[List[ListEntry]]:
+    """
+    Returns the username-sorted entries of a panel list ('all', 'warning', ...).
+    `select` picks a boolean mask out of the panel's classification (e.g. lambda c: c.warning)
+    and must always be the same for a given list_type.
+    Returns None if the panel could not be reached and nothing is cached.
+    """
+    snapshot = await _get_snapshot(panel)
+    if not snapshot:
+        return None
+
+    view = _list_views.get((panel.id, list_type))
+    if view is None or view.snapshot is not snapshot or view.version != snapshot.version:
+        if select is None:
+            users = snapshot.users.values()
+        else:
+            columns = snapshot.get_columns()
+            users = (snapshot.users[columns.usernames[i]] for i in select(classify(columns)).nonzero()[0])
+        entries = sorted(_list_entry(user) for user in users)
+        view = _ListView(snapshot=snapshot, version=snapshot.version, entries=entries)
+        _list_views[(panel.id, list_type)] = view
+    return view.entries
+
+
+async def get_entries_for_usernames(usernames: Iterable[str]) -> List[ListEntry]:
+    """Sorted entries for the given usernames, looked up across every panel snapshot."""
+    wanted = set(usernames)
+    all_panels = await crud_panel.get_all_panels()
+    snapshots = await asyncio.gather(*(_get_snapshot(panel) for panel in all_panels))
+    entries = []
+    for snapshot in snapshots:
+        if not snapshot:
+            continue
+        for username in wanted.intersection(snapshot.users):
+            entries.append(_list_entry(snapshot.users[username]))
+    entries.sort()
+    return entries
+
+
+def paginate_entries(
+    entries: List[ListEntry], per_page: int, page: int = 1, after: Optional[str] = None, before: Optional[str] = None
+) -> Tuple[List[ListEntry], int, int]:
+    """
+    Slices one page out of sorted entries. `after`/`before` are keyset cursors
+    (usernames); without one, `page` is used as a plain offset.
+    Returns (page_entries, page, total_pages).
+    """
+    if after is not None:
+        start = bisect.bisect_right(entries, (after.lower(), after, math.inf))
+    elif before is not None:
+        start = max(0, bisect.bisect_left(entries, (before.lower(), before)) - per_page)
+    else:
+        start = (max(page, 1) - 1) * per_page
+    if start >= len(entries):
+        start = max(0, (len(entries) - 1) // per_page * per_page)
+
+    page = math.ceil(start / per_page) + 1
+    remaining = max(0, len(entries) - start - per_page)
+    return entries[start:start + per_page], page, page + math.ceil(remaining / per_page)
+
+
+def resolve_entries(entries: Iterable[ListEntry]) -> List[PanelUser]:
+    """Maps list entries back to the cached user records (read-only)."""
+    users = []
+    for _key, username, panel_id in entries:
+        snapshot = _snapshots.get(panel_id)
+        user = snapshot.users.get(username) if snapshot else None
+        if user:
+            users.append(user)
+    return users
+
+
+def invalidate_panel_users_cache(panel_id: Optional[int] = None, username: Optional[str] = None) -> None:
+    """
+    Marks cached snapshots as stale. With a username, only that user is dropped
+    (from one panel, or from every panel if panel_id is None).
+    """
+    targets = [panel_id] if panel_id is not None else list(_snapshots)
+    for pid in targets:
+        snapshot = _snapshots.get(pid)
+        if not snapshot:
+            continue
+        if username:
+            snapshot.users.pop(username, None)
+            username_index.remove(pid, username)
+        snapshot.dirty = True
+        snapshot.version += 1
+
+
+def _on_user_written(panel_id: Optional[int], username: str, user_data: Optional[Dict[str, Any]], deleted: bool = False) -> None:
+    """Keeps snapshots in sync with writes made through the bot."""
+    snapshot = _snapshots.get(panel_id) if panel_id is not None else None
+    if not snapshot:
+        invalidate_panel_users_cache(panel_id, username if deleted else None)
+        return
+
+    if user_data is None:
+        if deleted:
+            snapshot.users.pop(username, None)
+            username_index.remove(panel_id, username)
+            snapshot.version += 1
+        else:
+            # The panel didn't echo the new state back: keep the old record and refetch on the next read.
+            snapshot.dirty = True
+        return
+
+    snapshot.version += 1
+
+    existing = snapshot.users.get(username)
+    user = existing.merged(user_data) if existing else PanelUser.from_dict(user_data)
+    user.username, user.panel_name, user.panel_id = username, snapshot.panel_name, panel_id
+    snapshot.users[username] = user
+    username_index.add(panel_id, username)
+
+
+async def _on_panel_changed(panel_id: Optional[int]) -> None:
+    for pid in ([panel_id] if panel_id is not None else list(_snapshots)):
+        _snapshots.pop(pid, None)
+        username_index.remove_panel(pid)
+        for view_key in [k for k in _list_views if k[0] == pid]:
+            del _list_views[view_key]
+
+
+register_user_write_listener(_on_user_written)
+crud_panel.register_change_listener(_on_panel_changed)
 
 # --- START: Replace this function in shared/panel_utils.py ---
 
-async def get_all_users_from_all_panels() -> List[Dict[str, Any]]:
-    """Fetches and aggregates users from all configured panels in parallel."""
-    import asyncio
+async def get_all_users_from_all_panels_with_status() -> Tuple[List[PanelUser], bool]:
+    """
+    Like get_all_users_from_all_panels, plus whether every panel answered.
+    When the flag is False the list is partial, so a user missing from it may still exist.
+    """
     LOGGER.info("[Panel Utils] Starting to fetch users from all panels...")
-    
+
     all_panels = await crud_panel.get_all_panels()
     if not all_panels:
         LOGGER.warning("[Panel Utils] No panels configured in DB. Returning empty list.")
-        return []
-
-    async def fetch_users_from_panel(panel):
-        """Helper coroutine to fetch users from a single panel."""
-        LOGGER.info(f"[Panel Utils] -> Fetching users for panel '{panel.name}'...")
-        try:
-            api = await _get_api_for_panel(panel)
-            if not api: 
-                LOGGER.warning(f"[Panel Utils] -> Could not create API for panel '{panel.name}'. Skipping.")
-                return []
-            
-            users = await api.get_all_users()
-            if users:
-                LOGGER.info(f"[Panel Utils] -> Successfully fetched {len(users)} users from '{panel.name}'.")
-                for user in users:
-                    user['panel_name'] = panel.name
-                    user['panel_id'] = panel.id
-                return users
-            else:
-                # This could mean 0 users, or an API error that returned None/[]
-                LOGGER.warning(f"[Panel Utils] -> Received no users or an empty list from '{panel.name}'.")
-                return []
-        except Exception as e:
-            LOGGER.error(f"[Panel Utils] -> CRITICAL ERROR while fetching from panel '{panel.name}': {e}", exc_info=True)
-            return [] # Return empty list on failure to not break the whole process
-
-    tasks = [fetch_users_from_panel(panel) for panel in all_panels]
-    
-    LOGGER.info(f"[Panel Utils] Awaiting {len(tasks)} panel tasks to complete...")
-    results_of_lists = await asyncio.gather(*tasks)
-    
-    aggregated_users = [user for user_list in results_of_lists for user in user_list]
+        return [], True
+
+    results_of_lists = await asyncio.gather(*(get_panel_users(panel) for panel in all_panels))
+
+    # Return empty list on a panel's failure to not break the whole process
+    aggregated_users = [user for user_list in results_of_lists if user_list for user in user_list]
     LOGGER.info(f"[Panel Utils] Finished fetching. Aggregated a total of {len(aggregated_users)} users from {len(all_panels)} panel(s).")
-    
+
+    return aggregated_users, all(user_list is not None for user_list in results_of_lists)
+
+
+async def get_all_users_from_all_panels() -> List[PanelUser]:
+    """Fetches and aggregates users from all configured panels in parallel (served from the snapshot cache)."""
+    aggregated_users, _complete = await get_all_users_from_all_panels_with_status()
     return aggregated_users
 
+
+async def find_user_in_fresh_snapshot(panel_id: int, username: str) -> Tuple[Optional[PanelUser], bool]:
+    """
+    Looks a user up (case-insensitively) in a newly fetched snapshot of its panel,
+    bypassing the TTL. Returns (user, panel_read); panel_read is False when the
+    panel could not be read, i.e. a missing user is not confirmed gone.
+    """
+    panel = await crud_panel.get_panel_by_id(panel_id)
+    if not panel:
+        return None, False
+    try:
+        snapshot = await _refresh_panel_snapshot(panel)
+    except Exception as e:
+        LOGGER.error(f"[Panel Utils] -> Could not refresh panel '{panel.name}': {e}")
+        return None, False
+    if not snapshot:
+        return None, False
+
+    user = snapshot.users.get(username)
+    if user is None:
+        wanted = username.lower()
+        user = next((u for name, u in snapshot.users.items() if name.lower() == wanted), None)
+    return user, True
+
 # --- END: Replacement ---
 
 async def get_user_data_from_panels(username: str, panel_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
@@ -78,8 +351,8 @@ async def get_user_data_from_panels(username: str, panel_id: Optional[int] = Non
         if not panel:
             LOGGER.warning(f"get_user_data requested for non-existent panel_id: {panel_id}")
             return None
-        
-        api = await _get_api_for_panel(panel)
+
+        api = await get_api_for_panel(panel)
         if not api: return None
 
         user_data = await api.get_user_data(username)
@@ -91,13 +364,13 @@ async def get_user_data_from_panels(username: str, panel_id: Optional[int] = Non
         # Search across all panels (original behavior)
         all_panels = await crud_panel.get_all_panels()
         for panel in all_panels:
-            api = await _get_api_for_panel(panel)
+            api = await get_api_for_panel(panel)
             if not api: continue
             user_data = await api.get_user_data(username)
             if user_data:
                 user_data['panel_name'] = panel.name
                 user_data['panel_id'] = panel.id
                 return user_data
-    
+
     return None
-# --- END: Replacement ---
\ No newline at end of file
+# --- END: Replacement ---
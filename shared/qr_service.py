@@ -0,0 +1,77 @@
+# FILE: shared/qr_service.py
+# QR code rendering off the event loop, with an LRU of the rendered PNGs.
+
+import asyncio
+import io
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+import qrcode
+
+LOGGER = logging.getLogger(__name__)
+
+RENDER_WORKERS = 2       # qrcode + PNG encoding is pure Python; more threads only contend for the GIL
+CACHE_MAX_ITEMS = 512    # rendered PNGs kept, keyed by the encoded text
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+_executor: Optional[ThreadPoolExecutor] = None
+# text -> PNG bytes (LRU)
+_cache: "OrderedDict[str, bytes]" = OrderedDict()
+_cache_bytes = 0
+# text -> render in progress, so concurrent requests for one link render it once
+_in_flight: Dict[str, asyncio.Future] = {}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="qr")
+    return _executor
+
+
+def _render(text: str) -> bytes:
+    bio = io.BytesIO()
+    qrcode.make(text).save(bio, 'PNG')
+    return bio.getvalue()
+
+
+def _store(text: str, png: bytes) -> None:
+    global _cache_bytes
+    if text in _cache:
+        _cache_bytes -= len(_cache.pop(text))
+    _cache[text] = png
+    _cache_bytes += len(png)
+    while _cache and (len(_cache) > CACHE_MAX_ITEMS or _cache_bytes > CACHE_MAX_BYTES):
+        _old_text, old_png = _cache.popitem(last=False)
+        _cache_bytes -= len(old_png)
+
+
+async def render_png(text: str) -> bytes:
+    """PNG bytes of the QR code for `text` (usually a subscription link). Never renders on the event loop."""
+    png = _cache.get(text)
+    if png is not None:
+        _cache.move_to_end(text)
+        return png
+
+    pending = _in_flight.get(text)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_get_executor(), _render, text)
+    _in_flight[text] = future
+    try:
+        png = await asyncio.shield(future)
+    finally:
+        _in_flight.pop(text, None)
+    _store(text, png)
+    return png
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
@@ -0,0 +1,188 @@
+# FILE: shared/router.py
+# Hash-map / prefix-trie dispatch for menu buttons and callback buttons.
+
+import logging
+import re
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import BaseHandler, CallbackQueryHandler, MessageHandler, filters as ptb_filters
+from telegram.ext.filters import BaseFilter
+
+LOGGER = logging.getLogger(__name__)
+
+_REGEX_META = set('.^$*+?{}[]|()')
+_TERMINAL = ''  # trie key holding the route of the prefix that ends at this node
+
+
+class Route(NamedTuple):
+    order: int                    # registration order, so the first registered route wins like in a handler chain
+    callback: Callable
+    filters: Optional[BaseFilter]
+    pattern: str                  # regex equivalent, kept for logging and for as_handlers()
+
+
+def literal_from_pattern(pattern: str) -> tuple:
+    """
+    Turns a literal regex such as r'^user_details_' or r'^show_status_legend$'
+    into (literal, is_exact). Raises ValueError for anything that is not a
+    plain anchored literal, since those cannot be resolved by lookup.
+    """
+    if not pattern.startswith('^'):
+        raise ValueError(f"Pattern '{pattern}' is not anchored at the start.")
+    body = pattern[1:]
+    exact = body.endswith('$') and not body.endswith('\\$')
+    if exact:
+        body = body[:-1]
+
+    literal, escaped = [], False
+    for ch in body:
+        if escaped:
+            if ch.isalnum():
+                raise ValueError(f"Pattern '{pattern}' uses the character class '\\{ch}'.")
+            literal.append(ch)
+            escaped = False
+        elif ch == '\\':
+            escaped = True
+        elif ch in _REGEX_META:
+            raise ValueError(f"Pattern '{pattern}' is not a plain literal.")
+        else:
+            literal.append(ch)
+    if escaped or not literal:
+        raise ValueError(f"Pattern '{pattern}' is not a plain literal.")
+    return ''.join(literal), exact
+
+
+class Router(BaseHandler):
+    """
+    One handler that stands in for a chain of MessageHandler(filters.Regex('^text$'))
+    and CallbackQueryHandler(pattern='^prefix') entries. Texts and exact callbacks
+    are a dict lookup, and open-ended prefixes live in a character trie walked
+    once per update.
+
+    Add it to the application where the replaced handlers used to be (same group,
+    same position), so ConversationHandlers registered before it still see the
+    update first and nothing registered after it changes priority. When several
+    routes match, the one registered first wins, as it would have in the chain.
+    """
+
+    def __init__(self, name: str, block: bool = True):
+        super().__init__(self._unrouted, block=block)
+        self.name = name
+        self._count = 0
+        self._texts: Dict[str, Route] = {}
+        self._callbacks: Dict[str, Route] = {}
+        self._trie: Dict[str, Any] = {}
+
+    async def _unrouted(self, update: Update, context) -> None:
+        # Never called: check_update returns None when no route matches.
+        return None
+
+    def _new_route(self, callback: Callable, route_filters: Optional[BaseFilter], pattern: str) -> Route:
+        route = Route(self._count, callback, route_filters, pattern)
+        self._count += 1
+        return route
+
+    # --- Registration ---
+
+    def add_text(self, text: str, callback: Callable, filters: Optional[BaseFilter] = None) -> None:
+        """Routes a message whose text is exactly `text` (a reply-keyboard button)."""
+        if not text:
+            LOGGER.warning(f"[Router:{self.name}] Skipping empty button text for {callback.__qualname__}.")
+            return
+        if text in self._texts:
+            return  # the earlier registration would have won in a handler chain too
+        self._texts[text] = self._new_route(callback, filters, f'^{re.escape(text)}$')
+
+    def add_callback(self, pattern: str, callback: Callable) -> None:
+        """Routes callback data matching a literal pattern: '^data$' exactly or '^prefix' as a prefix."""
+        literal, exact = literal_from_pattern(pattern)
+        route = self._new_route(callback, None, pattern)
+        if exact:
+            self._callbacks.setdefault(literal, route)
+            return
+        node = self._trie
+        for ch in literal:
+            node = node.setdefault(ch, {})
+        node.setdefault(_TERMINAL, route)
+
+    # --- Lookup ---
+
+    def _callback_candidates(self, data: str) -> List[Route]:
+        candidates = []
+        route = self._callbacks.get(data)
+        if route is not None:
+            candidates.append(route)
+        node = self._trie
+        for ch in data:
+            node = node.get(ch)
+            if node is None:
+                break
+            route = node.get(_TERMINAL)
+            if route is not None:
+                candidates.append(route)
+        return candidates
+
+    def resolve(self, update: Update) -> Optional[Route]:
+        """The route this update goes to, or None."""
+        query = update.callback_query
+        if query is not None:
+            if not query.data:
+                return None
+            candidates = self._callback_candidates(query.data)
+        else:
+            message = update.message or update.edited_message
+            if message is None or not message.text:
+                return None
+            route = self._texts.get(message.text)
+            candidates = [route] if route is not None else []
+
+        if len(candidates) > 1:
+            candidates.sort()
+        for route in candidates:
+            if route.filters is None or route.filters.check_update(update):
+                return route
+        return None
+
+    # --- BaseHandler interface ---
+
+    def check_update(self, update: object) -> Optional[Route]:
+        if not isinstance(update, Update):
+            return None
+        return self.resolve(update)
+
+    async def handle_update(self, update: Update, application, check_result: Route, context) -> Any:
+        return await check_result.callback(update, context)
+
+    def as_handlers(self) -> List[BaseHandler]:
+        """The equivalent regex handler chain, in registration order (used by the dispatch benchmark)."""
+        text_routes = {route.order for route in self._texts.values()}
+        routes = sorted([*self._texts.values(), *self._callbacks.values(), *self._trie_routes(self._trie)])
+        handlers: List[BaseHandler] = []
+        for route in routes:
+            if route.order in text_routes:
+                text_filter = ptb_filters.Regex(route.pattern)
+                if route.filters is not None:
+                    text_filter = text_filter & route.filters
+                handlers.append(MessageHandler(text_filter, route.callback, block=self.block))
+            else:
+                handlers.append(CallbackQueryHandler(route.callback, pattern=route.pattern, block=self.block))
+        return handlers
+
+    def route_keys(self) -> Tuple[List[str], List[str], List[str]]:
+        """(texts, exact callback data, callback prefixes) this router answers to."""
+        prefixes = [literal_from_pattern(route.pattern)[0] for route in self._trie_routes(self._trie)]
+        return list(self._texts), list(self._callbacks), prefixes
+
+    @staticmethod
+    def _trie_routes(node: Dict[str, Any]) -> List[Route]:
+        routes = []
+        for key, child in node.items():
+            if key == _TERMINAL:
+                routes.append(child)
+            else:
+                routes.extend(Router._trie_routes(child))
+        return routes
+
+    def __repr__(self) -> str:
+        return f"Router({self.name!r}, routes={self._count})"
@@ -3,108 +3,141 @@
 import json
 import os
 import logging
+from typing import Any, Callable, Dict, Set
+
+from telegram.ext import ContextTypes
 
 LOGGER = logging.getLogger(__name__)
 
 class Translator:
+    """
+    All language files are flattened at load time into one dict of fully
+    qualified keys ('marzban.marzban_display.title') plus one of legacy aliases
+    without the namespace ('marzban_display.title'), so get() is a dict lookup.
+    Nothing in get() touches the disk: misses are remembered, and files are
+    re-read only by an explicit reload (reload_if_changed / load_language).
+    """
+
     def __init__(self):
-        self._translations_cache = {}
-        self._is_reloading = False
+        self._lang_code = "fa"
+        self._index: Dict[str, Any] = {}
+        self._legacy_index: Dict[str, Any] = {}
+        # key -> bound str.format of its template, only for strings with placeholders
+        self._formatters: Dict[str, Callable[..., str]] = {}
+        self._missing: Set[str] = set()
+        self._file_mtimes: Dict[str, float] = {}
+        # Bumped on every reload so caches built from translations can tell they are stale.
+        self.version = 0
+
+    @property
+    def lang_code(self) -> str:
+        return self._lang_code
+
+    @staticmethod
+    def _lang_dir(lang_code: str) -> str:
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return os.path.join(project_root, 'strings', lang_code)
+
+    def _scan_files(self, lang_dir: str) -> Dict[str, float]:
+        return {
+            f: os.path.getmtime(os.path.join(lang_dir, f))
+            for f in sorted(os.listdir(lang_dir)) if f.endswith('.json')
+        }
+
+    @staticmethod
+    def _flatten(prefix: str, data: Any, out: Dict[str, Any]) -> None:
+        """Adds `prefix` and every nested key below it (dicts included, as before)."""
+        out[prefix] = data
+        if isinstance(data, dict):
+            for key, value in data.items():
+                Translator._flatten(f"{prefix}.{key}", value, out)
 
     def load_language(self, lang_code="fa"):
         """
-        Loads all .json language files from disk into the cache.
+        Loads all .json language files from disk and rebuilds the key index.
         Each file is loaded under its own namespace (the filename).
         """
         LOGGER.info(f"--- [Translator] Loading/Reloading language '{lang_code}' ---")
-        
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        lang_dir = os.path.join(project_root, 'strings', lang_code)
-        
+        lang_dir = self._lang_dir(lang_code)
+
         if not os.path.isdir(lang_dir):
             LOGGER.error(f"[Translator] FATAL: Language directory not found at: {lang_dir}")
             return
 
-        new_translations = {}
-        json_files = [f for f in os.listdir(lang_dir) if f.endswith('.json')]
+        file_mtimes = self._scan_files(lang_dir)
+        index: Dict[str, Any] = {}
+        legacy_index: Dict[str, Any] = {}
 
-        for file_name in json_files:
+        for file_name in file_mtimes:
             file_path = os.path.join(lang_dir, file_name)
             namespace = os.path.splitext(file_name)[0]
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                    new_translations[namespace] = data
             except Exception as e:
                 LOGGER.error(f"[Translator] Failed to load '{file_name}' into namespace '{namespace}': {e}")
-        
-        self._translations_cache = new_translations
-        total_keys = sum(len(v) for v in self._translations_cache.values() if isinstance(v, dict))
-        LOGGER.info(f"--- [Translator] Language '{lang_code}' loaded with {len(self._translations_cache)} namespaces and {total_keys} total keys. ---")
+                continue
+            self._flatten(namespace, data, index)
+            if isinstance(data, dict):
+                # Legacy form: the key inside a namespace, without the namespace.
+                # Only dotted keys qualify, and the first namespace to define one wins.
+                namespace_keys: Dict[str, Any] = {}
+                for key, value in data.items():
+                    self._flatten(key, value, namespace_keys)
+                for key, value in namespace_keys.items():
+                    if '.' in key:
+                        legacy_index.setdefault(key, value)
+
+        formatters = {}
+        for key, value in [*index.items(), *((k, v) for k, v in legacy_index.items() if k not in index)]:
+            if isinstance(value, str) and ('{' in value or '}' in value):
+                formatters[key] = value.format
+
+        # Swapped in together, so a concurrent get() never sees a half-built index.
+        self._index, self._legacy_index, self._formatters = index, legacy_index, formatters
+        self._missing = set()
+        self._file_mtimes = file_mtimes
+        self._lang_code = lang_code
+        self.version += 1
+        LOGGER.info(f"--- [Translator] Language '{lang_code}' loaded with {len(file_mtimes)} namespaces and {len(index)} total keys. ---")
+
+    def reload_if_changed(self) -> bool:
+        """Reloads the language if any of its files was added, removed or modified. Returns True if it did."""
+        lang_dir = self._lang_dir(self._lang_code)
+        try:
+            file_mtimes = self._scan_files(lang_dir)
+        except OSError as e:
+            LOGGER.error(f"[Translator] Could not check language files in {lang_dir}: {e}")
+            return False
+        if file_mtimes == self._file_mtimes:
+            return False
+        self.load_language(self._lang_code)
+        return True
 
     def get(self, key, **kwargs):
         """
         Retrieves a translation string with backward compatibility.
         1. Tries the modern, namespaced key (e.g., 'marzban.marzban_display.title').
-        2. If not found, it tries a legacy, non-namespaced key by searching
-           through all top-level namespaces (e.g., 'marzban_display.title').
-        3. If still not found, it triggers a reload and tries both methods again.
+        2. If not found, tries the legacy, non-namespaced key (e.g., 'marzban_display.title').
+        3. If still not found, logs it once and returns the key itself.
         """
-        # --- Attempt 1: Try the modern, fully qualified key first ---
-        try:
-            return self._get_from_dict(self._translations_cache, key, **kwargs)
-        except KeyError:
-            pass  # Key not found, proceed to legacy check
-
-        # --- Attempt 2: Try legacy (non-namespaced) key ---
-        if '.' in key:
-            try:
-                for namespace in self._translations_cache.values():
-                    if isinstance(namespace, dict):
-                        try:
-                            return self._get_from_dict(namespace, key, **kwargs)
-                        except KeyError:
-                            continue # Not in this namespace, try next
-            except (KeyError, TypeError):
-                 pass
-
-        # --- If both attempts fail, trigger a reload and try everything again ---
-        if not self._is_reloading:
-            LOGGER.warning(f"[Translator] Key '{key}' not found. Triggering automatic reload.")
-            self._is_reloading = True
-            self.load_language("fa")
-            self._is_reloading = False
-            
-            # --- Attempt 3: Retry modern key after reload ---
-            try:
-                return self._get_from_dict(self._translations_cache, key, **kwargs)
-            except KeyError:
-                pass
+        if key in self._index:
+            value = self._index[key]
+        elif key in self._legacy_index:
+            value = self._legacy_index[key]
+        else:
+            if key not in self._missing:
+                self._missing.add(key)
+                LOGGER.error(f"[Translator] Key '{key}' not found (legacy aliases checked too).")
+            return key
 
-            # --- Attempt 4: Retry legacy key after reload ---
-            if '.' in key:
-                try:
-                    for namespace in self._translations_cache.values():
-                        if isinstance(namespace, dict):
-                            try:
-                                return self._get_from_dict(namespace, key, **kwargs)
-                            except KeyError:
-                                continue
-                except (KeyError, TypeError):
-                    pass
-        
-        LOGGER.error(f"[Translator] Key '{key}' not found even after reload and legacy check.")
-        return key
-
-    def _get_from_dict(self, dictionary, key, **kwargs):
-        """Helper function to navigate the dictionary."""
-        keys = key.split('.')
-        value = dictionary
-        for k in keys:
-            value = value[k]
-        
         if kwargs:
-            return value.format(**kwargs)
+            formatter = self._formatters.get(key)
+            if formatter is not None:
+                try:
+                    return formatter(**kwargs)
+                except (KeyError, IndexError, ValueError) as e:
+                    LOGGER.error(f"[Translator] Could not format key '{key}': {e!r}")
         return value
 
 # --- SINGLETON INSTANCE AND ALIAS ---
@@ -115,4 +148,10 @@ _ = translator.get
 
 def init_translator():
     """Initializes the translator at startup."""
-    translator.load_language("fa")
\ No newline at end of file
+    translator.load_language("fa")
+
+
+async def reload_translations_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback: picks up edited language files without a restart."""
+    if translator.reload_if_changed():
+        LOGGER.info(f"[Translator] Language files changed on disk; reloaded (version {translator.version}).")
@@ -0,0 +1,132 @@
+# FILE: shared/user_columns.py
+# Columnar (NumPy) view of panel users and vectorized status classification.
+
+import datetime
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+GB = 1024 * 1024 * 1024
+DAY_SECONDS = 24 * 60 * 60
+
+# Display thresholds used by the user lists and status emojis.
+WARNING_DAYS = 3
+WARNING_DATA_GB = 1
+ONLINE_WINDOW_SECONDS = 180
+
+STATUS_CODES = {'active': 0, 'disabled': 1, 'limited': 2, 'expired': 3, 'on_hold': 4}
+STATUS_OTHER = len(STATUS_CODES)
+STATUS_ACTIVE = STATUS_CODES['active']
+
+EMOJI_UNUSED, EMOJI_ONLINE, EMOJI_INACTIVE, EMOJI_WARNING, EMOJI_IDLE = "🟣", "🟢", "🔴", "🟡", "⚪️"
+
+
+def _online_at_epoch(value: Any) -> float:
+    """Marzban reports online_at as an ISO string in UTC (usually without a timezone)."""
+    if not value:
+        return np.nan
+    try:
+        dt = datetime.datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return np.nan
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.timestamp()
+
+
+@dataclass
+class UserColumns:
+    """
+    One array per field the classifiers need, aligned with `usernames`.
+    Missing values: expire 0 (never), data_limit 0 (unlimited), online_at NaN (never).
+    Built once per snapshot version; ISO parsing of online_at happens only here.
+    """
+    usernames: List[str]
+    status: np.ndarray        # int8 STATUS_CODES
+    expire: np.ndarray        # float64 epoch seconds
+    data_limit: np.ndarray    # int64 bytes
+    used_traffic: np.ndarray  # int64 bytes
+    online_at: np.ndarray     # float64 epoch seconds
+
+    def __len__(self) -> int:
+        return len(self.usernames)
+
+    @classmethod
+    def from_users(cls, users: Iterable[Dict[str, Any]]) -> 'UserColumns':
+        users = list(users)
+        return cls(
+            usernames=[u.get('username', '') for u in users],
+            status=np.fromiter((STATUS_CODES.get(u.get('status'), STATUS_OTHER) for u in users), dtype=np.int8, count=len(users)),
+            expire=np.fromiter((u.get('expire') or 0 for u in users), dtype=np.float64, count=len(users)),
+            data_limit=np.fromiter((u.get('data_limit') or 0 for u in users), dtype=np.int64, count=len(users)),
+            used_traffic=np.fromiter((u.get('used_traffic') or 0 for u in users), dtype=np.int64, count=len(users)),
+            online_at=np.fromiter((_online_at_epoch(u.get('online_at')) for u in users), dtype=np.float64, count=len(users)),
+        )
+
+
+@dataclass
+class UserClassification:
+    """Boolean masks (and derived values) over a UserColumns, all computed against the same `now`."""
+    now: float
+    seconds_left: np.ndarray   # expire - now; meaningless where expire is 0
+    data_left: np.ndarray      # data_limit - used_traffic; meaningless where data_limit is 0
+    online: np.ndarray
+    unused: np.ndarray
+    inactive: np.ndarray       # Not 'active', or past its expire date
+    expiring: np.ndarray       # Active and expires within `days_threshold`
+    low_data: np.ndarray       # Active, limited, and below `data_gb_threshold`
+    near_limit: np.ndarray     # Still usable but within the display thresholds
+    warning: np.ndarray        # Offline and either inactive or close to a display threshold
+
+    @property
+    def days_left(self) -> np.ndarray:
+        """Days left, rounded up (a user with 2.1 days left has '3 days')."""
+        return np.ceil(np.nan_to_num(self.seconds_left) / DAY_SECONDS).astype(np.int64)
+
+    def status_emojis(self) -> List[str]:
+        return np.select(
+            [self.unused, self.online, self.inactive, self.near_limit],
+            [EMOJI_UNUSED, EMOJI_ONLINE, EMOJI_INACTIVE, EMOJI_WARNING],
+            default=EMOJI_IDLE,
+        ).tolist()
+
+
+def classify(
+    columns: UserColumns, now: Optional[float] = None,
+    days_threshold: float = WARNING_DAYS, data_gb_threshold: float = WARNING_DATA_GB,
+) -> UserClassification:
+    """
+    Classifies every user in one pass. `days_threshold` and `data_gb_threshold`
+    drive the `expiring`/`low_data` masks (e.g. the reminder settings); the
+    `warning` mask always uses the display thresholds.
+    """
+    now = time.time() if now is None else now
+    has_expire = columns.expire > 0
+    has_limit = columns.data_limit > 0
+    active = columns.status == STATUS_ACTIVE
+
+    seconds_left = np.where(has_expire, columns.expire - now, np.nan)
+    data_left = np.where(has_limit, columns.data_limit - columns.used_traffic, np.iinfo(np.int64).max)
+
+    with np.errstate(invalid='ignore'):  # NaN comparisons are simply False
+        online = (now - columns.online_at) < ONLINE_WINDOW_SECONDS
+        inactive = ~active | (seconds_left < 0)
+        expiring = active & (seconds_left > 0) & (seconds_left < days_threshold * DAY_SECONDS)
+        near_expiry = (seconds_left > 0) & (seconds_left <= WARNING_DAYS * DAY_SECONDS)
+
+    low_data = active & has_limit & (data_left < data_gb_threshold * GB)
+    near_limit = ~inactive & (near_expiry | (has_limit & (data_left < WARNING_DATA_GB * GB)))
+    warning = ~online & (inactive | near_limit)
+
+    return UserClassification(
+        now=now, seconds_left=seconds_left, data_left=data_left, online=online,
+        unused=columns.used_traffic == 0, inactive=inactive, expiring=expiring,
+        low_data=low_data, near_limit=near_limit, warning=warning,
+    )
+
+
+def classify_users(users: Iterable[Dict[str, Any]], **kwargs) -> UserClassification:
+    """Convenience wrapper for small, ad-hoc lists (e.g. a page of buttons)."""
+    return classify(UserColumns.from_users(users), **kwargs)
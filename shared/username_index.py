@@ -0,0 +1,209 @@
+# FILE: shared/username_index.py
+# In-memory substring/prefix index over the usernames of all panel snapshots.
+
+import asyncio
+import bisect
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+UserKey = Tuple[int, str]  # (panel_id, username)
+
+# Trigrams narrow down long queries; bigrams keep two-character queries off the slow path.
+NGRAM_SIZES = (2, 3)
+# Changes touching more than 1/BULK_REBUILD_FRACTION of a panel rebuild its index
+# in a worker thread instead of bisecting every entry in or out on the event loop.
+BULK_REBUILD_FRACTION = 8
+
+
+def _normalize(username: str) -> str:
+    return username.lower()
+
+
+def _ngrams(text: str, sizes: Tuple[int, ...] = NGRAM_SIZES) -> Set[str]:
+    return {text[i:i + n] for n in sizes for i in range(len(text) - n + 1)}
+
+
+class _PanelIndex:
+    """The n-gram maps and the sorted name list of one panel's usernames."""
+
+    def __init__(self):
+        self.names: Dict[str, str] = {}                          # username -> normalized name
+        self.by_name: Dict[str, Set[str]] = defaultdict(set)
+        self.grams: Dict[str, Set[str]] = defaultdict(set)
+        self.sorted: List[Tuple[str, str]] = []                  # (name, username)
+
+    @classmethod
+    def build(cls, usernames: Iterable[str]) -> "_PanelIndex":
+        """Builds the whole index in one go (run in a worker thread for big panels)."""
+        index = cls()
+        for username in usernames:
+            index._index(username)
+        index.sorted = sorted((name, username) for username, name in index.names.items())
+        return index
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, username: str) -> None:
+        name = self._index(username)
+        if name is not None:
+            bisect.insort(self.sorted, (name, username))
+
+    def remove(self, username: str) -> None:
+        name = self.names.pop(username, None)
+        if name is None:
+            return
+        self._discard(self.by_name, name, username)
+        for gram in _ngrams(name):
+            self._discard(self.grams, gram, username)
+        i = bisect.bisect_left(self.sorted, (name, username))
+        if i < len(self.sorted) and self.sorted[i] == (name, username):
+            del self.sorted[i]
+
+    def _index(self, username: str) -> Optional[str]:
+        """Adds `username` to the lookup maps (not the sorted list). Returns its name, or None if already indexed."""
+        if username in self.names:
+            return None
+        name = _normalize(username)
+        self.names[username] = name
+        self.by_name[name].add(username)
+        for gram in _ngrams(name):
+            self.grams[gram].add(username)
+        return name
+
+    @staticmethod
+    def _discard(mapping: Dict[str, Set[str]], bucket: str, username: str) -> None:
+        usernames = mapping.get(bucket)
+        if usernames is not None:
+            usernames.discard(username)
+            if not usernames:
+                del mapping[bucket]
+
+    def prefix_matches(self, query: str) -> List[Tuple[str, str]]:
+        matches = []
+        for i in range(bisect.bisect_left(self.sorted, (query,)), len(self.sorted)):
+            name, username = self.sorted[i]
+            if not name.startswith(query):
+                break
+            if name != query:
+                matches.append((name, username))
+        return matches
+
+    def substring_candidates(self, query: str) -> Iterable[str]:
+        if len(query) < min(NGRAM_SIZES):
+            # Single characters aren't indexed: fall back to scanning all names.
+            return self.names.keys()
+        size = max(n for n in NGRAM_SIZES if n <= len(query))
+        gram_sets = sorted((self.grams.get(gram, set()) for gram in _ngrams(query, (size,))), key=len)
+        if not gram_sets[0]:
+            return ()
+        return set.intersection(*gram_sets) if len(gram_sets) > 1 else gram_sets[0]
+
+
+class UsernameIndex:
+    """
+    An n-gram (bigram + trigram) index for substring search plus a sorted list
+    for prefix search, kept per panel.
+
+    Ranking: exact matches first, then prefix matches (alphabetical), then other
+    substring matches ordered by match position and name. Panels are updated
+    incrementally: only added/removed usernames touch the index, and a panel
+    whose users mostly changed (e.g. its first load) is rebuilt off the event loop.
+    """
+
+    def __init__(self):
+        self._panels: Dict[int, _PanelIndex] = {}
+        # Bumped by every replace/remove, so a rebuild that was overtaken is dropped.
+        self._generations: Dict[int, int] = defaultdict(int)
+        # panel_id -> (add?, username) changes made while the panel is being rebuilt.
+        self._pending: Dict[int, List[Tuple[bool, str]]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(index) for index in self._panels.values())
+
+    # --- Maintenance ---
+
+    def add(self, panel_id: int, username: str) -> None:
+        self._panels.setdefault(panel_id, _PanelIndex()).add(username)
+        if panel_id in self._pending:
+            self._pending[panel_id].append((True, username))
+
+    def remove(self, panel_id: int, username: str) -> None:
+        index = self._panels.get(panel_id)
+        if index is not None:
+            index.remove(username)
+        if panel_id in self._pending:
+            self._pending[panel_id].append((False, username))
+
+    async def replace_panel(self, panel_id: int, usernames: Iterable[str]) -> None:
+        """Brings a panel's entries in line with `usernames`, touching only the difference."""
+        new_names = set(usernames)
+        index = self._panels.get(panel_id)
+        self._generations[panel_id] += 1
+        generation = self._generations[panel_id]
+
+        if index is not None:
+            removed = index.names.keys() - new_names
+            added = new_names - index.names.keys()
+            if (len(removed) + len(added)) * BULK_REBUILD_FRACTION < len(index):
+                for username in removed:
+                    index.remove(username)
+                for username in added:
+                    index.add(username)
+                return
+
+        pending = self._pending[panel_id] = []
+        try:
+            rebuilt = await asyncio.to_thread(_PanelIndex.build, new_names)
+        finally:
+            if self._pending.get(panel_id) is pending:
+                del self._pending[panel_id]
+        if self._generations[panel_id] != generation:
+            return  # removed or replaced again while we were building
+        for is_add, username in pending:
+            if is_add:
+                rebuilt.add(username)
+            else:
+                rebuilt.remove(username)
+        self._panels[panel_id] = rebuilt
+
+    def remove_panel(self, panel_id: int) -> None:
+        self._panels.pop(panel_id, None)
+        self._generations[panel_id] += 1
+
+    # --- Queries ---
+
+    def search(
+        self, query: str, offset: int = 0, limit: Optional[int] = None, panel_ids: Optional[Iterable[int]] = None,
+    ) -> Tuple[int, List[UserKey]]:
+        """
+        Returns (total_matches, ranked keys for the requested page), counting only
+        the given panels (all indexed panels if None).
+        """
+        query = _normalize(query.strip())
+        if not query:
+            return 0, []
+
+        panels = self._panels if panel_ids is None else {
+            panel_id: self._panels[panel_id] for panel_id in panel_ids if panel_id in self._panels
+        }
+        exact, prefix, infix = [], [], []
+        for panel_id, index in panels.items():
+            exact.extend((panel_id, username) for username in index.by_name.get(query, ()))
+            prefix.extend((name, (panel_id, username)) for name, username in index.prefix_matches(query))
+            for username in index.substring_candidates(query):
+                name = index.names[username]
+                position = name.find(query)
+                if position > 0:
+                    infix.append((position, name, (panel_id, username)))
+        exact.sort()
+        prefix.sort()
+        infix.sort()
+
+        ranked = exact + [key for _, key in prefix] + [key for _, _, key in infix]
+        end = None if limit is None else offset + limit
+        return len(ranked), ranked[offset:end]
+
+
+# --- SINGLETON INSTANCE ---
+username_index = UsernameIndex()